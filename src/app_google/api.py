@@ -4,7 +4,7 @@ FastAPI Router для app_google.
 """
 from datetime import date
 from typing import Optional, List, Annotated
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from sqlalchemy import select, func
@@ -13,9 +13,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.database import engine, async_session
 from src.config.other import API_TOKEN
 from src.app_google.config import APP_GOOGLE_FILE
-from src.app_google.schemas import SyncResponse, SyncRequest, StatsResponse, TaskResponse, TaskFilter
+from src.app_google.schemas import SyncResponse, SyncRequest, SyncJobResponse, StatsResponse, TaskResponse, TaskFilter
 from src.app_google.models import TaskList
+from src.app_google.jobs import enqueue_sync, get_job
 from src.app_google.main import main as run_pipeline
+from src.app_google.registry import Spreadsheet, enqueue_registry, find_spreadsheet
+from src.app_google.watch import handle_notification
 
 # === Настройки роутера ===
 router = APIRouter(prefix="/app_google", tags=["app_google"])
@@ -44,24 +47,85 @@ async def get_db_session() -> AsyncSession:
 
 # === ЭНДПОИНТЫ ===
 
-@router.post("/sync", response_model=SyncResponse, dependencies=[Depends(verify_token)])
-async def trigger_sync(request: SyncRequest, background_tasks: BackgroundTasks) -> SyncResponse:
+@router.post(
+    "/sync", response_model=SyncResponse, dependencies=[Depends(verify_token)],
+    responses={404: {"description": "file_code задан, но таблицы нет в реестре (APP_GOOGLE_REGISTRY)"}},
+)
+async def trigger_sync(request: SyncRequest) -> SyncResponse:
     """
-    Запускает синхронизацию Google Sheets → DB.
+    Ставит синхронизацию Google Sheets → DB в очередь.
+
+    Повторные запросы для того же листа, пока задание ждёт воркера,
+    схлопываются в одно задание. Состояние — GET /sync/{job_id}.
+    file_code — таблица из реестра (по умолчанию APP_GOOGLE_FILE). APP_GOOGLE_FILE принимается
+    всегда, даже если его нет в реестре (без метки source_tag); другой file_code не из реестра — 404.
+    sheet_name="*" — все новые и изменившиеся листы таблицы.
+    dry_run=true — не ставит задание, а сразу считает, что изменится
+    (вставка / обновление / деактивация с примерами ключей), без записи в БД.
 
     Требуется заголовок: `Authorization: Bearer <API_TOKEN>`
     """
-    target_file = APP_GOOGLE_FILE
+    target_file = request.file_code or APP_GOOGLE_FILE
     if not target_file:
         raise HTTPException(status_code=400, detail="APP_GOOGLE_FILE not configured")
+    spreadsheet = find_spreadsheet(target_file)
+    if spreadsheet is None and target_file.strip() == APP_GOOGLE_FILE:
+        spreadsheet = Spreadsheet(APP_GOOGLE_FILE)
+    if spreadsheet is None:
+        raise HTTPException(status_code=404, detail="Spreadsheet not in registry")
+
+    if request.dry_run:
+        result = await run_pipeline(spreadsheet.file_code, request.sheet_name or spreadsheet.sheet_name, dry_run=True)
+        return SyncResponse(status="dry_run" if result['success'] else "failed",
+                            message=result['message'], stats=result['stats'])
+
+    job_id = await enqueue_sync(spreadsheet.file_code, request.sheet_name or spreadsheet.sheet_name)
+    if job_id is None:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    return SyncResponse(status="queued", message="Синхронизация поставлена в очередь", job_id=job_id)
 
-    # Запуск в фоне (не блокирует ответ)
-    background_tasks.add_task(
-        run_pipeline,
-        file_code=APP_GOOGLE_FILE,
-        sheet_name=request.sheet_name
-    )
-    return SyncResponse(status="started", message="Синхронизация запущена")
+
+@router.post("/sync/registry", dependencies=[Depends(verify_token)])
+async def trigger_registry_sync(sheet_name: Optional[str] = None) -> dict:
+    """
+    Ставит в очередь синхронизацию всех таблиц реестра (по заданию на таблицу).
+
+    Задания разбирает общий пул воркеров; ошибка одной таблицы не останавливает
+    остальные, у каждой — своя статистика в GET /sync/{job_id}.
+    """
+    jobs = await enqueue_registry(sheet_name)
+    if jobs and all(job_id is None for job_id in jobs.values()):
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    return {"status": "queued", "jobs": jobs}
+
+
+@router.get("/sync/{job_id}", response_model=SyncJobResponse, dependencies=[Depends(verify_token)])
+async def get_sync_job(job_id: int) -> SyncJobResponse:
+    """Состояние задания синхронизации: статус, этап, длительности этапов, итоговая статистика."""
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/webhook/drive")
+async def drive_webhook(
+        channel_id: str = Header(..., alias="X-Goog-Channel-ID"),
+        channel_token: Optional[str] = Header(None, alias="X-Goog-Channel-Token"),
+        resource_state: str = Header(..., alias="X-Goog-Resource-State"),
+) -> dict:
+    """
+    Уведомление Drive об изменении таблицы (канал files.watch, см. watch.py).
+
+    Всплеск уведомлений схлопывается в одну синхронизацию листа (WEBHOOK_SHEET или из реестра),
+    которая ставится в очередь после паузы в правках. Bearer-токен не нужен:
+    уведомление подтверждается секретом канала (X-Goog-Channel-Token).
+    """
+    try:
+        result = await handle_notification(channel_id, channel_token, resource_state)
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid channel token")
+    return {"status": result}
 
 
 @router.get("/tasks", response_model=List[TaskResponse])
@@ -0,0 +1,233 @@
+"""
+Общая на процесс авторизация Google (OAuth 2.0) для app_google.
+
+Токен читается с диска один раз и держится в памяти между запусками пайплайна.
+Обновление идёт только когда до истечения осталось меньше AUTH_REFRESH_MARGIN;
+параллельные обновления сериализуются блокировкой (одно обращение к token endpoint
+на всех). Фоновый поток обновляет токен заранее, чтобы запросы не ждали refresh.
+Зависимости: google-auth, google-auth-oauthlib, gspread, src.config.logger
+"""
+import pickle
+import threading
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import gspread
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+from src.app_google.config import AUTH_BACKGROUND_REFRESH, AUTH_REFRESH_MARGIN
+from src.config.logger import logger
+
+# Права доступа: только чтение таблиц и метаданных файлов Drive (ревизия для пропуска неизменных файлов)
+SCOPES: list[str] = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+]
+
+# Пути к файлам авторизации (относительно корня проекта или абсолютные)
+CREDENTIALS_FILE = Path('credentials.json')  # Скачать из Google Cloud Console
+TOKEN_FILE = Path('token_google.pkl')  # Создается автоматически
+
+
+class GoogleAuth:
+    """Потокобезопасный держатель учётных данных и клиента gspread."""
+
+    def __init__(self, token_file: Path = TOKEN_FILE, credentials_file: Path = CREDENTIALS_FILE,
+                 scopes: Optional[list[str]] = None, refresh_margin: float = AUTH_REFRESH_MARGIN,
+                 background_refresh: bool = AUTH_BACKGROUND_REFRESH):
+        """
+        Args:
+            token_file: Файл сохранённого токена.
+            credentials_file: OAuth client ID (для первого входа через браузер).
+            scopes: Права доступа (по умолчанию SCOPES).
+            refresh_margin: За сколько секунд до истечения обновлять токен.
+            background_refresh: Обновлять токен заранее в фоновом потоке.
+        """
+        self.token_file = Path(token_file)
+        self.credentials_file = Path(credentials_file)
+        self.scopes = scopes or SCOPES
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.background_refresh = background_refresh
+
+        self._lock = threading.RLock()
+        self._creds: Credentials | None = None
+        self._client: gspread.Client | None = None
+        self._stop = threading.Event()
+        self._refresher: threading.Thread | None = None
+
+    # === Состояние токена ===
+
+    def _remaining(self) -> Optional[timedelta]:
+        """Сколько осталось до истечения токена (None — срок неизвестен)."""
+        if self._creds is None or self._creds.expiry is None:
+            return None
+        # google-auth хранит expiry как naive UTC
+        return self._creds.expiry - datetime.utcnow()
+
+    def _needs_refresh(self) -> bool:
+        if self._creds is None or not self._creds.token:
+            return True
+        remaining = self._remaining()
+        return remaining is not None and remaining < self.refresh_margin
+
+    @property
+    def is_valid(self) -> bool:
+        """Есть ли действующий токен (без обращения к сети)."""
+        return self._creds is not None and self._creds.valid
+
+    # === Получение клиента ===
+
+    def get_client(self) -> gspread.Client:
+        """
+        Авторизованный клиент gspread, общий для всех процессоров и потоков.
+
+        Сетевой refresh выполняется только если токен скоро истечёт; без блокировки,
+        пока токен свежий.
+        """
+        client = self._client
+        if client is not None and not self._needs_refresh():
+            return client
+
+        with self._lock:
+            # Другой поток мог уже обновить токен, пока мы ждали блокировку
+            if self._client is None or self._needs_refresh():
+                self._ensure_credentials()
+                # refresh() обновляет учётные данные на месте; новый клиент нужен, только если
+                # объект учётных данных заменён (первый запуск или вход через браузер)
+                if self._client is None or self._client.http_client.auth is not self._creds:
+                    self._client = gspread.authorize(self._creds)
+            self._start_refresher()
+            return self._client
+
+    def _ensure_credentials(self) -> None:
+        """Загрузить токен (память → диск → браузер) и обновить его при необходимости."""
+        if self._creds is None:
+            self._creds = self._load_token()
+
+        if self._creds is not None and self._needs_refresh() and self._creds.refresh_token:
+            try:
+                self._creds.refresh(Request())
+                logger.info("Токен успешно обновлён")
+                self._save_token()
+                return
+            except Exception as e:
+                logger.warning(f"Не удалось обновить токен: {e}. Запрашиваю вход через браузер...")
+                self._creds = None
+
+        if self._creds is None or not self._creds.valid:
+            self._creds = self._run_flow()
+            self._save_token()
+
+    def _load_token(self) -> Credentials | None:
+        if not self.token_file.exists():
+            return None
+        try:
+            with open(self.token_file, 'rb') as f:
+                creds = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить токен: {e}. Удаляю повреждённый файл.")
+            self.token_file.unlink(missing_ok=True)
+            return None
+
+        # Токен, выданный до расширения SCOPES, обновляется без ошибок, но запросы
+        # с недостающими правами получают 403 — такой токен считается отсутствующим
+        missing = self._missing_scopes(creds)
+        if missing:
+            logger.error(
+                f"❌ Токен {self.token_file} выдан без прав {', '.join(sorted(missing))}. "
+                "Нужен повторный вход через браузер (или удалите файл токена и авторизуйтесь заново)."
+            )
+            return None
+        return creds
+
+    def _missing_scopes(self, creds: Credentials) -> set[str]:
+        """Права из self.scopes, которых нет у токена (по выданным, иначе по запрошенным)."""
+        granted = getattr(creds, 'granted_scopes', None) or creds.scopes or []
+        return set(self.scopes) - set(granted)
+
+    def _run_flow(self) -> Credentials:
+        """Вход через браузер (первый запуск или отозванный токен)."""
+        if not self.credentials_file.exists():
+            raise FileNotFoundError(
+                f"Файл {self.credentials_file} не найден!\n"
+                "Скачайте его из Google Cloud Console: "
+                "APIs & Services → Credentials → Create Credentials → OAuth client ID (Desktop app)"
+            )
+
+        logger.info("🔐 Откройте браузер для авторизации в Google...")
+        flow = InstalledAppFlow.from_client_secrets_file(str(self.credentials_file), self.scopes)
+        creds = flow.run_local_server(port=0, open_browser=True)
+        logger.info("✅ Авторизация успешна")
+        return creds
+
+    def _save_token(self) -> None:
+        """Сохранить токен для будущих запусков."""
+        try:
+            with open(self.token_file, 'wb') as f:
+                pickle.dump(self._creds, f)
+            self.token_file.chmod(0o600)  # Защита файла токена
+            logger.debug(f"Токен сохранён в {self.token_file}")
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить токен: {e}. При следующем запуске потребуется вход.")
+
+    # === Фоновое обновление ===
+
+    def _start_refresher(self) -> None:
+        if not self.background_refresh or (self._refresher is not None and self._refresher.is_alive()):
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name='google-auth-refresh', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        """Обновлять токен за refresh_margin до истечения, пока не вызван close()."""
+        while True:
+            remaining = self._remaining()
+            if remaining is None:
+                return  # срок неизвестен — обновлять нечего
+            wait = max((remaining - self.refresh_margin).total_seconds(), 1.0)
+            if self._stop.wait(wait):
+                return
+            try:
+                with self._lock:
+                    if self._needs_refresh() and self._creds and self._creds.refresh_token:
+                        self._creds.refresh(Request())
+                        self._save_token()
+                        logger.debug("🔑 Токен обновлён заранее (фон)")
+            except Exception as e:
+                logger.warning(f"⚠️ Фоновое обновление токена: {e}")
+                if self._stop.wait(60):
+                    return
+
+    def close(self) -> None:
+        """Остановить фоновое обновление."""
+        self._stop.set()
+
+    def reset(self) -> None:
+        """Удалить сохранённый токен и забыть учётные данные (для сброса сессии)."""
+        with self._lock:
+            if self.token_file.exists():
+                self.token_file.unlink()
+                logger.info("🔑 Токен авторизации удалён")
+            self._creds = None
+            self._client = None
+        self.close()
+
+
+# Общий держатель на процесс
+_shared: GoogleAuth | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_auth() -> GoogleAuth:
+    """Общий на процесс GoogleAuth (создаётся при первом обращении)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = GoogleAuth()
+        return _shared
@@ -0,0 +1,90 @@
+"""
+Микробенчмарк приведения типов: построчные safe_* в Python против запроса DuckDB.
+
+Запуск (БД не нужна):
+    python -m src.app_google.bench.coercion --rows 10000 100000
+
+«До» — прежний путь: DuckDB только переименовывает столбцы, типы приводятся
+построчно через prepare_task. «После» — transform.transform. Arrow-таблица
+строится один раз заранее: замеряется только этап приведения типов.
+"""
+import argparse
+import random
+import time
+
+from datetime import date, timedelta
+
+import duckdb
+import pyarrow as pa
+
+from src.app_google.config import COLUMN_MAPPING
+from src.app_google.transform import SOURCE_TABLE, sheet_to_arrow, transform
+from src.app_google.writer import prepare_task
+
+
+def make_sheet_rows(count: int, seed: int = 42) -> list[dict]:
+    """Синтетические строки листа с заголовками COLUMN_MAPPING (значения — как их отдаёт openpyxl)."""
+    rnd = random.Random(seed)
+    start = date(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        day = start + timedelta(days=i % 365)
+        rows.append({
+            "№ п/п": float(i + 1),
+            "дата комментария": day.strftime('%d.%m.%Y') if i % 3 else day.strftime('%Y-%m-%d'),
+            "Ссылка": f" https://t.me/bench_channel_{i % 997}/{i} ",
+            "Краткое описание": f"Описание поста {i}",
+            "Кол-во подписчиков": f"{rnd.randint(100, 2_000_000):,}".replace(',', '\xa0'),
+            "Текст комментария": f"Комментарий {rnd.random():.6f}",
+            "Исправления": '' if i % 2 else None,
+            "Ответственный за публикацию": rnd.choice(['Иванов', 'Петров', 'Сидорова']),
+            "Статус опубликования": rnd.choice(['new', 'published', 'rejected']),
+        })
+    return rows
+
+
+def legacy_coercion(table: pa.Table) -> list[dict]:
+    """Прежний путь: переименование в DuckDB + prepare_task на каждую строку."""
+    conn = duckdb.connect()
+    try:
+        conn.register(SOURCE_TABLE, table)
+        select_parts = [f'"{src}" AS {tgt}' for src, tgt in COLUMN_MAPPING.items()]
+        filtered = conn.execute(
+            f"SELECT {', '.join(select_parts)} FROM {SOURCE_TABLE} WHERE \"Ссылка\" IS NOT NULL"
+        ).fetchall()
+        target_cols = list(COLUMN_MAPPING.values())
+        return [prepare_task(dict(zip(target_cols, row))) for row in filtered]
+    finally:
+        conn.close()
+
+
+def vectorized_coercion(table: pa.Table) -> pa.Table:
+    """Новый путь: приведение типов внутри запроса DuckDB, результат — Arrow."""
+    conn = duckdb.connect()
+    try:
+        return transform(conn, table)
+    finally:
+        conn.close()
+
+
+def run(sizes: list[int], repeat: int) -> None:
+    print(f"{'rows':>8} | {'path':>10} | {'best sec':>9} | {'µs/row':>8}")
+    for size in sizes:
+        table = sheet_to_arrow(make_sheet_rows(size), list(COLUMN_MAPPING.keys()))
+        for label, func in (('safe_*', legacy_coercion), ('duckdb', vectorized_coercion)):
+            best = min(_timed(func, table) for _ in range(repeat))
+            print(f"{size:>8} | {label:>10} | {best:9.3f} | {best / size * 1e6:8.2f}")
+
+
+def _timed(func, table: pa.Table) -> float:
+    started = time.perf_counter()
+    func(table)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
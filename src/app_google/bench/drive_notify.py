@@ -0,0 +1,92 @@
+"""
+Локальный отправитель уведомлений Drive (files.watch) для проверки вебхука без Google.
+
+Отправляет POST с заголовками X-Goog-* как Drive: пустое тело, номер сообщения
+растёт в пределах канала. Используется заглушкой sheets_stub (при правке таблицы)
+и отдельно — всплеском уведомлений на работающее API:
+
+    python -m src.app_google.bench.drive_notify \\
+        --url http://127.0.0.1:8000/app_google/webhook/drive \\
+        --channel <channel_id> --token <watch_channel.token> --burst 20 --interval 0.2
+
+Канал должен быть в watch_channel, а секрет — совпадать с его token (иначе вебхук ответит 403).
+"""
+import argparse
+import asyncio
+import itertools
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import aiohttp
+
+
+@dataclass
+class StubChannel:
+    """Канал уведомлений, как его видит Drive."""
+    channel_id: str
+    address: str
+    token: str = ''
+    resource_id: str = 'stub-resource'
+    resource_uri: str = ''
+    expiration_ms: Optional[int] = None
+    _numbers: itertools.count = field(default_factory=lambda: itertools.count(1), repr=False)
+
+    def headers(self, state: str) -> dict[str, str]:
+        """Заголовки уведомления с очередным номером сообщения."""
+        headers = {
+            'X-Goog-Channel-ID': self.channel_id,
+            'X-Goog-Message-Number': str(next(self._numbers)),
+            'X-Goog-Resource-ID': self.resource_id,
+            'X-Goog-Resource-State': state,
+            'X-Goog-Resource-URI': self.resource_uri,
+        }
+        if self.token:
+            headers['X-Goog-Channel-Token'] = self.token
+        if self.expiration_ms is not None:
+            expires = datetime.fromtimestamp(self.expiration_ms / 1000, timezone.utc)
+            headers['X-Goog-Channel-Expiration'] = expires.strftime('%a, %d %b %Y %H:%M:%S GMT')
+        if state == 'update':
+            headers['X-Goog-Changed'] = 'content'
+        return headers
+
+
+async def send_notification(session: aiohttp.ClientSession, channel: StubChannel, state: str = 'update') -> int:
+    """Отправить одно уведомление. Returns: HTTP-статус ответа вебхука."""
+    async with session.post(channel.address, headers=channel.headers(state)) as response:
+        await response.read()
+        return response.status
+
+
+async def send_burst(channel: StubChannel, count: int, interval: float = 0.0,
+                     sync_first: bool = False) -> list[int]:
+    """
+    Всплеск из count уведомлений update через interval секунд (как при серии правок).
+
+    Returns:
+        list[int]: HTTP-статусы ответов.
+    """
+    statuses = []
+    async with aiohttp.ClientSession() as session:
+        if sync_first:
+            statuses.append(await send_notification(session, channel, 'sync'))
+        for i in range(count):
+            if i and interval:
+                await asyncio.sleep(interval)
+            statuses.append(await send_notification(session, channel))
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка уведомлений Drive на вебхук")
+    parser.add_argument('--url', required=True, help="Адрес вебхука")
+    parser.add_argument('--channel', required=True, help="Идентификатор канала (watch_channel.channel_id)")
+    parser.add_argument('--token', default='', help="Секрет канала (watch_channel.token)")
+    parser.add_argument('--burst', type=int, default=10, help="Уведомлений во всплеске")
+    parser.add_argument('--interval', type=float, default=0.2, help="Пауза между уведомлениями, сек")
+    parser.add_argument('--sync', action='store_true', help="Сначала отправить sync (как при создании канала)")
+    args = parser.parse_args()
+    result = asyncio.run(send_burst(StubChannel(args.channel, args.url, args.token), args.burst,
+                                    args.interval, args.sync))
+    print(f"Отправлено {len(result)}, ответы: {sorted(set(result))}")
@@ -0,0 +1,105 @@
+"""
+Бенчмарк получения листа: экспорт всей книги в XLSX против values.batchGet нужных столбцов.
+
+Запуск (сеть и БД не нужны — Google заменяется локальной заглушкой bench/sheets_stub.py):
+    python -m src.app_google.bench.fetch --rows 10000 50000 --sheets 3 --delay-ms 20
+
+Для каждого способа измеряются байты ответов, число запросов и время от первого
+запроса до последнего Arrow-батча (разбор XLSX включён, DuckDB и БД — нет).
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import gspread
+from google.auth.credentials import AnonymousCredentials
+
+from src.app_google.auth import GoogleAuth
+from src.app_google.bench.sheets_stub import STATS_KEY, StubSpreadsheet, start_stub
+from src.app_google.cache import ExportCache
+from src.app_google.config import COLUMN_MAPPING, SHEET_BATCH_SIZE
+from src.app_google.get_google import GoogleSheetProcessor
+from src.app_google.ratelimit import DRIVE_API, SHEETS_API, RequestScheduler
+
+SPREADSHEET_ID = 'bench'
+
+
+class StubAuth(GoogleAuth):
+    """Авторизация без OAuth: анонимный клиент для заглушки."""
+
+    def get_client(self) -> gspread.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = gspread.Client(auth=AnonymousCredentials())
+            return self._client
+
+
+class StubSheetProcessor(GoogleSheetProcessor):
+    """Процессор без OAuth и без квот: запросы уходят на заглушку."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('auth', StubAuth())
+        kwargs.setdefault('scheduler', RequestScheduler(quotas={SHEETS_API: 1e9, DRIVE_API: 1e9}))
+        super().__init__(*args, **kwargs)
+
+
+async def fetch_xlsx(processor: GoogleSheetProcessor, sheet: str, batch_size: int) -> int:
+    """Экспорт книги → заголовки → поток батчей openpyxl. Returns: строк."""
+    if not await processor.download_file(SPREADSHEET_ID):
+        raise RuntimeError("Экспорт XLSX не удался")
+    await processor.get_sheet_columns(sheet)
+    rows = 0
+    async for batch in processor.stream_sheet_batches(sheet, list(COLUMN_MAPPING.keys()), batch_size):
+        rows += batch.num_rows
+    return rows
+
+
+async def fetch_values(processor: GoogleSheetProcessor, sheet: str, batch_size: int) -> int:
+    """values.batchGet только нужных столбцов, страницами. Returns: строк."""
+    _, stream = await processor.stream_sheet_values(sheet, list(COLUMN_MAPPING.keys()), batch_size, SPREADSHEET_ID)
+    rows = 0
+    async for batch in stream:
+        rows += batch.num_rows
+    return rows
+
+
+async def run(sizes: list[int], sheets: int, delay_ms: float, batch_size: int) -> None:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        await _run(sizes, sheets, delay_ms, batch_size, ExportCache(cache_dir))
+
+
+async def _run(sizes: list[int], sheets: int, delay_ms: float, batch_size: int, cache: ExportCache) -> None:
+    print(f"{'rows':>8} | {'backend':>7} | {'requests':>8} | {'KiB':>9} | {'sec':>7} | {'rows out':>8}")
+    for size in sizes:
+        spreadsheet = StubSpreadsheet.generate(size, sheets)
+        await asyncio.to_thread(spreadsheet.xlsx)  # построить XLSX до замера
+        runner, url = await start_stub(spreadsheet, delay=delay_ms / 1000)
+        stats = runner.app[STATS_KEY]
+        sheet = next(iter(spreadsheet.sheets))
+        try:
+            for label, fetch in (('xlsx', fetch_xlsx), ('values', fetch_values)):
+                processor = StubSheetProcessor(
+                    spreadsheet_id=SPREADSHEET_ID,
+                    sheets_api_url=f"{url}/v4/spreadsheets", drive_api_url=f"{url}/drive/v3",
+                    export_cache=cache,
+                )
+                stats.update(requests=0, bytes=0)
+                started = time.perf_counter()
+                rows = await fetch(processor, sheet, batch_size)
+                elapsed = time.perf_counter() - started
+                processor.clear_cache()
+                print(f"{size:>8} | {label:>7} | {stats['requests']:>8} | {stats['bytes'] / 1024:9.1f} | "
+                      f"{elapsed:7.2f} | {rows:>8}")
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк: экспорт XLSX против values.batchGet")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000], help="Строк в листе")
+    parser.add_argument('--sheets', type=int, default=3, help="Листов в книге (экспорт тянет все)")
+    parser.add_argument('--delay-ms', type=float, default=0.0, help="Задержка каждого ответа заглушки, мс")
+    parser.add_argument('--batch-size', type=int, default=SHEET_BATCH_SIZE, help="Строк в странице / батче")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.sheets, args.delay_ms, args.batch_size))
@@ -0,0 +1,98 @@
+"""
+Бенчмарк парсеров XLSX (parsers.py): строк в секунду на синтетической книге.
+
+Запуск (сеть и БД не нужны):
+    python -m src.app_google.bench.parsers --rows 200000 --columns 30
+
+Книга — один лист: столбцы COLUMN_MAPPING вперемешку с дополнительными (числа,
+даты с форматом даты, текст). Строится один раз и сохраняется в --workbook
+(повторные запуски её переиспользуют). Каждый парсер читает лист только по
+столбцам COLUMN_MAPPING (как пайплайн); результаты сверяются с openpyxl.
+"""
+import argparse
+import mmap
+import time
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+from openpyxl import Workbook
+
+from src.app_google.bench.coercion import make_sheet_rows
+from src.app_google.cache import MappedFile
+from src.app_google.config import COLUMN_MAPPING
+from src.app_google.parsers import PARSERS, open_parser
+
+SHEET = '02.03.2026'
+
+
+def build_workbook(path: Path, rows: int, columns: int) -> None:
+    """Синтетическая книга rows × columns (не меньше столбцов COLUMN_MAPPING)."""
+    mapped = list(COLUMN_MAPPING)
+    extra = [f"Доп. {i + 1}" for i in range(max(0, columns - len(mapped)))]
+    # Нужные столбцы разбросаны по листу: через каждые два дополнительных
+    headers, pending = [], list(mapped)
+    for i, name in enumerate(extra):
+        if pending and i % 2 == 0:
+            headers.append(pending.pop(0))
+        headers.append(name)
+    headers += pending
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET)
+    sheet.append(headers)
+    start = datetime(2026, 1, 1, 9, 30)
+    for i, row in enumerate(make_sheet_rows(rows)):
+        fillers = {}
+        for j, name in enumerate(extra):
+            kind = j % 4
+            fillers[name] = (i * j if kind == 0 else (i + j) / 7 if kind == 1
+                             else start + timedelta(hours=i + j) if kind == 2 else f"текст {i}-{j}")
+        sheet.append([row.get(name, fillers.get(name)) for name in headers])
+    workbook.save(path)
+
+
+def measure(path: Path, parser_name: str, columns: list[str]) -> tuple[float, pa.Table]:
+    """Открыть книгу парсером и прочитать лист. Returns: (секунды, таблица)."""
+    with open(path, 'rb') as f:
+        mapped = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+    started = time.perf_counter()
+    parser = open_parser(parser_name, mapped)
+    try:
+        batches = list(parser.iter_batches(SHEET, columns))
+    finally:
+        parser.close()
+    elapsed = time.perf_counter() - started
+    mapped.close()
+    return elapsed, pa.Table.from_batches(batches) if len({b.schema for b in batches}) == 1 else \
+        pa.concat_tables([pa.Table.from_batches([b]) for b in batches], promote_options='permissive')
+
+
+def run(path: Path, rows: int, columns: int, all_columns: bool) -> None:
+    if not path.exists():
+        print(f"Построение книги {rows}×{columns} → {path} ...")
+        started = time.perf_counter()
+        build_workbook(path, rows, columns)
+        print(f"  готово за {time.perf_counter() - started:.1f} с, {path.stat().st_size / 2 ** 20:.1f} MiB")
+
+    projection = None if all_columns else list(COLUMN_MAPPING)
+    print(f"{'parser':>9} | {'rows':>8} | {'sec':>7} | {'rows/sec':>9} | same as openpyxl")
+    reference = None
+    for name in PARSERS:
+        elapsed, table = measure(path, name, projection)
+        if reference is None:
+            reference = table
+        same = table.to_pylist() == reference.to_pylist()
+        print(f"{name:>9} | {table.num_rows:>8} | {elapsed:7.2f} | {table.num_rows / elapsed:9.0f} | {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк парсеров XLSX")
+    parser.add_argument('--rows', type=int, default=200_000, help="Строк в листе")
+    parser.add_argument('--columns', type=int, default=30, help="Столбцов в листе")
+    parser.add_argument('--workbook', type=Path, default=None, help="Файл книги (по умолчанию в /tmp)")
+    parser.add_argument('--all-columns', action='store_true', help="Читать все столбцы, а не только COLUMN_MAPPING")
+    args = parser.parse_args()
+    workbook_path = args.workbook or Path(f"/tmp/app_google_bench_{args.rows}x{args.columns}.xlsx")
+    run(workbook_path, args.rows, args.columns, args.all_columns)
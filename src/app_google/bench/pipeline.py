@@ -0,0 +1,139 @@
+"""
+Сквозной бенчмарк пайплайна main(): экспорт XLSX → разбор → DuckDB → PostgreSQL.
+
+Запуск (нужна ЛОКАЛЬНАЯ БД из APP_GOOGLE_DB; Google заменяется заглушкой bench/sheets_stub.py):
+    python -m src.app_google.bench.pipeline --rows 1000 10000 100000 1000000 --schema bench
+
+Для каждого размера строится синтетическая книга (bench/parsers.build_workbook, кэшируется
+в /tmp), заглушка отдаёт её экспортом, и пайплайн выполняется дважды: на пустой
+таблице (вставка) и повторно на тех же данных (строки без изменений).
+Все запросы пайплайна идут в отдельную схему (--schema, через schema_translate_map
+общего engine, как в bench/upsert.py): перед каждым размером её task_list очищается,
+рабочая схема DB_SCHEMA не затрагивается.
+
+Отчёт — строка на прогон: общее время, строк/с, пик RSS и wall/cpu каждого этапа
+(stats['profile']); --json — те же данные в JSON для сравнения запусков.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from pathlib import Path
+
+from sqlalchemy import delete
+
+from src.app_google.bench.fetch import SPREADSHEET_ID, StubSheetProcessor
+from src.app_google.bench.parsers import SHEET, build_workbook
+from src.app_google.bench.sheets_stub import StubSpreadsheet, start_stub
+from src.app_google.cache import ExportCache
+from src.app_google.config import COLUMN_MAPPING, DB_SCHEMA
+from src.app_google.main import main as run_pipeline
+from src.app_google.metrics import peak_rss
+from src.app_google.models import SheetLedger, TaskList, init_db_schema
+from src.config.database import engine, async_session
+
+# Этапы в отчёте (в порядке пайплайна)
+STAGES: tuple[str, ...] = ('download', 'sheet_names', 'columns', 'parse', 'transform', 'diff', 'write', 'deactivate')
+
+# Хосты локальной БД (None — unix-сокет)
+LOCAL_HOSTS: frozenset[str | None] = frozenset({'localhost', '127.0.0.1', '::1', None})
+
+
+def workbook_path(rows: int, columns: int) -> Path:
+    """Книга бенчмарка для размера (строится при первом запуске)."""
+    path = Path(f"/tmp/app_google_bench_{rows}x{columns}.xlsx")
+    if not path.exists():
+        print(f"Построение книги {rows}×{columns} → {path} ...", flush=True)
+        started = time.perf_counter()
+        build_workbook(path, rows, columns)
+        print(f"  готово за {time.perf_counter() - started:.1f} с, {path.stat().st_size / 2 ** 20:.1f} MiB")
+    return path
+
+
+async def _reset_tables() -> None:
+    """Пустая task_list и журнал листов бенчмарка (в схеме бенчмарка)."""
+    async with async_session() as session:
+        await session.execute(delete(TaskList))
+        await session.execute(delete(SheetLedger).where(SheetLedger.file_code == SPREADSHEET_ID))
+        await session.commit()
+
+
+async def run_size(rows: int, columns: int, cache: ExportCache) -> list[dict]:
+    """Два прогона пайплайна (вставка, повтор) на книге rows строк. Returns: записи отчёта."""
+    path = workbook_path(rows, columns)
+    runner, url = await start_stub(StubSpreadsheet.from_xlsx(path))
+    reports = []
+    try:
+        await _reset_tables()
+        for label in ('insert', 'resync'):
+            processor = StubSheetProcessor(
+                spreadsheet_id=SPREADSHEET_ID,
+                sheets_api_url=f"{url}/v4/spreadsheets", drive_api_url=f"{url}/drive/v3",
+                export_cache=cache,
+            )
+            started = time.perf_counter()
+            result = await run_pipeline(SPREADSHEET_ID, SHEET, force=True, processor=processor, backend='xlsx')
+            elapsed = time.perf_counter() - started
+            stats = result['stats']
+            reports.append({
+                'rows': rows, 'pass': label, 'success': result['success'], 'seconds': round(elapsed, 3),
+                'rows_per_sec': round(rows / elapsed), 'peak_rss_mb': round(peak_rss() / 2 ** 20, 1),
+                'inserted': stats.get('inserted', 0), 'updated': stats.get('updated', 0),
+                'unchanged': stats.get('unchanged', 0), 'errors': stats.get('errors', 0),
+                'profile': stats.get('profile', {}), 'write': stats.get('timings', {}),
+            })
+    finally:
+        await runner.cleanup()
+    return reports
+
+
+def print_report(report: dict) -> None:
+    stages = ' '.join(
+        f"{name}={report['profile'][name]['wall']:.2f}/{report['profile'][name]['cpu']:.2f}"
+        for name in STAGES if name in report['profile']
+    )
+    print(f"{report['rows']:>8} | {report['pass']:>6} | {report['seconds']:7.2f} | {report['rows_per_sec']:>8} | "
+          f"{report['peak_rss_mb']:>7} | {report['inserted']}/{report['updated']}/{report['unchanged']}/"
+          f"{report['errors']} | {stages}", flush=True)
+
+
+async def run(sizes: list[int], columns: int, schema: str, as_json: bool, allow_remote: bool) -> None:
+    if engine is None:
+        raise SystemExit("engine не инициализирован: задайте APP_GOOGLE_DB")
+    if schema == DB_SCHEMA:
+        raise SystemExit(f"Схема бенчмарка совпадает с рабочей ({DB_SCHEMA}): задайте другую --schema")
+    if engine.url.host not in LOCAL_HOSTS and not allow_remote:
+        raise SystemExit(f"БД на {engine.url.host}: бенчмарк очищает task_list, нужна локальная БД (--allow-remote)")
+
+    # main() и модули записи берут общий engine: перенаправляем его целиком, а не отдельную сессию
+    engine.update_execution_options(schema_translate_map={DB_SCHEMA: schema})
+    if not await init_db_schema(schema):
+        raise SystemExit("Не удалось создать таблицы")
+
+    reports = []
+    if not as_json:
+        print(f"{'rows':>8} | {'pass':>6} | {'sec':>7} | {'rows/s':>8} | {'RSS MB':>7} | ins/upd/same/err | "
+              f"этап=wall/cpu, сек")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ExportCache(cache_dir)
+        for size in sizes:
+            for report in await run_size(size, columns, cache):
+                reports.append(report)
+                if not as_json:
+                    print_report(report)
+    if as_json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--columns', type=int, default=len(COLUMN_MAPPING) + 6, help="Столбцов в листе")
+    parser.add_argument('--schema', default='bench', help="Схема PostgreSQL для таблиц бенчмарка")
+    parser.add_argument('--json', action='store_true', help="Отчёт в JSON")
+    parser.add_argument('--allow-remote', action='store_true', help="Разрешить нелокальную БД")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.columns, args.schema, args.json, args.allow_remote))
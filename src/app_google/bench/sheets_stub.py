@@ -0,0 +1,289 @@
+"""
+Локальная заглушка Google Sheets / Drive API для офлайн-бенчмарков.
+
+Отдаёт одну синтетическую таблицу:
+- GET /v4/spreadsheets/{id}                  — метаданные листов (title, rowCount)
+- GET /v4/spreadsheets/{id}/values:batchGet  — значения диапазонов A1 (ROWS / COLUMNS)
+- GET /drive/v3/files/{id}                   — метаданные файла (version, modifiedTime)
+- GET /drive/v3/files/{id}/export            — вся книга в XLSX
+- POST /drive/v3/files/{id}/watch            — канал уведомлений (files.watch)
+- POST /drive/v3/channels/stop               — остановить канал
+- POST /stub/append?sheet=...&rows=N         — дописать N строк в лист (новая ревизия)
+  и разослать уведомления update по каналам (bench/drive_notify.py)
+
+Авторизация не проверяется. JSON-ответы сжимаются gzip, если клиент это принимает
+(как у Google API). Считает запросы и отданные байты после сжатия (app[STATS_KEY]).
+С quota > 0 отвечает 429 (как Google при исчерпании квоты) на запросы сверх quota
+в скользящую минуту.
+
+Запуск отдельно:
+    python -m src.app_google.bench.sheets_stub --rows 50000 --port 8765
+    APP_GOOGLE_SHEETS_API_URL=http://127.0.0.1:8765/v4/spreadsheets \\
+    APP_GOOGLE_DRIVE_API_URL=http://127.0.0.1:8765/drive/v3 ...
+"""
+import argparse
+import asyncio
+import gzip
+import math
+import re
+import time
+
+from collections import deque
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+
+from aiohttp import web
+from openpyxl import Workbook
+from openpyxl.utils import column_index_from_string
+
+from src.app_google.bench.coercion import make_sheet_rows
+from src.app_google.bench.drive_notify import StubChannel, send_notification
+from src.app_google.config import COLUMN_MAPPING
+
+# Столбцы листа, которых нет в COLUMN_MAPPING (в реальной таблице они тоже есть)
+EXTRA_COLUMNS: tuple[str, ...] = ('Кто нашел ссылку', 'Канал', 'Тематика', 'Примечание', 'Охват', 'Реакции')
+
+STATS_KEY = web.AppKey('stats', dict)
+CHANNELS_KEY = web.AppKey('channels', dict)
+
+_RANGE_RE = re.compile(r"^(?:'(?P<quoted>(?:[^']|'')+)'|(?P<plain>[^!]+))!(?P<start>[A-Z]*)(?P<start_row>\d*)"
+                       r"(?::(?P<end>[A-Z]*)(?P<end_row>\d*))?$")
+
+
+class StubSpreadsheet:
+    """Таблица в памяти: листы как списки строк (первая строка — заголовки)."""
+
+    def __init__(self, sheets: dict[str, list[list[Any]]]):
+        self.sheets = sheets
+        self.version = 1
+        self.modified_time = datetime.now(timezone.utc)
+        self._xlsx: bytes | None = None
+
+    def touch(self) -> None:
+        """Отметить изменение таблицы: новая ревизия, экспорт пересобирается."""
+        self.version += 1
+        self.modified_time = datetime.now(timezone.utc)
+        self._xlsx = None
+
+    def append(self, title: str, count: int) -> None:
+        """Дописать count строк в конец листа (как оператор в течение дня)."""
+        grid = self.sheets[title]
+        headers = grid[0]
+        for i, row in enumerate(make_sheet_rows(count, seed=self.version * 7919 + len(grid)), start=len(grid)):
+            extra = {name: f"{name} {i}" for name in EXTRA_COLUMNS}
+            row['Ссылка'] = f"https://t.me/bench_append/{i}"
+            grid.append([row.get(name, extra.get(name)) for name in headers])
+        self.touch()
+
+    @classmethod
+    def from_xlsx(cls, path: Path) -> 'StubSpreadsheet':
+        """Таблица, готовая книга которой отдаётся экспортом как есть (values API у неё пустой)."""
+        spreadsheet = cls({})
+        spreadsheet._xlsx = path.read_bytes()
+        return spreadsheet
+
+    @classmethod
+    def generate(cls, rows: int, sheets: int = 3, seed: int = 42) -> 'StubSpreadsheet':
+        """Несколько «дневных» листов по rows строк: столбцы COLUMN_MAPPING вперемешку с EXTRA_COLUMNS."""
+        headers = [name for pair in zip(COLUMN_MAPPING, EXTRA_COLUMNS + ('',) * len(COLUMN_MAPPING))
+                   for name in pair if name]
+        result = {}
+        for number in range(sheets):
+            data = make_sheet_rows(rows, seed=seed + number)
+            grid = [headers]
+            for i, row in enumerate(data):
+                extra = {name: f"{name} {i}" for name in EXTRA_COLUMNS}
+                grid.append([row.get(name, extra.get(name)) for name in headers])
+            result[f"{number + 1:02d}.03.2026"] = grid
+        return cls(result)
+
+    def xlsx(self) -> bytes:
+        """Вся книга в XLSX (строится один раз)."""
+        if self._xlsx is None:
+            workbook = Workbook(write_only=True)
+            for title, grid in self.sheets.items():
+                sheet = workbook.create_sheet(title)
+                for row in grid:
+                    sheet.append(row)
+            buffer = BytesIO()
+            workbook.save(buffer)
+            self._xlsx = buffer.getvalue()
+        return self._xlsx
+
+    def values(self, a1_range: str, major_dimension: str = 'ROWS') -> dict[str, Any]:
+        """ValueRange для диапазона A1 — с обрезкой пустых хвостов, как в Sheets API."""
+        match = _RANGE_RE.match(a1_range)
+        if not match:
+            raise web.HTTPBadRequest(text=f"Unable to parse range: {a1_range}")
+        title = (match['quoted'] or '').replace("''", "'") or match['plain']
+        if title not in self.sheets:
+            raise web.HTTPBadRequest(text=f"Unable to parse range: {a1_range}")
+
+        grid = self.sheets[title]
+        width = max(len(row) for row in grid)
+        first_col = column_index_from_string(match['start']) - 1 if match['start'] else 0
+        last_col = column_index_from_string(match['end']) - 1 if match['end'] else width - 1
+        first_row = int(match['start_row']) - 1 if match['start_row'] else 0
+        last_row = int(match['end_row']) - 1 if match['end_row'] else len(grid) - 1
+
+        rows = [
+            [row[c] if c < len(row) else None for c in range(first_col, last_col + 1)]
+            for row in grid[first_row:last_row + 1]
+        ]
+        matrix = rows if major_dimension == 'ROWS' else [list(column) for column in zip(*rows)]
+        values = []
+        for line in matrix:
+            line = ['' if v is None else v for v in line]
+            while line and line[-1] == '':
+                line.pop()
+            values.append(line)
+        while values and not values[-1]:
+            values.pop()
+
+        result = {'range': a1_range, 'majorDimension': major_dimension}
+        if values:
+            result['values'] = values
+        return result
+
+
+def create_app(spreadsheet: StubSpreadsheet, delay: float = 0.0, quota: int = 0) -> web.Application:
+    """
+    aiohttp-приложение заглушки.
+
+    Args:
+        delay: Искусственная задержка ответа (имитация RTT), сек.
+        quota: Запросов в минуту, сверх которых отвечать 429 (0 — без ограничения).
+    """
+    recent: deque[float] = deque()
+
+    @web.middleware
+    async def count_bytes(request: web.Request, handler):
+        if delay:
+            await asyncio.sleep(delay)
+        stats = request.app[STATS_KEY]
+        if quota:
+            now = time.monotonic()
+            while recent and now - recent[0] > 60:
+                recent.popleft()
+            if len(recent) >= quota:
+                stats['rejected'] += 1
+                return web.json_response(
+                    {'error': {'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}},
+                    status=429, headers={'Retry-After': str(math.ceil(60 - (now - recent[0])))},
+                )
+            recent.append(now)
+        response = await handler(request)
+        if response.content_type == 'application/json' and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response.body = gzip.compress(response.body, compresslevel=6)
+            response.headers['Content-Encoding'] = 'gzip'
+        stats['requests'] += 1
+        stats['bytes'] += len(response.body or b'')
+        return response
+
+    async def metadata(request: web.Request) -> web.Response:
+        sheets = [{'properties': {'title': title, 'gridProperties': {'rowCount': len(grid)}}}
+                  for title, grid in spreadsheet.sheets.items()]
+        return web.json_response({'spreadsheetId': request.match_info['sid'], 'sheets': sheets})
+
+    async def batch_get(request: web.Request) -> web.Response:
+        major = request.query.get('majorDimension', 'ROWS')
+        ranges = request.query.getall('ranges', [])
+        return web.json_response({
+            'spreadsheetId': request.match_info['sid'],
+            'valueRanges': [spreadsheet.values(a1_range, major) for a1_range in ranges],
+        })
+
+    async def file_metadata(request: web.Request) -> web.Response:
+        return web.json_response({
+            'version': str(spreadsheet.version),
+            'modifiedTime': spreadsheet.modified_time.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        })
+
+    async def export(request: web.Request) -> web.Response:
+        content = await asyncio.to_thread(spreadsheet.xlsx)
+        return web.Response(
+            body=content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    async def watch(request: web.Request) -> web.Response:
+        body = await request.json()
+        channel = StubChannel(body['id'], body['address'], body.get('token') or '',
+                              resource_id=f"stub-{request.match_info['sid']}",
+                              expiration_ms=int(body.get('expiration') or (time.time() + 3600) * 1000))
+        request.app[CHANNELS_KEY][channel.channel_id] = channel
+        # Как Drive: сразу после создания канала — сообщение sync
+        asyncio.create_task(_notify(request.app, [channel], 'sync'))
+        return web.json_response({'kind': 'api#channel', 'id': channel.channel_id,
+                                  'resourceId': channel.resource_id, 'expiration': str(channel.expiration_ms)})
+
+    async def stop(request: web.Request) -> web.Response:
+        body = await request.json()
+        request.app[CHANNELS_KEY].pop(body.get('id'), None)
+        return web.Response(status=204)
+
+    async def append_rows(request: web.Request) -> web.Response:
+        title = request.query.get('sheet') or next(iter(spreadsheet.sheets))
+        spreadsheet.append(title, int(request.query.get('rows', '1')))
+        channels = list(request.app[CHANNELS_KEY].values())
+        asyncio.create_task(_notify(request.app, channels, 'update'))
+        return web.json_response({'version': spreadsheet.version, 'rows': len(spreadsheet.sheets[title]) - 1,
+                                  'notified': len(channels)})
+
+    app = web.Application(middlewares=[count_bytes])
+    app[STATS_KEY] = {'requests': 0, 'bytes': 0, 'rejected': 0, 'notifications': 0}
+    app[CHANNELS_KEY] = {}
+    app.router.add_post('/drive/v3/files/{sid}/watch', watch)
+    app.router.add_post('/drive/v3/channels/stop', stop)
+    app.router.add_post('/stub/append', append_rows)
+    app.router.add_get('/v4/spreadsheets/{sid}/values:batchGet', batch_get)
+    app.router.add_get('/v4/spreadsheets/{sid}', metadata)
+    app.router.add_get('/drive/v3/files/{sid}/export', export)
+    app.router.add_get('/drive/v3/files/{sid}', file_metadata)
+    return app
+
+
+async def _notify(app: web.Application, channels: list[StubChannel], state: str) -> None:
+    """Разослать уведомление по каналам (ошибки доставки не мешают заглушке)."""
+    async with aiohttp.ClientSession() as session:
+        for channel in channels:
+            try:
+                await send_notification(session, channel, state)
+                app[STATS_KEY]['notifications'] += 1
+            except aiohttp.ClientError:
+                pass
+
+
+async def start_stub(spreadsheet: StubSpreadsheet, host: str = '127.0.0.1', port: int = 0,
+                     delay: float = 0.0, quota: int = 0) -> tuple[web.AppRunner, str]:
+    """Запустить заглушку в текущем event loop. Returns: (runner, базовый URL)."""
+    runner = web.AppRunner(create_app(spreadsheet, delay, quota))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    spreadsheet = StubSpreadsheet.generate(args.rows, args.sheets)
+    runner, url = await start_stub(spreadsheet, args.host, args.port, args.delay_ms / 1000, args.quota)
+    print(f"Sheets API: {url}/v4/spreadsheets\nDrive API:  {url}/drive/v3")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка Google Sheets / Drive API")
+    parser.add_argument('--rows', type=int, default=10000, help="Строк в каждом листе")
+    parser.add_argument('--sheets', type=int, default=3, help="Листов в таблице")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help="Задержка каждого ответа, мс")
+    parser.add_argument('--quota', type=int, default=0, help="Запросов в минуту до ответов 429 (0 — без лимита)")
+    asyncio.run(_serve(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Бенчмарк записи TaskList: построчный UPSERT, пакетный и COPY + слияние.
+
+Запуск (нужна БД из APP_GOOGLE_DB, таблицы создаются в отдельной схеме):
+    python -m src.app_google.bench.upsert --rows 1000 10000 100000 --schema bench
+
+Каждый размер прогоняется трижды на пустой таблице: вставка, повтор тех же
+строк (без изменений — UPSERT их пропускает) и обновление с новыми хэшами.
+
+--shards N — запись save_tasks_parallel на N соединениях (шарды по хэшу link_post,
+не больше размера пула); в отчёте — строк/с каждого шарда.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from datetime import date, timedelta
+
+import pyarrow as pa
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app_google.config import DB_SCHEMA, UPSERT_BATCH_SIZE
+from src.app_google.models import Base, TaskList
+from src.app_google.writer import TASK_SCHEMA, save_tasks_parallel
+from src.config.database import engine
+
+
+def make_tasks(count: int, seed: int = 42) -> pa.Table:
+    """Синтетические типизированные записи TaskList (как после transform)."""
+    rnd = random.Random(seed)
+    start = date(2026, 1, 1)
+    return pa.Table.from_pydict({
+        'link_post': [f"https://t.me/bench_channel_{i % 997}/{i}" for i in range(count)],
+        'number': [str(i + 1) for i in range(count)],
+        'date_comment': [start + timedelta(days=i % 365) for i in range(count)],
+        'short_description': [f"Описание поста {i}" for i in range(count)],
+        'autor': [None] * count,
+        'subscribers': [rnd.randint(100, 2_000_000) for _ in range(count)],
+        'comment': [f"Комментарий {rnd.random():.6f}" for _ in range(count)],
+        'corrections': [None] * count,
+        'responsible': [rnd.choice(['Иванов', 'Петров', 'Сидорова']) for _ in range(count)],
+        'status': [rnd.choice(['new', 'published', 'rejected']) for _ in range(count)],
+        'row_hash': [f"{seed:08x}{i:024x}" for i in range(count)],
+        'sheet_name': ['bench'] * count,
+        'source_tag': [None] * count,
+    }, schema=TASK_SCHEMA)
+
+
+async def _reset_table(bench_engine, schema: str) -> None:
+    """Пустая таблица TaskList в схеме бенчмарка."""
+    async with bench_engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        await conn.run_sync(Base.metadata.create_all, tables=[TaskList.__table__])
+        await conn.execute(TaskList.__table__.delete())
+
+
+async def run(sizes: list[int], schema: str, batch_size: int, shards: int = 1) -> None:
+    if engine is None:
+        raise SystemExit("engine не инициализирован: задайте APP_GOOGLE_DB")
+
+    bench_engine = engine.execution_options(schema_translate_map={DB_SCHEMA: schema})
+    session_factory = async_sessionmaker(bench_engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"{'rows':>8} | {'mode':>7} | {'pass':>6} | {'sec':>8} | {'rows/s':>9} | ins / upd / same / err | stages")
+    for size in sizes:
+        original, changed = make_tasks(size), make_tasks(size, seed=7)
+        for mode in ('row', 'batch', 'staging'):
+            await _reset_table(bench_engine, schema)
+            for label, tasks in (('insert', original), ('same', original), ('update', changed)):
+                started = time.perf_counter()
+                stats = await save_tasks_parallel(
+                    tasks, shards=shards, mode=mode, batch_size=batch_size, session_factory=session_factory
+                )
+                elapsed = time.perf_counter() - started
+                stages = ', '.join(f"{name}={sec:.2f}" for name, sec in stats['timings'].items())
+                print(f"{size:>8} | {mode:>7} | {label:>6} | {elapsed:8.2f} | {size / elapsed:9.0f} | "
+                      f"{stats['inserted']} / {stats['updated']} / {stats['unchanged']} / {stats['errors']} | {stages}")
+                for shard in stats.get('shards', []):
+                    print(f"{'':>8} | {'':>7} | {'#' + str(shard['shard']):>6} | {shard['seconds']:8.2f} | "
+                          f"{shard['rows_per_sec'] or 0:9.0f} | {shard['rows']} строк")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--batch-size', type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument('--shards', type=int, default=1, help="Параллельных соединений записи")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.schema, args.batch_size, args.shards))
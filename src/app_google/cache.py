@@ -0,0 +1,167 @@
+"""
+Дисковый кэш экспортов Google Sheets (XLSX) для app_google.
+
+Файлы адресуются по содержимому: objects/<sha256>.xlsx — одинаковый экспорт
+хранится один раз. Ссылки refs/<file_code>/<revision> указывают, какой объект
+соответствует ревизии файла, поэтому повторные запуски и перезапуски на той же
+ревизии не скачивают файл заново. Размер кэша ограничен: при превышении
+удаляются давно не использованные объекты (LRU по mtime, обновляется при чтении).
+Зависимости: src.app_google.config, src.config.logger
+"""
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+from src.app_google.config import EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES, SPOOL_MAX_MEMORY
+from src.config.logger import logger
+
+# Размер куска при потоковой записи
+CHUNK_SIZE: int = 1 << 16
+
+
+class MappedFile(mmap.mmap):
+    """Файл, отображённый в память (только чтение), как файловый объект для zipfile/openpyxl."""
+
+    def seekable(self) -> bool:  # mmap до Python 3.13 не объявляет seekable()
+        return True
+
+
+def _safe_name(value: str) -> str:
+    """Имя файла из произвольной строки (id таблицы, ревизия)."""
+    return ''.join(ch if ch.isalnum() or ch in '-_.' else '_' for ch in value) or '_'
+
+
+class ExportCache:
+    """Content-addressed кэш файлов экспорта с LRU-вытеснением по суммарному размеру."""
+
+    def __init__(self, root: str | Path = EXPORT_CACHE_DIR, max_bytes: int = EXPORT_CACHE_MAX_BYTES,
+                 spool_max_memory: int = SPOOL_MAX_MEMORY):
+        """
+        Args:
+            root: Каталог кэша.
+            max_bytes: Предельный суммарный размер объектов.
+            spool_max_memory: До этого размера загрузка держится в памяти, дальше — во временном файле.
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.spool_max_memory = spool_max_memory
+        self._lock = threading.Lock()
+
+    @property
+    def objects_dir(self) -> Path:
+        return self.root / 'objects'
+
+    @property
+    def refs_dir(self) -> Path:
+        return self.root / 'refs'
+
+    @property
+    def tmp_dir(self) -> Path:
+        """Временные файлы рядом с кэшем (например, Arrow IPC из пула разбора)."""
+        return self.root / 'tmp'
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / f"{digest}.xlsx"
+
+    def _ref_path(self, file_code: str, revision: str) -> Path:
+        return self.refs_dir / _safe_name(file_code) / _safe_name(revision)
+
+    def lookup(self, file_code: str, revision: Optional[str]) -> Optional[tuple[Path, str]]:
+        """
+        Закэшированный экспорт ревизии файла.
+
+        Returns:
+            (путь к файлу, sha256) или None, если ревизии нет в кэше.
+        """
+        if revision is None:
+            return None
+        ref = self._ref_path(file_code, revision)
+        try:
+            digest = ref.read_text().strip()
+        except OSError:
+            return None
+
+        path = self._object_path(digest)
+        try:
+            os.utime(path)  # отметка использования для LRU
+        except OSError:
+            ref.unlink(missing_ok=True)  # объект вытеснен — ссылка больше не нужна
+            return None
+        return path, digest
+
+    def store(self, chunks: Iterable[bytes], file_code: str, revision: Optional[str]) -> tuple[Path, str, int]:
+        """
+        Сохранить загрузку в кэш, не держа её целиком в памяти.
+
+        Куски пишутся в SpooledTemporaryFile (в памяти до spool_max_memory,
+        дальше — на диске), одновременно считается sha256. Затем файл атомарно
+        переносится в objects/<sha256>.xlsx и на него ставится ссылка ревизии.
+
+        Returns:
+            (путь к файлу, sha256, размер в байтах).
+        """
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory, dir=self.objects_dir) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            spool.seek(0)
+            path = self._object_path(digest.hexdigest())
+            if not path.exists():
+                self._persist(spool, path)
+
+        os.utime(path)
+        if revision is not None:
+            ref = self._ref_path(file_code, revision)
+            ref.parent.mkdir(parents=True, exist_ok=True)
+            ref.write_text(digest.hexdigest())
+        self.evict(keep=path)
+        return path, digest.hexdigest(), size
+
+    def _persist(self, source: BinaryIO, path: Path) -> None:
+        """Записать объект через временный файл и os.replace — читатели не видят недописанный файл."""
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        Удалить давно не использованные объекты, пока кэш больше max_bytes.
+
+        Открытые файлы на POSIX остаются читаемыми после удаления.
+
+        Returns:
+            int: Сколько объектов удалено.
+        """
+        with self._lock:
+            try:
+                objects = [(p, p.stat()) for p in self.objects_dir.glob('*.xlsx')]
+            except OSError:
+                return 0
+            total = sum(stat.st_size for _, stat in objects)
+            removed = 0
+            for path, stat in sorted(objects, key=lambda item: item[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+                removed += 1
+            if removed:
+                logger.debug(f"🧹 Кэш экспортов: удалено {removed} объектов, осталось {total} байт")
+            return removed
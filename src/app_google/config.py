@@ -22,3 +22,104 @@ COLUMN_MAPPING: dict[str, str] = {
     "Ответственный за публикацию": "responsible",
     "Статус опубликования": "status",
 }
+
+# === Загрузка из Google ===
+"""Способ получения листа: 'values' — values.batchGet только нужных столбцов, 'xlsx' — экспорт всей книги.
+При ошибке 'values' пайплайн переходит на 'xlsx'."""
+FETCH_BACKEND: str = os.getenv('APP_GOOGLE_FETCH_BACKEND', 'values')
+"""Базовый URL Sheets API (переопределяется для локальной заглушки, bench/sheets_stub.py)."""
+SHEETS_API_URL: str = os.getenv('APP_GOOGLE_SHEETS_API_URL', 'https://sheets.googleapis.com/v4/spreadsheets')
+"""Базовый URL Drive API (экспорт XLSX)."""
+DRIVE_API_URL: str = os.getenv('APP_GOOGLE_DRIVE_API_URL', 'https://www.googleapis.com/drive/v3')
+"""Каталог дискового кэша экспортов XLSX (cache.py)."""
+EXPORT_CACHE_DIR: str = os.getenv('APP_GOOGLE_CACHE_DIR', 'cache/app_google')
+"""Предельный размер кэша экспортов, байт (давно не использованные файлы вытесняются)."""
+EXPORT_CACHE_MAX_BYTES: int = int(os.getenv('APP_GOOGLE_CACHE_MAX_MB', '512')) * 1024 * 1024
+"""До этого размера загрузка держится в памяти, дальше пишется во временный файл, байт."""
+SPOOL_MAX_MEMORY: int = int(os.getenv('APP_GOOGLE_SPOOL_MB', '4')) * 1024 * 1024
+
+# === Авторизация Google ===
+"""За сколько секунд до истечения access token обновлять его (auth.py)."""
+AUTH_REFRESH_MARGIN: float = float(os.getenv('APP_GOOGLE_AUTH_REFRESH_MARGIN', '300'))
+"""Обновлять токен заранее в фоновом потоке, чтобы запросы не ждали refresh."""
+AUTH_BACKGROUND_REFRESH: bool = os.getenv('APP_GOOGLE_AUTH_BACKGROUND_REFRESH', '1') == '1'
+
+# === Квоты Google API ===
+"""Запросов к Sheets API в минуту на процесс (квота read requests per minute per user — 60)."""
+SHEETS_QUOTA_PER_MINUTE: float = float(os.getenv('APP_GOOGLE_SHEETS_QUOTA', '60'))
+"""Запросов к Drive API в минуту на процесс (метаданные и экспорт)."""
+DRIVE_QUOTA_PER_MINUTE: float = float(os.getenv('APP_GOOGLE_DRIVE_QUOTA', '600'))
+"""Сколько запросов можно отправить подряд без ожидания квоты."""
+QUOTA_BURST: int = int(os.getenv('APP_GOOGLE_QUOTA_BURST', '10'))
+"""Сколько раз повторять запрос после ответа 429."""
+API_MAX_RETRIES: int = int(os.getenv('APP_GOOGLE_API_RETRIES', '5'))
+"""Первая пауза после 429, сек (дальше удваивается, с джиттером)."""
+API_BACKOFF_BASE: float = float(os.getenv('APP_GOOGLE_BACKOFF_BASE', '1'))
+"""Предельная пауза после 429, сек."""
+API_BACKOFF_MAX: float = float(os.getenv('APP_GOOGLE_BACKOFF_MAX', '64'))
+
+# === Разбор листа ===
+"""Строк в одном Arrow RecordBatch при разборе листа."""
+SHEET_BATCH_SIZE: int = int(os.getenv('APP_GOOGLE_SHEET_BATCH', '10000'))
+"""Служебный столбец с номером строки листа (как в Excel, заголовок — строка 1)."""
+SHEET_ROW_COLUMN: str = '_sheet_row'
+"""Сколько батчей разбор листа может опережать преобразование и запись (потоковый режим)."""
+SHEET_PREFETCH_BATCHES: int = int(os.getenv('APP_GOOGLE_SHEET_PREFETCH', '2'))
+"""Парсер XLSX (parsers.py): 'openpyxl' или 'xml' — быстрый разбор только нужных столбцов."""
+PARSER_BACKEND: str = os.getenv('APP_GOOGLE_PARSER', 'openpyxl')
+"""Процессов для разбора XLSX (parse_pool.py); 0 — разбор в потоке текущего процесса.
+С пулом лист разбирается целиком до выдачи первого батча: SHEET_PREFETCH_BATCHES не действует."""
+PARSE_PROCESSES: int = int(os.getenv('APP_GOOGLE_PARSE_PROCESSES', '0'))
+"""Писать в БД только новые строки внизу листа, если строки выше не менялись (tail.py)."""
+TAIL_SYNC: bool = os.getenv('APP_GOOGLE_TAIL_SYNC', '1') == '1'
+"""Файл DuckDB со снимками листов: в БД пишется только разница со снимком (snapshot.py); не задан — выключено."""
+SNAPSHOT_DB: str | None = os.getenv('APP_GOOGLE_SNAPSHOT_DB') or None
+"""Сколько изменившихся ключей на операцию показывать в пробном прогоне (dry_run, preview.py)."""
+DRY_RUN_SAMPLE: int = int(os.getenv('APP_GOOGLE_DRY_RUN_SAMPLE', '20'))
+
+# === Несколько листов ===
+"""Маркер «все листы таблицы» вместо имени листа (журнал обработанных листов, ledger.py)."""
+ALL_SHEETS: str = '*'
+"""Сколько листов обрабатывается одновременно в режиме ALL_SHEETS."""
+SHEET_CONCURRENCY: int = int(os.getenv('APP_GOOGLE_SHEET_CONCURRENCY', '4'))
+
+# === Уведомления Drive ===
+"""Публичный HTTPS-адрес эндпоинта POST /app_google/webhook/drive; не задан — подписка на изменения выключена."""
+WEBHOOK_URL: str | None = os.getenv('APP_GOOGLE_WEBHOOK_URL')
+"""Лист, синхронизируемый по уведомлению (уведомление Drive не говорит, какой лист изменился);
+не задан — лист таблицы из реестра."""
+WEBHOOK_SHEET: str | None = os.getenv('APP_GOOGLE_WEBHOOK_SHEET')
+"""Синхронизация ставится в очередь, когда уведомлений не было столько секунд (правки идут всплесками)."""
+WEBHOOK_DEBOUNCE: float = float(os.getenv('APP_GOOGLE_WEBHOOK_DEBOUNCE', '30'))
+"""Но не позже стольких секунд после первого уведомления всплеска (при непрерывной правке)."""
+WEBHOOK_MAX_DELAY: float = float(os.getenv('APP_GOOGLE_WEBHOOK_MAX_DELAY', '300'))
+"""Срок жизни канала, сек (для файлов Drive — не больше суток)."""
+WATCH_TTL: int = int(os.getenv('APP_GOOGLE_WATCH_TTL', '86400'))
+"""Канал продлевается (создаётся новый, старый останавливается) за столько секунд до истечения."""
+WATCH_RENEW_BEFORE: int = int(os.getenv('APP_GOOGLE_WATCH_RENEW_BEFORE', '3600'))
+"""Как часто проверять сроки каналов, сек."""
+WATCH_CHECK_INTERVAL: float = float(os.getenv('APP_GOOGLE_WATCH_CHECK_INTERVAL', '300'))
+
+# === Реестр таблиц ===
+"""JSON-файл реестра таблиц с одинаковой разметкой (registry.py); не задан — одна таблица APP_GOOGLE_FILE."""
+REGISTRY_FILE: str | None = os.getenv('APP_GOOGLE_REGISTRY')
+
+# === Запись в БД ===
+"""Размер пачки многострочного UPSERT (строк в одном INSERT)."""
+UPSERT_BATCH_SIZE: int = int(os.getenv('APP_GOOGLE_UPSERT_BATCH', '2000'))
+"""Порог строк к записи во всём листе (не в куске COMMIT_CHUNK_ROWS), начиная с которого запись идёт через COPY во временную таблицу; режим выбирается один раз на лист (main._sync_stream)."""
+STAGING_THRESHOLD_ROWS: int = int(os.getenv('APP_GOOGLE_STAGING_THRESHOLD', '20000'))
+"""Строк листа в одной транзакции потоковой записи (после каждой — контрольная точка задания); режим записи — см. STAGING_THRESHOLD_ROWS."""
+COMMIT_CHUNK_ROWS: int = int(os.getenv('APP_GOOGLE_COMMIT_CHUNK', '10000'))
+"""Параллельных соединений записи (шарды по хэшу link_post, не больше размера пула); 1 — одно соединение."""
+WRITE_SHARDS: int = int(os.getenv('APP_GOOGLE_WRITE_SHARDS', '1'))
+
+# === Очередь синхронизаций ===
+"""Воркеров очереди внутри процесса API (0 — только отдельные процессы worker.py)."""
+SYNC_INPROCESS_WORKERS: int = int(os.getenv('APP_GOOGLE_INPROCESS_WORKERS', '1'))
+"""Пауза между опросами пустой очереди, сек."""
+SYNC_POLL_INTERVAL: float = float(os.getenv('APP_GOOGLE_POLL_INTERVAL', '2'))
+"""Интервал сигнала «жив» от воркера, сек."""
+SYNC_HEARTBEAT_INTERVAL: float = float(os.getenv('APP_GOOGLE_HEARTBEAT_INTERVAL', '15'))
+"""Задание без сигнала дольше этого считается брошенным и перезапускается, сек."""
+SYNC_STALE_AFTER: int = int(os.getenv('APP_GOOGLE_STALE_AFTER', '300'))
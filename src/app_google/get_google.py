@@ -1,23 +1,149 @@
 # src/app_google/get_google.py
 """
 Сервис для обработки Google Sheets с поддержкой ограниченного доступа.
-Зависимости: src.config.logger, google-auth, google-auth-oauthlib, gspread, openpyxl
+Зависимости: src.config.logger, google-auth, google-auth-oauthlib, gspread, openpyxl, pyarrow
 """
 import asyncio
-import pickle
+import mmap
+import os
+import tempfile
+import threading
 import gspread
+import pyarrow as pa
 
-from io import BytesIO
 from pathlib import Path
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, BinaryIO, Iterator, Optional
 
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
 from openpyxl import load_workbook
-
-from src.app_google.config import APP_GOOGLE_FILE
+from openpyxl.utils import get_column_letter
+from openpyxl.workbook import Workbook
+
+from src.app_google.auth import GoogleAuth, shared_auth
+from src.app_google.cache import CHUNK_SIZE, ExportCache, MappedFile
+from src.app_google.config import (
+    APP_GOOGLE_FILE, DRIVE_API_URL, PARSER_BACKEND, SHEETS_API_URL, SHEET_BATCH_SIZE, SHEET_PREFETCH_BATCHES,
+    SHEET_ROW_COLUMN,
+)
+from src.app_google.ratelimit import DRIVE_API, SHEETS_API, RequestScheduler, shared_scheduler
 from src.config.logger import logger
 
+if TYPE_CHECKING:
+    from src.app_google.parsers import SheetParser
+
+
+def _cell_to_text(value: Any) -> str | None:
+    """Строковое представление ячейки для столбцов со смешанными типами."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def to_arrow_column(values: list[Any]) -> pa.Array:
+    """
+    Значения столбца листа → Arrow-массив.
+
+    Однородные столбцы сохраняют свой тип (числа, даты); столбцы со смешанными
+    типами приводятся к строкам — их разберёт DuckDB.
+    """
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([_cell_to_text(value) for value in values], type=pa.string())
+
+
+def _header_names(header_row: tuple) -> list[str]:
+    return [
+        str(h).strip() if h is not None else f"column_{idx}"
+        for idx, h in enumerate(header_row)
+    ]
+
+
+def _a1_sheet(list_name: str) -> str:
+    """Имя листа для нотации A1 ('Лист 1'!A1)."""
+    return "'" + list_name.replace("'", "''") + "'"
+
+
+def _values_to_batch(values: list[list[Any]], names: list[str], first_row: int, last_row: int) -> pa.RecordBatch:
+    """
+    Столбцы из values API → RecordBatch с SHEET_ROW_COLUMN.
+
+    API обрезает пустые ячейки в конце столбца и отдаёт пустые ячейки как '';
+    строки, где все запрошенные ячейки пусты, пропускаются (как пустые строки XLSX).
+    """
+    height = last_row - first_row + 1
+    padded = [[None if v == '' else v for v in column] + [None] * (height - len(column)) for column in values]
+    keep = [i for i in range(height) if any(column[i] is not None for column in padded)]
+    arrays = [to_arrow_column([column[i] for i in keep]) for column in padded]
+    arrays.append(pa.array([first_row + i for i in keep], type=pa.int64()))
+    return pa.RecordBatch.from_arrays(arrays, names=[*names, SHEET_ROW_COLUMN])
+
+
+def read_sheet_headers(workbook: Workbook, list_name: str) -> list[str] | None:
+    """Заголовки листа открытой книги (None — листа нет, [] — лист пустой)."""
+    if list_name not in workbook.sheetnames:
+        logger.error(f"Лист '{list_name}' не найден. Доступные: {workbook.sheetnames}")
+        return None
+    header_row = next(workbook[list_name].iter_rows(values_only=True, max_row=1), None)
+    return _header_names(header_row) if header_row else []
+
+
+def iter_sheet_batches(workbook: Workbook, list_name: str, columns: list[str] | None,
+                       batch_size: int = SHEET_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Потоковый разбор листа открытой книги: RecordBatch'и по batch_size строк.
+
+    В памяти одновременно только текущий батч. Берутся только столбцы columns
+    (все — если None); пустые строки пропускаются. К каждому батчу добавляется
+    столбец SHEET_ROW_COLUMN с номером строки листа.
+    """
+    if list_name not in workbook.sheetnames:
+        logger.error(f"Лист '{list_name}' не найден. Доступные: {workbook.sheetnames}")
+        return
+
+    rows = workbook[list_name].iter_rows(values_only=True)
+    header_row = next(rows, None)
+    if not header_row:
+        logger.warning("Лист пустой")
+        return
+
+    # При повторяющихся заголовках берётся последний столбец (как в get_sheet_data)
+    positions = {header: idx for idx, header in enumerate(_header_names(header_row))}
+    names = columns or list(positions)
+    indexes = [positions.get(name) for name in names]
+
+    def _make_batch(values: list[list[Any]], row_numbers: list[int]) -> pa.RecordBatch:
+        arrays = [to_arrow_column(column) for column in values]
+        arrays.append(pa.array(row_numbers, type=pa.int64()))
+        return pa.RecordBatch.from_arrays(arrays, names=[*names, SHEET_ROW_COLUMN])
+
+    values: list[list[Any]] = [[] for _ in names]
+    row_numbers: list[int] = []
+    for row_number, row in enumerate(rows, start=2):
+        if not row or all(cell is None for cell in row):
+            continue
+        width = len(row)
+        for column, idx in zip(values, indexes):
+            column.append(row[idx] if idx is not None and idx < width else None)
+        row_numbers.append(row_number)
+
+        if len(row_numbers) >= batch_size:
+            yield _make_batch(values, row_numbers)
+            values, row_numbers = [[] for _ in names], []
+
+    if row_numbers:
+        yield _make_batch(values, row_numbers)
+
+
+def read_sheet_batches(workbook: Workbook, list_name: str, columns: list[str] | None,
+                       batch_size: int = SHEET_BATCH_SIZE) -> list[pa.RecordBatch] | None:
+    """Все батчи листа открытой книги списком (None — листа нет)."""
+    if list_name not in workbook.sheetnames:
+        logger.error(f"Лист '{list_name}' не найден. Доступные: {workbook.sheetnames}")
+        return None
+    return list(iter_sheet_batches(workbook, list_name, columns, batch_size))
+
 
 class GoogleSheetProcessor:
     """
@@ -29,14 +155,10 @@ class GoogleSheetProcessor:
     - Асинхронный интерфейс с выполнением блокирующих операций в потоке
     """
 
-    # Права доступа: только чтение таблиц
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-
-    # Пути к файлам авторизации (относительно корня проекта или абсолютные)
-    CREDENTIALS_FILE = Path('credentials.json')  # Скачать из Google Cloud Console
-    TOKEN_FILE = Path('token_google.pkl')  # Создается автоматически
-
-    def __init__(self, timeout: int = 30, spreadsheet_id: Optional[str] = None):
+    def __init__(self, timeout: int = 30, spreadsheet_id: Optional[str] = None,
+                 sheets_api_url: Optional[str] = None, drive_api_url: Optional[str] = None,
+                 export_cache: Optional[ExportCache] = None, auth: Optional[GoogleAuth] = None,
+                 scheduler: Optional[RequestScheduler] = None, parser: Optional[str] = None):
         """
         Инициализация процессора.
 
@@ -44,103 +166,247 @@ class GoogleSheetProcessor:
             timeout: Таймаут сетевых запросов в секундах
             spreadsheet_id: Идентификатор таблицы (из URL между /d/ и /edit).
                            Если не указан, берётся из APP_GOOGLE_FILE.
+            sheets_api_url: Базовый URL Sheets API (по умолчанию SHEETS_API_URL).
+            drive_api_url: Базовый URL Drive API (по умолчанию DRIVE_API_URL).
+            export_cache: Дисковый кэш экспортов (по умолчанию — в EXPORT_CACHE_DIR).
+            auth: Держатель авторизации (по умолчанию — общий на процесс, auth.shared_auth()).
+            scheduler: Квоты и single-flight запросов (по умолчанию — общий на процесс).
+            parser: Парсер XLSX из parsers.PARSERS (по умолчанию PARSER_BACKEND).
         """
         self.timeout = timeout
         self.spreadsheet_id = spreadsheet_id or APP_GOOGLE_FILE.strip()
+        self.sheets_api_url = (sheets_api_url or SHEETS_API_URL).rstrip('/')
+        self.drive_api_url = (drive_api_url or DRIVE_API_URL).rstrip('/')
 
-        # Кэш контента файла
-        self._cached_content: bytes | None = None
-        self._cached_file_code: str | None = None
+        # Сколько байт ответов получено от Google (экспорт и values API, после распаковки)
+        self.bytes_fetched: int = 0
 
-        # Клиент gspread (инициализируется при первой авторизации)
-        self._client: gspread.Client | None = None
+        # Экспорт файла: лежит в дисковом кэше, в памяти только отображение (mmap)
+        self.export_cache = export_cache or ExportCache()
+        self._cached_path: Path | None = None
+        self._cached_file_code: str | None = None
+        self._content_hash: str | None = None
+        self._mapped_file: BinaryIO | None = None
+        self._mapped: MappedFile | None = None
+        self._mapped_key: tuple[str, str] | None = None
+
+        # Разобранная книга (read_only) для закэшированного контента: ключ — (file_code, content_hash)
+        self._workbook: Workbook | None = None
+        self._workbook_key: tuple[str, str] | None = None
+        self._workbook_lock = threading.RLock()
+
+        # Парсер листов (parsers.py) над той же книгой / отображением файла
+        self.parser_name = parser or PARSER_BACKEND
+        self._parser: Optional['SheetParser'] = None
+        self._parser_key: tuple[str, str] | None = None
+
+        # Авторизация общая на процесс: токен в памяти между запусками, refresh только перед истечением
+        self.auth = auth or shared_auth()
+        # Квоты API, повторы после 429 и объединение одновременных загрузок — тоже на процесс
+        self.scheduler = scheduler or shared_scheduler()
 
     def _get_authenticated_client(self) -> gspread.Client:
         """
-        Получить авторизованный клиент gspread.
-
-        При первом вызове:
-        - Проверяет сохранённый токен
-        - При необходимости запускает браузер для входа
-        - Сохраняет новый токен
+        Получить авторизованный клиент gspread (общий для всех процессоров процесса).
 
         Returns:
             gspread.Client: Авторизованный клиент
         """
-        # Если клиент уже создан и токен валиден — возвращаем его
-        if self._client is not None:
-            try:
-                # Проверяем валидность токена (может выбросить исключение)
-                self._client.auth.refresh(Request())
-                return self._client
-            except Exception:
-                logger.debug("Токен истёк, выполняем повторную авторизацию...")
-                self._client = None
+        return self.auth.get_client()
 
-        creds = None
+    def _export_xlsx_sync(self, target_id: str, revision: Optional[str]) -> tuple[Path, str, int]:
+        """
+        Экспорт всей книги в XLSX через Drive API (тот же запрос, что spreadsheet.export в gspread).
 
-        # Пробуем загрузить сохранённый токен
-        if self.TOKEN_FILE.exists():
-            try:
-                with open(self.TOKEN_FILE, 'rb') as f:
-                    creds = pickle.load(f)
-            except Exception as e:
-                logger.warning(f"Не удалось загрузить токен: {e}. Удаляю повреждённый файл.")
-                self.TOKEN_FILE.unlink(missing_ok=True)
-                creds = None
-
-        # Если токена нет или он невалиден — запускаем поток авторизации
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                # Пробуем обновить токен без браузера
-                try:
-                    creds.refresh(Request())
-                    logger.info("Токен успешно обновлён")
-                except Exception as e:
-                    logger.warning(f"Не удалось обновить токен: {e}. Запрашиваю вход через браузер...")
-                    creds = None
-
-            if not creds:
-                # Требуется вход через браузер
-                if not self.CREDENTIALS_FILE.exists():
-                    raise FileNotFoundError(
-                        f"Файл {self.CREDENTIALS_FILE} не найден!\n"
-                        "Скачайте его из Google Cloud Console: "
-                        "APIs & Services → Credentials → Create Credentials → OAuth client ID (Desktop app)"
-                    )
-
-                logger.info("🔐 Откройте браузер для авторизации в Google...")
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    str(self.CREDENTIALS_FILE),
-                    self.SCOPES
+        Ответ читается потоком прямо в дисковый кэш, целиком в памяти не собирается.
+
+        Returns:
+            (путь к файлу в кэше, sha256, размер).
+        """
+        client = self._get_authenticated_client()
+
+        def export() -> tuple[Path, str, int]:
+            response = client.http_client.session.get(
+                f"{self.drive_api_url}/files/{target_id}/export",
+                params={'mimeType': gspread.utils.ExportFormat.EXCEL}, stream=True, timeout=self.timeout,
+            )
+            with response:
+                if not response.ok:
+                    raise gspread.exceptions.APIError(response)
+                return self.export_cache.store(response.iter_content(CHUNK_SIZE), target_id, revision)
+
+        return self.scheduler.call(DRIVE_API, export)
+
+    def _load_export_sync(self, target_id: str, revision: Optional[str]) -> tuple[Path, str, int]:
+        """
+        Экспорт из дискового кэша, а если ревизии там нет — из Drive.
+
+        Returns:
+            (путь к файлу в кэше, sha256, скачано байт — 0 для кэша).
+        """
+        cached = self.export_cache.lookup(target_id, revision)
+        if cached is not None:
+            logger.info(f"💾 Таблица {target_id} (ревизия {revision}) взята из кэша: {cached[0]}")
+            return cached[0], cached[1], 0
+        logger.info(f"📥 Загрузка таблицы: {target_id}")
+        return self._export_xlsx_sync(target_id, revision)
+
+    def _values_request_sync(self, target_id: str, path: str, params: list[tuple[str, Any]]) -> dict[str, Any]:
+        """GET к Sheets API от имени авторизованного клиента; ответ — JSON."""
+        client = self._get_authenticated_client()
+        client.http_client.set_timeout(self.timeout)
+        response = self.scheduler.call(SHEETS_API, lambda: client.http_client.request(
+            'get', f"{self.sheets_api_url}/{target_id}{path}", params=params
+        ))
+        self.bytes_fetched += len(response.content)
+        return response.json()
+
+    def _fetch_sheet_layout_sync(self, target_id: str, list_name: str) -> tuple[list[str], int]:
+        """Заголовки листа и число строк сетки (два лёгких запроса к Sheets API)."""
+        meta = self._values_request_sync(target_id, '', [('fields', 'sheets.properties(title,gridProperties.rowCount)')])
+        row_counts = {sheet['properties']['title']: sheet['properties'].get('gridProperties', {}).get('rowCount', 0)
+                      for sheet in meta.get('sheets', [])}
+        if list_name not in row_counts:
+            raise LookupError(f"Лист '{list_name}' не найден. Доступные: {list(row_counts)}")
+
+        header = self._values_request_sync(target_id, '/values:batchGet', [
+            ('ranges', f"{_a1_sheet(list_name)}!1:1"), ('majorDimension', 'ROWS'),
+            ('valueRenderOption', 'FORMATTED_VALUE'),
+        ])
+        values = (header.get('valueRanges') or [{}])[0].get('values') or [[]]
+        return _header_names(tuple(values[0])), row_counts[list_name]
+
+    def _fetch_columns_sync(self, target_id: str, list_name: str, letters: list[str | None],
+                            first_row: int, last_row: int) -> list[list[Any]]:
+        """Значения столбцов (буквы A1) в строках first_row..last_row: по списку на столбец."""
+        ranges = [(i, letter) for i, letter in enumerate(letters) if letter is not None]
+        result: list[list[Any]] = [[] for _ in letters]
+        if not ranges:
+            return result
+
+        sheet = _a1_sheet(list_name)
+        params: list[tuple[str, Any]] = [('ranges', f"{sheet}!{letter}{first_row}:{letter}{last_row}") for _, letter in ranges]
+        params += [('majorDimension', 'COLUMNS'), ('valueRenderOption', 'UNFORMATTED_VALUE'),
+                   ('dateTimeRenderOption', 'FORMATTED_STRING')]
+        response = self._values_request_sync(target_id, '/values:batchGet', params)
+        for (i, _), value_range in zip(ranges, response.get('valueRanges', [])):
+            values = value_range.get('values') or [[]]
+            result[i] = values[0]
+        return result
+
+    async def stream_sheet_values(self, list_name: str, columns: list[str],
+                                  batch_size: int = SHEET_BATCH_SIZE,
+                                  file_code: Optional[str] = None) -> tuple[list[str], AsyncIterator[pa.RecordBatch]]:
+        """
+        Лист через Sheets API values.batchGet: только столбцы columns, без экспорта книги.
+
+        Сначала запрашиваются заголовки и размер листа, затем строки страницами
+        по batch_size — по одному batchGet на страницу со всеми нужными столбцами.
+        Батчи совпадают по формату с stream_sheet_batches (включая SHEET_ROW_COLUMN).
+
+        Returns:
+            (заголовки листа, асинхронный поток батчей).
+
+        Raises:
+            gspread.exceptions.APIError, LookupError: Ошибка API или листа нет —
+            вызывающий может перейти на экспорт XLSX.
+        """
+        target_id = (file_code or self.spreadsheet_id).strip()
+        headers, row_count = await asyncio.to_thread(self._fetch_sheet_layout_sync, target_id, list_name)
+
+        # При повторяющихся заголовках берётся последний столбец (как в разборе XLSX)
+        positions = {header: idx for idx, header in enumerate(headers)}
+        letters = [get_column_letter(positions[name] + 1) if name in positions else None for name in columns]
+
+        async def _pages() -> AsyncIterator[pa.RecordBatch]:
+            rows = 0
+            for first_row in range(2, row_count + 1, batch_size):
+                last_row = min(first_row + batch_size - 1, row_count)
+                values = await asyncio.to_thread(
+                    self._fetch_columns_sync, target_id, list_name, letters, first_row, last_row
                 )
-                creds = flow.run_local_server(port=0, open_browser=True)
-                logger.info("✅ Авторизация успешна")
+                batch = _values_to_batch(values, columns, first_row, last_row)
+                if batch.num_rows:
+                    rows += batch.num_rows
+                    yield batch
+            logger.info(f"✅ Получено строк из листа '{list_name}' (values API): {rows}")
+
+        return headers, _pages()
+
+    def _fetch_revision_sync(self, target_id: str) -> str | None:
+        """Метаданные файла в Drive: version (растёт при любом изменении), иначе modifiedTime."""
+        client = self._get_authenticated_client()
+        client.http_client.set_timeout(self.timeout)
+        response = self.scheduler.call(DRIVE_API, lambda: client.http_client.request(
+            'get', f"{self.drive_api_url}/files/{target_id}", params={'fields': 'version,modifiedTime'}
+        ))
+        self.bytes_fetched += len(response.content)
+        meta = response.json()
+        revision = meta.get('version') or meta.get('modifiedTime')
+        return str(revision) if revision is not None else None
+
+    async def get_revision(self, file_code: Optional[str] = None) -> str | None:
+        """
+        Текущая ревизия файла — без скачивания содержимого.
 
-            # Сохраняем токен для будущих запусков
-            try:
-                with open(self.TOKEN_FILE, 'wb') as f:
-                    pickle.dump(creds, f)
-                self.TOKEN_FILE.chmod(0o600)  # Защита файла токена
-                logger.debug(f"Токен сохранён в {self.TOKEN_FILE}")
-            except Exception as e:
-                logger.warning(f"Не удалось сохранить токен: {e}. При следующем запуске потребуется вход.")
+        Returns:
+            str | None: Ревизия или None, если метаданные недоступны (например, токен
+            выдан без drive.metadata.readonly) — тогда файл считается изменившимся.
+        """
+        target_id = (file_code or self.spreadsheet_id).strip()
+        try:
+            revision = await asyncio.to_thread(self._fetch_revision_sync, target_id)
+            logger.debug(f"🔖 Ревизия файла {target_id}: {revision}")
+            return revision
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось получить ревизию файла {target_id}: {type(e).__name__}: {e}")
+            return None
+
+    def _drive_post_sync(self, path: str, body: dict[str, Any]) -> dict[str, Any]:
+        """POST к Drive API от имени авторизованного клиента; ответ — JSON (или пустой)."""
+        client = self._get_authenticated_client()
+        client.http_client.set_timeout(self.timeout)
+        response = self.scheduler.call(DRIVE_API, lambda: client.http_client.request(
+            'post', f"{self.drive_api_url}{path}", json=body
+        ))
+        return response.json() if response.content else {}
+
+    async def watch_file(self, file_code: str, channel_id: str, address: str, token: str,
+                         expiration_ms: int) -> dict[str, Any]:
+        """
+        Подписаться на изменения файла (Drive files.watch): уведомления придут POST на address.
+
+        Args:
+            channel_id: Уникальный id канала (приходит в X-Goog-Channel-ID).
+            token: Секрет канала (приходит в X-Goog-Channel-Token).
+            expiration_ms: Желаемое время истечения канала, мс от эпохи (Drive может сократить).
+
+        Returns:
+            dict: Ответ Drive: id, resourceId, expiration (мс от эпохи, строкой).
+        """
+        body = {'id': channel_id, 'type': 'web_hook', 'address': address, 'token': token,
+                'expiration': expiration_ms}
+        return await asyncio.to_thread(self._drive_post_sync, f"/files/{file_code.strip()}/watch", body)
 
-        # Создаём и возвращаем клиент
-        self._client = gspread.authorize(creds)
-        return self._client
+    async def stop_channel(self, channel_id: str, resource_id: str) -> None:
+        """Остановить канал уведомлений (Drive channels.stop)."""
+        await asyncio.to_thread(self._drive_post_sync, '/channels/stop', {'id': channel_id, 'resourceId': resource_id})
 
-    async def download_file(self, file_code: Optional[str] = None) -> bool:
+    async def download_file(self, file_code: Optional[str] = None, revision: Optional[str] = None) -> bool:
         """
-        Скачать Google Sheet в память и закэшировать.
+        Скачать Google Sheet в дисковый кэш экспортов.
 
         При повторном вызове с тем же file_code — скачивание пропускается.
+        Если ревизия файла известна (get_revision) и уже есть в кэше — файл берётся
+        с диска, в том числе после перезапуска процесса. Одновременные вызовы
+        для той же ревизии (из разных процессоров) ждут одну загрузку.
 
         Важно: Авторизация выполняется от имени пользователя,
         чей аккаунт имеет доступ к таблице.
 
         Args:
             file_code: Идентификатор файла (опционально, переопределяет значение из __init__).
+            revision: Ревизия файла — ключ дискового кэша.
 
         Returns:
             bool: True если файл загружен успешно, False при ошибке.
@@ -148,34 +414,33 @@ class GoogleSheetProcessor:
         target_id = (file_code or self.spreadsheet_id).strip()
 
         # Если файл уже загружен и ID совпадает — используем кэш
-        if self._cached_content is not None and self._cached_file_code == target_id:
+        if self._cached_path is not None and self._cached_file_code == target_id:
             logger.debug(f"✅ Используем кэш для файла: {target_id}")
             return True
 
         try:
-            logger.info(f"📥 Загрузка таблицы: {target_id}")
-
-            # Выполняем блокирующий вызов API в отдельном потоке
-            def _fetch_sync() -> bytes:
-                client = self._get_authenticated_client()
-                spreadsheet = client.open_by_key(target_id)
-                # Экспортируем в байты XLSX через внутренний метод gspread
-                return spreadsheet.export(gspread.utils.ExportFormat.EXCEL)
-
-            content = await asyncio.to_thread(_fetch_sync)
-
-            # Кэшируем результат
-            self._cached_content = content
+            # Блокирующий вызов API выполняется в потоке; одновременные загрузки ревизии объединяются
+            (path, digest, size), shared = await self.scheduler.single_flight(
+                (target_id, revision), lambda: self._load_export_sync(target_id, revision)
+            )
+            if size and not shared:
+                self.bytes_fetched += size
+                logger.debug(f"✅ Файл загружен и закэширован: {size} байт → {path}")
+
+            self.clear_cache()
+            self._cached_path = path
             self._cached_file_code = target_id
-
-            logger.debug(f"✅ Файл загружен и закэширован: {len(content)} байт")
+            self._content_hash = digest
             return True
 
         except gspread.exceptions.SpreadsheetNotFound:
             logger.error(f"❌ 404: Таблица '{target_id}' не найдена. Проверьте ID и права доступа аккаунта.")
             return False
         except gspread.exceptions.APIError as e:
-            logger.error(f"❌ API Error: {e}. Возможно, у аккаунта нет доступа к таблице.")
+            if e.code == 404:
+                logger.error(f"❌ 404: Таблица '{target_id}' не найдена. Проверьте ID и права доступа аккаунта.")
+            else:
+                logger.error(f"❌ API Error: {e}. Возможно, у аккаунта нет доступа к таблице.")
             return False
         except FileNotFoundError as e:
             logger.error(f"❌ {e}")
@@ -184,10 +449,90 @@ class GoogleSheetProcessor:
             logger.error(f"❌ download_file: {type(e).__name__}: {e}", exc_info=True)
             return False
 
-    def _parse_sheet_names_sync(self, content: bytes) -> list[str]:
-        """Синхронный парсинг имён листов (для выполнения в потоке)."""
-        workbook = load_workbook(filename=BytesIO(content), read_only=True, data_only=True)
-        return workbook.sheetnames
+    def get_workbook(self) -> Workbook:
+        """
+        Разобранная книга закэшированного файла (openpyxl, read_only).
+
+        Книга открывается один раз на (file_code, хэш контента) и переиспользуется
+        для имён листов, заголовков и строк; листы можно читать из разных потоков.
+        Закрывается в clear_cache().
+
+        Raises:
+            RuntimeError: Файл не загружен.
+        """
+        if self._cached_path is None:
+            raise RuntimeError("Файл не загружен. Сначала вызовите download_file(file_code)")
+
+        key = (self._cached_file_code, self._content_hash)
+        with self._workbook_lock:
+            if self._workbook is None or self._workbook_key != key:
+                self._workbook_close_only()
+                self._workbook = load_workbook(filename=self._map_file(key), read_only=True, data_only=True)
+                self._workbook_key = key
+                logger.debug(f"📖 Книга разобрана: {key[0]} ({key[1][:12]})")
+            return self._workbook
+
+    def get_parser(self) -> 'SheetParser':
+        """
+        Парсер листов закэшированного файла (parser_name, см. parsers.py).
+
+        Открывается один раз на (file_code, хэш контента); парсер openpyxl использует
+        ту же книгу, что get_workbook(). Закрывается в clear_cache().
+
+        Raises:
+            RuntimeError: Файл не загружен.
+            ValueError: Неизвестный парсер.
+        """
+        from src.app_google.parsers import OpenpyxlParser, open_parser  # цикл импортов
+
+        if self._cached_path is None:
+            raise RuntimeError("Файл не загружен. Сначала вызовите download_file(file_code)")
+
+        key = (self._cached_file_code, self._content_hash)
+        with self._workbook_lock:
+            if self._parser is None or self._parser_key != key:
+                if self._parser is not None:
+                    self._parser.close()
+                if self.parser_name == OpenpyxlParser.name:
+                    self._parser = OpenpyxlParser(self.get_workbook())
+                else:
+                    self._parser = open_parser(self.parser_name, self._map_file(key))
+                self._parser_key = key
+            return self._parser
+
+    def _map_file(self, key: tuple[str, str]) -> MappedFile:
+        """Отображение файла экспорта в память (страницы подгружает ОС, байты не копируются)."""
+        if self._mapped is None or self._mapped_key != key:
+            self._close_workbook()
+            self._mapped_file = open(self._cached_path, 'rb')
+            self._mapped = MappedFile(self._mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_key = key
+        return self._mapped
+
+    def _workbook_close_only(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+        self._workbook = None
+        self._workbook_key = None
+
+    def _close_workbook(self) -> None:
+        """Закрыть книгу, парсер и отображение файла."""
+        self._workbook_close_only()
+        if self._parser is not None:
+            self._parser.close()
+        if self._mapped is not None:
+            self._mapped.close()
+        if self._mapped_file is not None:
+            self._mapped_file.close()
+        self._parser = None
+        self._parser_key = None
+        self._mapped = None
+        self._mapped_key = None
+        self._mapped_file = None
+
+    def _parse_sheet_names_sync(self) -> list[str]:
+        """Синхронное получение имён листов (для выполнения в потоке)."""
+        return self.get_parser().sheetnames
 
     async def get_sheet_names(self) -> list[str] | None:
         """
@@ -196,42 +541,39 @@ class GoogleSheetProcessor:
         Returns:
             list[str] | None: Список имён листов или None если файл не загружен/ошибка.
         """
-        if self._cached_content is None:
+        if self._cached_path is None:
             logger.error("❌ Файл не загружен. Сначала вызовите download_file(file_code)")
             return None
 
         try:
-            sheet_names = await asyncio.to_thread(self._parse_sheet_names_sync, self._cached_content)
+            sheet_names = await asyncio.to_thread(self._parse_sheet_names_sync)
             logger.info(f"📋 Найдено листов ({len(sheet_names)}): {sheet_names}")
             return sheet_names
         except Exception as e:
             logger.error(f"❌ Ошибка парсинга имён листов: {e}", exc_info=True)
             return None
 
-    def _parse_sheet_data_sync(self, content: bytes, list_name: str) -> list[dict[str, Any]] | None:
+    def _parse_sheet_data_sync(self, list_name: str) -> list[dict[str, Any]] | None:
         """Синхронный парсинг данных листа (для выполнения в потоке)."""
-        workbook = load_workbook(filename=BytesIO(content), read_only=True, data_only=True)
+        workbook = self.get_workbook()
 
         if list_name not in workbook.sheetnames:
             logger.error(f"Лист '{list_name}' не найден. Доступные: {workbook.sheetnames}")
             return None
 
-        worksheet = workbook[list_name]
-        rows = list(worksheet.iter_rows(values_only=True))
+        rows = workbook[list_name].iter_rows(values_only=True)
+        header_row = next(rows, None)
 
-        if not rows:
+        if not header_row:
             logger.warning("Лист пустой")
             return []
 
         # Заголовки
-        headers = [
-            str(h).strip() if h is not None else f"column_{idx}"
-            for idx, h in enumerate(rows[0])
-        ]
+        headers = _header_names(header_row)
 
         # Данные
         data = []
-        for row in rows[1:]:
+        for row in rows:
             if row and any(cell is not None for cell in row):
                 record = {}
                 for idx, header in enumerate(headers):
@@ -243,6 +585,144 @@ class GoogleSheetProcessor:
 
         return data
 
+    def read_batches(self, list_name: str, columns: list[str] | None,
+                     batch_size: int = SHEET_BATCH_SIZE) -> list[pa.RecordBatch] | None:
+        """
+        Синхронный разбор листа в Arrow RecordBatch'и (для выполнения в потоке).
+
+        Если включён пул процессов (APP_GOOGLE_PARSE_PROCESSES), разбор идёт там:
+        обработчику передаётся путь к файлу в кэше, батчи возвращаются через Arrow IPC.
+        """
+        from src.app_google.parse_pool import get_parse_pool, parse_sheet_to_ipc, read_ipc_segments  # цикл импортов
+
+        pool = get_parse_pool()
+        if pool is None:
+            parser = self.get_parser()
+            if list_name not in parser.sheetnames:
+                logger.error(f"Лист '{list_name}' не найден. Доступные: {parser.sheetnames}")
+                return None
+            return list(parser.iter_batches(list_name, columns, batch_size))
+        if self._cached_path is None:
+            raise RuntimeError("Файл не загружен. Сначала вызовите download_file(file_code)")
+
+        self.export_cache.tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, out_path = tempfile.mkstemp(suffix='.arrow', dir=self.export_cache.tmp_dir)
+        os.close(fd)
+        try:
+            segments = pool.submit(
+                parse_sheet_to_ipc, str(self._cached_path), self.parser_name, list_name, columns, batch_size, out_path
+            ).result()
+        except BaseException:
+            Path(out_path).unlink(missing_ok=True)
+            raise
+        if segments is None:
+            Path(out_path).unlink(missing_ok=True)
+            logger.error(f"Лист '{list_name}' не найден. Доступные: {self.get_parser().sheetnames}")
+            return None
+        return read_ipc_segments(out_path, segments)
+
+    def _parse_sheet_batches_sync(self, list_name: str, columns: list[str] | None,
+                                  batch_size: int) -> list[pa.RecordBatch] | None:
+        """Синхронный разбор листа в Arrow RecordBatch'и (для выполнения в потоке)."""
+        return self.read_batches(list_name, columns, batch_size)
+
+    async def get_sheet_batches(self, list_name: str, columns: list[str] | None = None,
+                                batch_size: int = SHEET_BATCH_SIZE) -> list[pa.RecordBatch] | None:
+        """
+        Получить данные листа как Arrow RecordBatch'и (без промежуточных list[dict]).
+
+        Args:
+            list_name: Имя листа.
+            columns: Нужные столбцы по заголовкам (None — все). Отсутствующие
+                     в листе столбцы заполняются NULL.
+            batch_size: Строк в одном батче.
+
+        Returns:
+            list[pa.RecordBatch] | None: Батчи листа или None при ошибке.
+        """
+        if self._cached_path is None:
+            logger.error("❌ Файл не загружен. Сначала вызовите download_file(file_code)")
+            return None
+
+        try:
+            batches = await asyncio.to_thread(self._parse_sheet_batches_sync, list_name, columns, batch_size)
+            if batches is not None:
+                logger.info(f"✅ Получено строк из листа '{list_name}': {sum(b.num_rows for b in batches)}")
+            return batches
+        except Exception as e:
+            logger.error(f"❌ Ошибка парсинга листа '{list_name}': {e}", exc_info=True)
+            return None
+
+    async def stream_sheet_batches(self, list_name: str, columns: list[str] | None = None,
+                                   batch_size: int = SHEET_BATCH_SIZE,
+                                   prefetch: int = SHEET_PREFETCH_BATCHES) -> AsyncIterator[pa.RecordBatch]:
+        """
+        Асинхронный поток батчей листа: разбор идёт в потоке, батчи отдаются по мере готовности.
+
+        Разбор опережает потребителя не больше чем на prefetch батчей, поэтому пиковая
+        память не зависит от размера листа. Пока потребитель преобразует и пишет
+        текущий батч, следующий уже разбирается. С пулом процессов лист разбирается
+        целиком в обработчике (prefetch не действует, первый батч — после разбора
+        всего листа), а батчи читаются из отображённого в память IPC-файла.
+
+            async for batch in processor.stream_sheet_batches(sheet, columns):
+                ...
+
+        Raises:
+            Exception: Ошибка разбора листа пробрасывается потребителю.
+        """
+        if self._cached_path is None:
+            logger.error("❌ Файл не загружен. Сначала вызовите download_file(file_code)")
+            return
+
+        from src.app_google.parse_pool import get_parse_pool  # цикл импортов
+
+        if get_parse_pool() is not None:
+            batches = await asyncio.to_thread(self.read_batches, list_name, columns, batch_size)
+            for batch in batches or []:
+                yield batch
+            logger.info(f"✅ Получено строк из листа '{list_name}': {sum(b.num_rows for b in batches or [])}")
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+        stop = threading.Event()
+        finished = object()
+
+        def _put(item: Any) -> None:
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def _produce() -> None:
+            try:
+                for batch in self.get_parser().iter_batches(list_name, columns, batch_size):
+                    if stop.is_set():
+                        return
+                    _put(batch)
+                item = finished
+            except Exception as e:
+                item = e
+            if not stop.is_set():
+                _put(item)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(_produce))
+        rows = 0
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                rows += item.num_rows
+                yield item
+            logger.info(f"✅ Получено строк из листа '{list_name}': {rows}")
+        finally:
+            # Потребитель мог остановиться раньше: освобождаем очередь, чтобы поток завершился
+            stop.set()
+            while not queue.empty():
+                queue.get_nowait()
+            await producer
+
     async def get_sheet_data(self, list_name: str) -> list[dict[str, Any]] | None:
         """
         Получить данные конкретного листа из закэшированного файла.
@@ -253,12 +733,12 @@ class GoogleSheetProcessor:
         Returns:
             list[dict] | None: Данные листа как список словарей или None при ошибке.
         """
-        if self._cached_content is None:
+        if self._cached_path is None:
             logger.error("❌ Файл не загружен. Сначала вызовите download_file(file_code)")
             return None
 
         try:
-            data = await asyncio.to_thread(self._parse_sheet_data_sync, self._cached_content, list_name)
+            data = await asyncio.to_thread(self._parse_sheet_data_sync, list_name)
             if data is not None:
                 logger.info(f"✅ Получено строк из листа '{list_name}': {len(data)}")
             return data
@@ -276,34 +756,22 @@ class GoogleSheetProcessor:
         Returns:
             list[str] | None: Список имён столбцов или None при ошибке.
         """
-        if self._cached_content is None:
+        if self._cached_path is None:
             logger.error("❌ Файл не загружен. Сначала вызовите download_file(file_code)")
             return None
 
-        def _extract_columns_sync(content: bytes, list_name: str) -> list[str] | None:
+        def _extract_columns_sync(list_name: str) -> list[str] | None:
             try:
-                workbook = load_workbook(filename=BytesIO(content), read_only=True, data_only=True)
-
-                if list_name not in workbook.sheetnames:
-                    logger.error(f"Лист '{list_name}' не найден. Доступные: {workbook.sheetnames}")
-                    return None
-
-                worksheet = workbook[list_name]
-                header_row = next(worksheet.iter_rows(values_only=True, max_row=1), None)
-                if not header_row:
+                columns = self.get_parser().headers(list_name)
+                if columns == []:
                     logger.warning("Лист пустой, нет заголовков")
-                    return []
-
-                return [
-                    str(h).strip() if h is not None else f"column_{idx}"
-                    for idx, h in enumerate(header_row)
-                ]
+                return columns
             except Exception as e:
                 logger.error(f"❌ Ошибка чтения заголовков: {e}", exc_info=True)
                 return None
 
         try:
-            columns = await asyncio.to_thread(_extract_columns_sync, self._cached_content, list_name)
+            columns = await asyncio.to_thread(_extract_columns_sync, list_name)
             if columns is not None:
                 logger.info(f"📊 Столбцы листа '{list_name}': {columns}")
             return columns
@@ -312,22 +780,22 @@ class GoogleSheetProcessor:
             return None
 
     def clear_cache(self) -> None:
-        """Очистить кэш файла (освободить память)."""
-        self._cached_content = None
+        """Закрыть разобранную книгу и отображение файла (файл остаётся в дисковом кэше)."""
+        with self._workbook_lock:
+            self._close_workbook()
+        self._cached_path = None
         self._cached_file_code = None
+        self._content_hash = None
         logger.debug("🗑️ Кэш контента очищен")
 
     def clear_token(self) -> None:
         """Удалить сохранённый токен авторизации (для сброса сессии)."""
-        if self.TOKEN_FILE.exists():
-            self.TOKEN_FILE.unlink()
-            logger.info("🔑 Токен авторизации удалён")
-        self._client = None
+        self.auth.reset()
 
     @property
     def is_file_loaded(self) -> bool:
         """Проверить, загружен ли файл в кэш."""
-        return self._cached_content is not None
+        return self._cached_path is not None
 
     @property
     def cached_file_code(self) -> str | None:
@@ -337,9 +805,4 @@ class GoogleSheetProcessor:
     @property
     def is_authenticated(self) -> bool:
         """Проверить, есть ли активная авторизация."""
-        if self._client is None:
-            return False
-        try:
-            return self._client.auth.valid
-        except Exception:
-            return False
+        return self.auth.is_valid
@@ -0,0 +1,216 @@
+"""
+Очередь заданий синхронизации в PostgreSQL для app_google.
+
+Задания разбираются воркерами (см. worker.py) через SELECT ... FOR UPDATE SKIP LOCKED,
+поэтому несколько процессов и машин могут работать с одной очередью параллельно.
+Зависимости:
+- src.config.database (engine, async_session)
+- src.config.logger
+- src.app_google.models (SyncJob)
+"""
+from typing import Any, Optional
+
+from sqlalchemy import and_, exists, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from src.app_google.config import SYNC_STALE_AFTER
+from src.app_google.models import SyncJob
+from src.config.database import engine, async_session
+from src.config.logger import logger
+
+# === Статусы заданий ===
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+async def enqueue_sync(file_code: str, sheet_name: str) -> Optional[int]:
+    """
+    Поставить синхронизацию в очередь.
+
+    Если для (file_code, sheet_name) уже есть ожидающее задание, новое не создаётся:
+    запрос схлопывается в существующее (увеличивается счётчик requests).
+
+    Returns:
+        int | None: id задания или None, если БД недоступна.
+    """
+    if engine is None:
+        logger.error("engine не инициализирован")
+        return None
+
+    stmt = pg_insert(SyncJob).values(file_code=file_code, sheet_name=sheet_name, status=STATUS_QUEUED)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_code', 'sheet_name'],
+        # Предикат литералом, как в индексе ux_sync_job_queued: с параметром вместо 'queued'
+        # PostgreSQL не всегда докажет, что частичный индекс подходит для ON CONFLICT
+        index_where=text(f"status = '{STATUS_QUEUED}'"),
+        set_={'requests': SyncJob.requests + 1},
+    ).returning(SyncJob.id)
+
+    async with async_session() as session:
+        job_id = (await session.execute(stmt)).scalar_one()
+        await session.commit()
+    logger.info(f"📬 Задание #{job_id} в очереди: {file_code} / {sheet_name}")
+    return job_id
+
+
+async def get_job(job_id: int) -> Optional[SyncJob]:
+    """Получить задание по id."""
+    if engine is None:
+        return None
+    async with async_session() as session:
+        return await session.get(SyncJob, job_id)
+
+
+async def claim_job(worker: str) -> Optional[SyncJob]:
+    """
+    Забрать следующее задание из очереди.
+
+    FOR UPDATE SKIP LOCKED: конкурирующие воркеры не ждут друг друга и не берут
+    одно задание дважды. Задание не выдаётся, пока по тому же (файл, лист)
+    выполняется другое.
+
+    Returns:
+        SyncJob | None: Задание в статусе running или None, если очередь пуста.
+    """
+    if engine is None:
+        return None
+
+    running = aliased(SyncJob)
+    candidate = (
+        select(SyncJob.id)
+        .where(
+            SyncJob.status == STATUS_QUEUED,
+            ~exists().where(and_(
+                running.status == STATUS_RUNNING,
+                running.file_code == SyncJob.file_code,
+                running.sheet_name == SyncJob.sheet_name,
+            )),
+        )
+        .order_by(SyncJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(SyncJob)
+        .where(SyncJob.id == candidate)
+        .values(
+            status=STATUS_RUNNING, worker=worker, attempts=SyncJob.attempts + 1,
+            started_at=func.now(), heartbeat_at=func.now(), stage=None, progress=None,
+        )
+        .returning(SyncJob)
+    )
+
+    async with async_session() as session:
+        job = (await session.execute(stmt)).scalar_one_or_none()
+        await session.commit()
+    if job is not None:
+        logger.info(f"🛠️ {worker}: взято задание #{job.id} ({job.file_code} / {job.sheet_name})")
+    return job
+
+
+async def report_progress(job_id: int, stage: Optional[str] = None,
+                          progress: Optional[dict[str, Any]] = None) -> None:
+    """Обновить этап и длительности этапов задания (заодно — сигнал «жив»)."""
+    if engine is None:
+        return
+    values: dict[str, Any] = {'heartbeat_at': func.now()}
+    if stage is not None:
+        values['stage'] = stage
+    if progress is not None:
+        values['progress'] = progress
+    async with async_session() as session:
+        await session.execute(update(SyncJob).where(SyncJob.id == job_id).values(**values))
+        await session.commit()
+
+
+async def save_checkpoint(job_id: int, checkpoint: dict[str, Any]) -> None:
+    """Запомнить последний записанный кусок задания (заодно — сигнал «жив»)."""
+    if engine is None:
+        return
+    async with async_session() as session:
+        await session.execute(
+            update(SyncJob).where(SyncJob.id == job_id).values(checkpoint=checkpoint, heartbeat_at=func.now())
+        )
+        await session.commit()
+
+
+async def finish_job(job_id: int, result: dict[str, Any]) -> None:
+    """Сохранить результат пайплайна и закрыть задание."""
+    if engine is None:
+        return
+    status = STATUS_DONE if result.get('success') else STATUS_FAILED
+    async with async_session() as session:
+        await session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id)
+            .values(status=status, message=result.get('message'), stats=result.get('stats') or {},
+                    stage=None, finished_at=func.now(), heartbeat_at=func.now())
+        )
+        await session.commit()
+    logger.info(f"🏁 Задание #{job_id}: {status} — {result.get('message')}")
+
+
+async def requeue_stale_jobs() -> int:
+    """
+    Вернуть в очередь задания упавших воркеров (нет сигнала дольше SYNC_STALE_AFTER).
+
+    Если для того же (файл, лист) уже есть ожидающее задание, брошенное
+    помечается failed — повторный запуск выполнит ожидающее, продолжив
+    с контрольной точки брошенного (если у ожидающего своей нет).
+
+    Returns:
+        int: Сколько заданий обработано.
+    """
+    if engine is None:
+        return 0
+
+    stale = and_(
+        SyncJob.status == STATUS_RUNNING,
+        SyncJob.heartbeat_at < func.now() - text(f"interval '{int(SYNC_STALE_AFTER)} seconds'"),
+    )
+    queued = aliased(SyncJob)
+    has_queued = exists().where(and_(
+        queued.status == STATUS_QUEUED,
+        queued.file_code == SyncJob.file_code,
+        queued.sheet_name == SyncJob.sheet_name,
+    ))
+
+    stale_job = aliased(SyncJob)
+    inherited = (
+        select(stale_job.checkpoint)
+        .where(
+            stale_job.status == STATUS_RUNNING,
+            stale_job.heartbeat_at < func.now() - text(f"interval '{int(SYNC_STALE_AFTER)} seconds'"),
+            stale_job.file_code == SyncJob.file_code,
+            stale_job.sheet_name == SyncJob.sheet_name,
+            stale_job.checkpoint.is_not(None),
+        )
+        .order_by(stale_job.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    async with async_session() as session:
+        await session.execute(
+            update(SyncJob)
+            .where(SyncJob.status == STATUS_QUEUED, SyncJob.checkpoint.is_(None), inherited.is_not(None))
+            .values(checkpoint=inherited)
+        )
+        failed = await session.execute(
+            update(SyncJob).where(stale, has_queued)
+            .values(status=STATUS_FAILED, message='Worker lost', finished_at=func.now())
+        )
+        requeued = await session.execute(
+            update(SyncJob).where(stale, ~has_queued).values(status=STATUS_QUEUED, worker=None)
+        )
+        await session.commit()
+
+    count = failed.rowcount + requeued.rowcount
+    if count:
+        logger.warning(f"⚠️ Брошенных заданий: {requeued.rowcount} возвращено в очередь, {failed.rowcount} закрыто")
+    return count
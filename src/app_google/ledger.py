@@ -0,0 +1,325 @@
+"""
+Инкрементальная загрузка всех листов таблицы по журналу обработанных листов.
+
+Таблица скачивается и разбирается один раз (книга кэшируется в GoogleSheetProcessor, строки листов
+могут разбираться в пуле процессов — parse_pool.py); листы обрабатываются параллельно
+(не больше SHEET_CONCURRENCY одновременно). Для каждого листа считается отпечаток
+содержимого (transform.fingerprint) и сравнивается с журналом sheet_ledger:
+в БД пишутся только новые и изменившиеся листы. В том же журнале хранится ревизия
+файла (Drive version) последней успешной обработки — если файл не менялся,
+синхронизация завершается без скачивания, — обработанный хвост листа (tail.py)
+и идентификатор снимка листа, с которым совпадает TaskList (snapshot.py).
+Зависимости:
+- src.config.database (engine, async_session)
+- src.app_google.get_google, transform, writer, models
+"""
+import asyncio
+from typing import Any, Optional
+
+import duckdb
+import pyarrow as pa
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.app_google.config import ALL_SHEETS, COLUMN_MAPPING, SHEET_CONCURRENCY
+from src.app_google.get_google import GoogleSheetProcessor
+from src.app_google.metrics import ProgressCallback, StageTimer
+from src.app_google.models import SheetLedger
+from src.app_google.registry import tag_for
+from src.app_google.tail import TailState
+from src.app_google.transform import fingerprint, transform_batches
+from src.app_google.writer import save_tasks_to_db
+from src.config.database import engine, async_session
+from src.config.logger import logger
+
+# === Статусы листов ===
+
+SHEET_WRITTEN = 'written'
+SHEET_UNCHANGED = 'unchanged'
+SHEET_SKIPPED = 'skipped'
+SHEET_FAILED = 'failed'
+
+# Счётчики записи, суммируемые по листам
+_COUNTERS = ('inserted', 'updated', 'unchanged', 'deactivated', 'errors')
+
+
+async def load_ledger(file_code: str) -> dict[str, str]:
+    """Отпечатки обработанных листов таблицы: {лист: отпечаток}."""
+    if engine is None:
+        return {}
+    async with async_session() as session:
+        result = await session.execute(
+            select(SheetLedger.sheet_name, SheetLedger.fingerprint).where(SheetLedger.file_code == file_code)
+        )
+        return dict(result.all())
+
+
+async def record_sheet(file_code: str, sheet_name: str, sheet_fingerprint: str, rows: int) -> None:
+    """Отметить лист обработанным с данным отпечатком."""
+    stmt = pg_insert(SheetLedger).values(
+        file_code=file_code, sheet_name=sheet_name, fingerprint=sheet_fingerprint, rows=rows
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_code', 'sheet_name'],
+        set_={'fingerprint': stmt.excluded.fingerprint, 'rows': stmt.excluded.rows, 'processed_at': func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def get_revision(file_code: str, sheet_name: str) -> Optional[str]:
+    """Ревизия файла, на которой лист (или '*' — все листы) последний раз успешно обработан."""
+    if engine is None:
+        return None
+    async with async_session() as session:
+        return await session.scalar(
+            select(SheetLedger.revision)
+            .where(SheetLedger.file_code == file_code, SheetLedger.sheet_name == sheet_name)
+        )
+
+
+async def record_revision(file_code: str, sheet_name: str, revision: str) -> None:
+    """Запомнить ревизию файла, на которой лист успешно обработан."""
+    if engine is None:
+        return
+    stmt = pg_insert(SheetLedger).values(file_code=file_code, sheet_name=sheet_name, revision=revision)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_code', 'sheet_name'],
+        set_={'revision': stmt.excluded.revision, 'processed_at': func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def get_tail(file_code: str, sheet_name: str) -> Optional[TailState]:
+    """Обработанный хвост листа (tail.py) или None, если лист ещё не синхронизировался."""
+    if engine is None:
+        return None
+    async with async_session() as session:
+        row = (await session.execute(
+            select(SheetLedger.tail_row, SheetLedger.tail_checksum)
+            .where(SheetLedger.file_code == file_code, SheetLedger.sheet_name == sheet_name)
+        )).first()
+    if row is None or row.tail_row is None or row.tail_checksum is None:
+        return None
+    return TailState(row.tail_row, row.tail_checksum)
+
+
+async def record_tail(file_code: str, sheet_name: str, tail: TailState) -> None:
+    """Запомнить последнюю обработанную строку листа и контрольную сумму строк до неё."""
+    if engine is None:
+        return
+    stmt = pg_insert(SheetLedger).values(
+        file_code=file_code, sheet_name=sheet_name, tail_row=tail.last_row, tail_checksum=tail.checksum
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_code', 'sheet_name'],
+        set_={'tail_row': stmt.excluded.tail_row, 'tail_checksum': stmt.excluded.tail_checksum,
+              'processed_at': func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def get_snapshot_id(file_code: str, sheet_name: str) -> Optional[str]:
+    """Идентификатор снимка листа, записанного последним (None — снимка нет или БД писали без него)."""
+    if engine is None:
+        return None
+    async with async_session() as session:
+        return await session.scalar(
+            select(SheetLedger.snapshot_id)
+            .where(SheetLedger.file_code == file_code, SheetLedger.sheet_name == sheet_name)
+        )
+
+
+async def record_snapshot_id(file_code: str, sheet_name: str, snapshot_id: str) -> None:
+    """Запомнить снимок листа, с которым совпадает TaskList после записи."""
+    if engine is None:
+        return
+    stmt = pg_insert(SheetLedger).values(file_code=file_code, sheet_name=sheet_name, snapshot_id=snapshot_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_code', 'sheet_name'],
+        set_={'snapshot_id': stmt.excluded.snapshot_id, 'processed_at': func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def forget_snapshot_id(file_code: str, sheet_name: str) -> None:
+    """
+    Лист будет записан не по снимку (или снимок устареет): снимки листа во всех процессах
+    перестают считаться совпадающими с TaskList. Вызывается до записи.
+    """
+    if engine is None:
+        return
+    async with async_session() as session:
+        await session.execute(
+            update(SheetLedger)
+            .where(SheetLedger.file_code == file_code, SheetLedger.sheet_name == sheet_name,
+                   SheetLedger.snapshot_id.is_not(None))
+            .values(snapshot_id=None)
+        )
+        await session.commit()
+
+
+async def check_revision(processor: GoogleSheetProcessor, file_code: str,
+                         sheet_name: str) -> tuple[Optional[str], bool]:
+    """
+    Сравнить ревизию файла в Drive с ревизией последней успешной обработки листа.
+
+    Returns:
+        (текущая ревизия или None, если её не удалось получить; True — файл не менялся).
+    """
+    revision = await processor.get_revision(file_code)
+    if revision is None:
+        return None, False
+    return revision, revision == await get_revision(file_code, sheet_name)
+
+
+def empty_sync_stats() -> dict[str, Any]:
+    """Нулевые счётчики записи листа (те же ключи у потоковой записи и у пропуска по ревизии)."""
+    return {'mode': None, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0, 'errors': 0,
+            'timings': {}, 'chunks': 0, 'chunk_stats': [], 'resumed_rows': 0, 'sheet_rows': 0, 'source_rows': 0}
+
+
+def not_modified_result(revision: str, timer: StageTimer) -> dict[str, Any]:
+    """Результат пайплайна, когда файл не менялся с прошлой синхронизации (та же форма stats)."""
+    logger.info(f"⏭️ Файл не изменился (ревизия {revision}), синхронизация не нужна")
+    return {
+        'success': True,
+        'message': f'Not modified since revision {revision}',
+        'stats': {'total': 0, **empty_sync_stats(), 'not_modified': True, 'revision': revision,
+                  'stages': timer.timings, 'profile': timer.profile},
+    }
+
+
+def _prepare_sheet(processor: GoogleSheetProcessor, sheet_name: str,
+                   source_tag: Optional[str] = None) -> Optional[tuple[pa.Table, str]]:
+    """
+    Разбор и приведение типов одного листа (для выполнения в потоке).
+
+    Сам разбор идёт в пуле процессов, если он включён (GoogleSheetProcessor.read_batches).
+
+    Returns:
+        (tasks, отпечаток) или None, если лист не похож на список задач.
+    """
+    headers = processor.get_parser().headers(sheet_name)
+    missing = [col for col in COLUMN_MAPPING if col not in (headers or [])]
+    if missing:
+        logger.info(f"⏭️ Лист '{sheet_name}' пропущен: нет столбцов {missing}")
+        return None
+
+    batches = processor.read_batches(sheet_name, list(COLUMN_MAPPING.keys()))
+    conn = duckdb.connect()
+    try:
+        tasks = transform_batches(conn, batches or [], sheet_name=sheet_name, source_tag=source_tag)
+        return tasks, fingerprint(conn, tasks)
+    finally:
+        conn.close()
+
+
+async def _ingest_sheet(processor: GoogleSheetProcessor, file_code: str, sheet_name: str,
+                        known: Optional[str], semaphore: asyncio.Semaphore) -> dict[str, Any]:
+    """Обработать один лист: пропустить, если отпечаток совпадает с журналом, иначе записать."""
+    async with semaphore:
+        try:
+            source_tag = tag_for(file_code)
+            prepared = await asyncio.to_thread(_prepare_sheet, processor, sheet_name, source_tag)
+            if prepared is None:
+                return {'status': SHEET_SKIPPED}
+
+            tasks, sheet_fingerprint = prepared
+            if sheet_fingerprint == known:
+                logger.info(f"⏭️ Лист '{sheet_name}' не изменился")
+                return {'status': SHEET_UNCHANGED, 'source_rows': tasks.num_rows}
+
+            # Одинаковый порядок ключей во всех транзакциях — без взаимоблокировок,
+            # если одна ссылка встречается на нескольких листах
+            tasks = tasks.sort_by('link_post')
+            await forget_snapshot_id(file_code, sheet_name)
+            write_stats = await save_tasks_to_db(tasks, sheet_name=sheet_name, deactivate_missing=True,
+                                                 source_tag=source_tag)
+            if write_stats['errors']:
+                return {'status': SHEET_FAILED, **write_stats, 'source_rows': tasks.num_rows}
+
+            await record_sheet(file_code, sheet_name, sheet_fingerprint, tasks.num_rows)
+            return {'status': SHEET_WRITTEN, **write_stats, 'source_rows': tasks.num_rows}
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки листа '{sheet_name}': {e}", exc_info=True)
+            return {'status': SHEET_FAILED, 'message': str(e)}
+
+
+async def ingest_all_sheets(file_code: str, progress: Optional[ProgressCallback] = None,
+                            concurrency: int = SHEET_CONCURRENCY, force: bool = False) -> dict[str, Any]:
+    """
+    Загрузить все новые и изменившиеся листы таблицы.
+
+    Если ревизия файла совпадает с ревизией последнего успешного прохода,
+    файл не скачивается вовсе.
+
+    Args:
+        file_code: Идентификатор таблицы.
+        progress: Корутина, вызываемая в начале каждого этапа.
+        concurrency: Сколько листов обрабатывать одновременно.
+        force: Не проверять ревизию файла.
+
+    Returns:
+        dict: success, message и stats (итоги по листам в stats['sheets']).
+    """
+    processor = GoogleSheetProcessor(timeout=30)
+    timer = StageTimer(progress)
+
+    def failed(message: str) -> dict[str, Any]:
+        return {'success': False, 'message': message, 'stats': {'stages': timer.timings, 'profile': timer.profile}}
+
+    try:
+        revision = None
+        if not force:
+            async with timer.stage('revision'):
+                revision, not_modified = await check_revision(processor, file_code, ALL_SHEETS)
+            if not_modified:
+                return not_modified_result(revision, timer)
+
+        async with timer.stage('download'):
+            downloaded = await processor.download_file(file_code, revision=revision)
+        if not downloaded:
+            return failed('Failed to download file')
+
+        async with timer.stage('sheet_names'):
+            sheet_names = await processor.get_sheet_names()
+            ledger = await load_ledger(file_code)
+        if sheet_names is None:
+            return failed('Failed to get sheets')
+        logger.info(f"📋 Листов в таблице: {len(sheet_names)}, в журнале: {len(ledger)}")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        async with timer.stage('sheets'):
+            results = await asyncio.gather(*(
+                _ingest_sheet(processor, file_code, name, ledger.get(name), semaphore)
+                for name in sheet_names
+            ))
+    except Exception as e:
+        logger.error(f"❌ Ошибка пайплайна: {e}", exc_info=True)
+        return failed(f'Pipeline error: {str(e)}')
+    finally:
+        processor.clear_cache()
+
+    sheets = dict(zip(sheet_names, results))
+    by_status = {status: [name for name, r in sheets.items() if r['status'] == status]
+                 for status in (SHEET_WRITTEN, SHEET_UNCHANGED, SHEET_SKIPPED, SHEET_FAILED)}
+    totals = {key: sum(r.get(key, 0) for r in sheets.values()) for key in _COUNTERS}
+    if revision is not None and not by_status[SHEET_FAILED]:
+        await record_revision(file_code, ALL_SHEETS, revision)
+
+    return {
+        'success': not by_status[SHEET_FAILED],
+        'message': f"Sheets: {len(by_status[SHEET_WRITTEN])} written, {len(by_status[SHEET_UNCHANGED])} unchanged, "
+                   f"{len(by_status[SHEET_SKIPPED])} skipped, {len(by_status[SHEET_FAILED])} failed "
+                   f"({totals['inserted']} new, {totals['updated']} updated, {totals['deactivated']} deactivated)",
+        'stats': {**totals, 'sheets': sheets, 'revision': revision,
+                  'api': processor.scheduler.counters, 'stages': timer.timings, 'profile': timer.profile},
+    }
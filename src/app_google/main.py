@@ -2,138 +2,333 @@
 Приложение app_google: пайплайн обработки Google Sheets.
 """
 import asyncio
+import time
 
 import duckdb
 import pyarrow as pa
+import pyarrow.compute as pc
 
-from datetime import datetime, date
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
-from sqlalchemy import func
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy.exc import IntegrityError
-
-from src.app_google.config import APP_GOOGLE_FILE, COLUMN_MAPPING, SHEET_NAME
-from src.app_google.models import TaskList
+from src.app_google.config import (
+    ALL_SHEETS, APP_GOOGLE_FILE, COLUMN_MAPPING, COMMIT_CHUNK_ROWS, FETCH_BACKEND, SHEET_NAME, SHEET_ROW_COLUMN,
+    STAGING_THRESHOLD_ROWS, TAIL_SYNC,
+)
 from src.config.logger import logger
-from src.config.database import engine, async_session
 from src.app_google.get_google import GoogleSheetProcessor
+from src.app_google.ledger import (
+    check_revision, empty_sync_stats, forget_snapshot_id, get_snapshot_id, get_tail, ingest_all_sheets,
+    not_modified_result, record_revision, record_snapshot_id, record_tail,
+)
+from src.app_google.metrics import ProgressCallback, StageTimer
+from src.app_google.preview import diff_with_current, fetch_current
+from src.app_google.registry import tag_for
+from src.app_google.snapshot import SheetSnapshot, shared_snapshot_store
+from src.app_google.tail import TailMismatch, TailTracker
+from src.app_google.transform import TRANSFORM_SCHEMA, deduplicate, detect_column_formats, transform
+from src.app_google.writer import (
+    choose_mode, deactivate_keys, deactivate_sheet_missing, foreign_owned_keys, save_tasks_parallel,
+)
 
 # === Константы ===
 
 REQUIRED_COLUMNS: set[str] = set(COLUMN_MAPPING.keys())
 
+# Сохранение контрольной точки после записанного куска (например, в sync_job.checkpoint)
+CheckpointCallback = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+async def _sync_stream(stream: AsyncIterator[pa.RecordBatch], conn: duckdb.DuckDBPyConnection,
+                       sheet_name: str, timer: StageTimer, tail: TailTracker,
+                       source_tag: Optional[str] = None,
+                       snapshot: Optional[SheetSnapshot] = None,
+                       chunk_rows: int = COMMIT_CHUNK_ROWS,
+                       resume_row: int = 0,
+                       on_chunk: Optional[CheckpointCallback] = None) -> dict[str, any]:
+    """
+    Поток батчей листа → transform → save_tasks_parallel, кусок за куском.
+
+    Форматы дат определяются по первому батчу. Строки копятся до chunk_rows и пишутся
+    отдельной транзакцией на кусок; дубликаты link_post схлопываются внутри куска,
+    а между кусками побеждает более поздняя запись — нижняя строка листа, как
+    в transform_batches. Удалённые из листа строки деактивируются одним запросом
+    после последнего куска (если не было ошибок записи).
+
+    Режим записи (writer.choose_mode: COPY или пачки) выбирается один раз на лист,
+    а не по размеру куска: до первой записи строки копятся до
+    max(chunk_rows, STAGING_THRESHOLD_ROWS), и все куски листа пишутся одним режимом.
+
+    После каждого куска без ошибок вызывается on_chunk(контрольная точка): номер куска,
+    последняя записанная строка листа, диапазон ключей куска. Строки листа
+    не выше resume_row (контрольная точка прерванного запуска) повторно не пишутся,
+    но их ключи участвуют в сверке удалённых строк.
+
+    В режиме хвоста (tail.incremental) пишутся только строки ниже обработанных
+    ранее, сверка удалённых строк не выполняется.
+
+    Со снимком (snapshot.py) строки листа сначала складываются в DuckDB, а в БД
+    кусками по chunk_rows пишутся только новые и изменившиеся относительно
+    снимка; деактивируются только пропавшие из снимка ключи. Перед записью
+    sheet_ledger.snapshot_id сбрасывается, после записи без ошибок — указывает на новый снимок.
+
+    Returns:
+        dict: Суммарные счётчики записи, chunks, chunk_stats (строк и строк/с по кускам
+        и, при WRITE_SHARDS > 1, по шардам куска),
+        resumed_rows, sheet_rows, source_rows и tail_state
+        (со снимком — ещё snapshot: inserted / changed / removed / unchanged).
+
+    Raises:
+        TailMismatch: Строки выше хвоста изменились (до записи чего-либо в БД).
+    """
+    stats: dict[str, any] = empty_sync_stats()
+    keys: list[pa.Array] = []
+    pending: list[pa.Table] = []
+    date_formats = None
+    # Режим записи выбирается один раз на лист (writer.choose_mode), а не по размеру куска
+    write_mode: Optional[str] = None
+    first_flush_rows = max(chunk_rows, STAGING_THRESHOLD_ROWS)
+
+    async def write(tasks: pa.Table) -> None:
+        keys.append(tasks.column('link_post'))
+        if resume_row:
+            written = tasks.filter(pc.greater(tasks.column(SHEET_ROW_COLUMN), resume_row))
+            stats['resumed_rows'] += tasks.num_rows - written.num_rows
+            tasks = written
+            if not tasks.num_rows:
+                return
+        started = time.perf_counter()
+        async with timer.stage('write'):
+            chunk = await save_tasks_parallel(tasks, mode=write_mode, sheet_name=sheet_name)
+        seconds = time.perf_counter() - started
+        stats['chunks'] += 1
+        stats['mode'] = chunk['mode']
+        for key in ('inserted', 'updated', 'unchanged', 'errors'):
+            stats[key] += chunk[key]
+        for name, elapsed in chunk['timings'].items():
+            stats['timings'][name] = stats['timings'].get(name, 0.0) + elapsed
+
+        rows = pc.min_max(tasks.column(SHEET_ROW_COLUMN)).as_py()
+        link_posts = pc.min_max(tasks.column('link_post')).as_py()
+        stats['chunk_stats'].append({
+            'chunk': stats['chunks'], 'rows': tasks.num_rows, 'first_row': rows['min'], 'last_row': rows['max'],
+            'seconds': round(seconds, 4), 'rows_per_sec': round(tasks.num_rows / seconds) if seconds else None,
+            'errors': chunk['errors'], **({'shards': chunk['shards']} if 'shards' in chunk else {}),
+        })
+        # Контрольная точка только за непрерывной последовательностью успешных кусков
+        if on_chunk is not None and not stats['errors']:
+            await on_chunk({'chunk': stats['chunks'], 'last_row': rows['max'],
+                            'first_key': link_posts['min'], 'last_key': link_posts['max'],
+                            'rows': sum(c['rows'] for c in stats['chunk_stats']) + stats['resumed_rows']})
+
+    async def flush() -> None:
+        nonlocal write_mode
+        if write_mode is None:
+            # Первый сброс — либо весь лист, либо уже не меньше порога STAGING_THRESHOLD_ROWS
+            write_mode = choose_mode(sum(t.num_rows for t in pending))
+        async with timer.stage('transform'):
+            tasks = deduplicate(conn, pa.concat_tables(pending))
+        pending.clear()
+        stats['source_rows'] += tasks.num_rows
+        # Строки упорядочены по листу: контрольная точка после куска покрывает все строки до неё
+        for offset in range(0, tasks.num_rows, chunk_rows):
+            await write(tasks.slice(offset, chunk_rows))
 
-# =========================================================================
-# === Хелперы для конвертации типов ===
-# =========================================================================
-
-def safe_str(value) -> str | None:
-    if value is None or value == '':
-        return None
-    if isinstance(value, (int, float)):
-        return str(int(value)) if isinstance(value, float) and value == int(value) else str(value)
-    return str(value).strip() or None
-
-
-def safe_int(value) -> int | None:
-    if value is None or value == '':
-        return None
-    if isinstance(value, int):
-        return value
-    if isinstance(value, float):
-        return int(value) if value == int(value) else None
     try:
-        cleaned = str(value).strip().replace(' ', '').replace('\xa0', '')
-        return int(float(cleaned))
-    except (ValueError, TypeError):
-        return None
-
-
-def safe_date(value) -> date | None:
-    if value is None or value == '':
-        return None
-    if isinstance(value, date):
-        return value
-    if isinstance(value, datetime):
-        return value.date()
-    for fmt in ('%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y'):
-        try:
-            return datetime.strptime(str(value).strip(), fmt).date()
-        except ValueError:
-            continue
-    logger.warning(f"⚠️ Не удалось распарсить дату: {value!r}")
-    return None
-
-
-# =========================================================================
-# === Запись в БД с UPSERT ===
-# =========================================================================
-
-async def save_tasks_to_db(records: list[dict[str, any]]) -> tuple[int, int, int]:
-    """Сохраняет записи в БД через ORM с upsert по link_post."""
-    if engine is None or not records:
-        return 0, 0, 0
-
-    inserted_count = updated_count = error_count = 0
-
+        while True:
+            async with timer.stage('parse'):
+                batch = await anext(stream, None)
+            if batch is None:
+                break
+            stats['sheet_rows'] += batch.num_rows
+
+            async with timer.stage('transform'):
+                if date_formats is None:
+                    date_formats = detect_column_formats(batch)
+                tasks = tail.feed(conn, batch, transform(conn, batch, date_formats, sheet_name, source_tag))
+            if snapshot is not None:
+                snapshot.append(tasks)
+                continue
+            if tasks.num_rows:
+                pending.append(tasks)
+            # До выбора режима строки копятся, пока не станет ясно, дорос ли лист до порога COPY
+            if sum(t.num_rows for t in pending) >= (chunk_rows if write_mode else first_flush_rows):
+                await flush()
+        if pending:
+            await flush()
+    finally:
+        await stream.aclose()
+    stats['tail_state'] = tail.finish()
+
+    delta = None
+    if snapshot is not None:
+        async with timer.stage('diff'):
+            delta = snapshot.diff()
+        stats['snapshot'] = delta.counts
+        stats['source_rows'] = sum(delta.counts[key] for key in ('inserted', 'changed', 'unchanged'))
+        stats['unchanged'] += delta.counts['unchanged']
+        if delta.previous and not delta.upserts.num_rows and not len(delta.removed):
+            # Лист совпал со снимком, а снимок — с БД: писать нечего
+            snapshot.keep()
+            return stats
+        # БД меняется: прежний снимок (в любом процессе) ей больше не соответствует
+        await forget_snapshot_id(snapshot.file_code, snapshot.sheet_name)
+        write_mode = choose_mode(delta.upserts.num_rows)
+        for part in delta.upserts.to_batches(max_chunksize=chunk_rows):
+            await write(pa.Table.from_batches([part]))
+        if delta.previous:
+            # Пропавшие ключи известны по снимку — анти-join со всем листом не нужен
+            if stats['errors']:
+                logger.warning(f"⚠️ Сверка удалённых строк листа '{sheet_name}' пропущена: есть ошибки записи")
+            elif len(delta.removed):
+                async with timer.stage('deactivate'):
+                    stats['deactivated'] = await deactivate_keys(sheet_name, delta.removed, source_tag=source_tag)
+            keys.clear()
+
+    if keys and not tail.incremental:
+        if stats['errors']:
+            logger.warning(f"⚠️ Сверка удалённых строк листа '{sheet_name}' пропущена: есть ошибки записи")
+        else:
+            async with timer.stage('deactivate'):
+                stats['deactivated'] = await deactivate_sheet_missing(
+                    sheet_name, pa.chunked_array(keys, type=pa.string()), source_tag=source_tag
+                )
+
+    if snapshot is not None:
+        # Снимок обновляется, только если БД заведомо совпадает с листом
+        if stats['errors']:
+            snapshot.discard()
+        else:
+            # Ссылки другого владельца upsert не тронул: снимок их не запоминает
+            async with timer.stage('ownership'):
+                snapshot.exclude(await foreign_owned_keys(sheet_name, delta.upserts.column('link_post'),
+                                                          source_tag=source_tag))
+            await record_snapshot_id(snapshot.file_code, snapshot.sheet_name, snapshot.commit())
+    return stats
+
+
+async def _preview_stream(stream: AsyncIterator[pa.RecordBatch], conn: duckdb.DuckDBPyConnection,
+                          sheet_name: str, timer: StageTimer, source_tag: Optional[str] = None) -> dict[str, any]:
+    """
+    Пробный прогон: поток батчей листа → transform → сравнение с TaskList без записи (preview.py).
+
+    Returns:
+        dict: Счётчики insert / update / deactivate / unchanged, sample, sheet_rows и source_rows.
+    """
+    parts: list[pa.Table] = []
+    sheet_rows, date_formats = 0, None
     try:
-        async with async_session() as session:
-            for row in records:
-                try:
-                    task_data = {
-                        'link_post': safe_str(row.get('link_post')),
-                        'number': safe_str(row.get('number')),
-                        'date_comment': safe_date(row.get('date_comment')),
-                        'short_description': safe_str(row.get('short_description')),
-                        'autor': safe_str(row.get('autor')),
-                        'subscribers': safe_int(row.get('subscribers')),
-                        'comment': safe_str(row.get('comment')),
-                        'corrections': safe_str(row.get('corrections')),
-                        'responsible': safe_str(row.get('responsible')),
-                        'status': safe_str(row.get('status', 'new')),
-                    }
-
-                    stmt = pg_insert(TaskList).values(**task_data)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=['link_post'],
-                        set_={
-                            'number': stmt.excluded.number,
-                            'date_comment': stmt.excluded.date_comment,
-                            'short_description': stmt.excluded.short_description,
-                            'autor': stmt.excluded.autor,
-                            'subscribers': stmt.excluded.subscribers,
-                            'comment': stmt.excluded.comment,
-                            'corrections': stmt.excluded.corrections,
-                            'responsible': stmt.excluded.responsible,
-                            'status': stmt.excluded.status,
-                            'updated_at': func.now(),
-                            'is_active': True,
-                        }
-                    )
-                    result = await session.execute(stmt)
-                    if result.rowcount == 1:
-                        inserted_count += 1
-                    elif result.rowcount == 2:
-                        updated_count += 1
-                    else:
-                        inserted_count += 1
-                except IntegrityError:
-                    logger.debug(f"⚠️ Дубликат link_post: {row.get('link_post')}")
-                    error_count += 1
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка записи: {e}")
-                    error_count += 1
-            await session.commit()
-            logger.info(f"✅ UPSERT: {inserted_count} вставлено, {updated_count} обновлено")
-    except Exception as e:
-        logger.error(f"❌ Ошибка транзакции: {e}", exc_info=True)
-        error_count += len(records) - inserted_count - updated_count
-    return inserted_count, updated_count, error_count
+        while True:
+            async with timer.stage('parse'):
+                batch = await anext(stream, None)
+            if batch is None:
+                break
+            sheet_rows += batch.num_rows
+            async with timer.stage('transform'):
+                if date_formats is None:
+                    date_formats = detect_column_formats(batch)
+                parts.append(transform(conn, batch, date_formats, sheet_name, source_tag))
+    finally:
+        await stream.aclose()
+
+    tasks = pa.concat_tables(parts) if parts else TRANSFORM_SCHEMA.empty_table()
+    async with timer.stage('fetch_current'):
+        current = await fetch_current(pc.unique(tasks.column('link_post').drop_null()), sheet_name, source_tag)
+    async with timer.stage('diff'):
+        changes = diff_with_current(conn, tasks, current, sheet_name, source_tag)
+    source_rows = changes['insert'] + changes['update'] + changes['unchanged']
+    return {**changes, 'sheet_rows': sheet_rows, 'source_rows': source_rows, 'current_rows': current.num_rows}
+
+
+async def _open_stream(processor: GoogleSheetProcessor, file_code: str, sheet_name: str,
+                       revision: Optional[str], timer: StageTimer,
+                       backend: str = FETCH_BACKEND) -> tuple[list[str], AsyncIterator[pa.RecordBatch]] | str:
+    """
+    Открыть поток батчей листа: values API (backend='values'), при ошибке — экспорт XLSX.
+
+    Returns:
+        (заголовки листа, поток батчей) или текст ошибки.
+    """
+    # 1a. values API: только нужные столбцы листа, без экспорта всей книги
+    if backend == 'values':
+        try:
+            async with timer.stage('layout'):
+                return await processor.stream_sheet_values(
+                    sheet_name, list(COLUMN_MAPPING.keys()), file_code=file_code
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ values API: {type(e).__name__}: {e}. Переходим на экспорт XLSX")
+
+    # 1b. Скачать файл
+    async with timer.stage('download'):
+        downloaded = await processor.download_file(file_code, revision=revision)
+    if not downloaded:
+        return 'Failed to download file'
+
+    # 2. Получить список листов
+    async with timer.stage('sheet_names'):
+        sheets = await processor.get_sheet_names()
+    if sheets is None:
+        return 'Failed to get sheets'
+
+    # 3. Получить список столбцов
+    async with timer.stage('columns'):
+        columns = await processor.get_sheet_columns(sheet_name)
+    if columns is None:
+        return 'Failed to get columns'
+    return columns, processor.stream_sheet_batches(sheet_name, columns=list(COLUMN_MAPPING.keys()))
+
+
+def _dry_run_result(changes: dict[str, any], timer: StageTimer) -> dict[str, any]:
+    """Результат пробного прогона в формате main()."""
+    sheet_rows, source_rows = changes.pop('sheet_rows'), changes.pop('source_rows')
+    if not sheet_rows:
+        return {'success': False, 'message': 'No data to process',
+                'stats': {'stages': timer.timings, 'profile': timer.profile}}
+    logger.info(f"🔍 Пробный прогон: {changes['insert']} новых, {changes['update']} изменится, "
+                f"{changes['deactivate']} деактивируется, {changes['unchanged']} без изменений")
+    return {
+        'success': True,
+        'message': f"Dry run: {changes['insert']} to insert, {changes['update']} to update, "
+                   f"{changes['deactivate']} to deactivate, {changes['unchanged']} unchanged",
+        'stats': {'dry_run': changes, 'sheet_rows': sheet_rows, 'source_rows': source_rows,
+                  'stages': timer.timings, 'profile': timer.profile},
+    }
 
 
 async def main(file_code: Optional[str] = None,
-               sheet_name: Optional[str] = None) -> dict[str, any]:
+               sheet_name: Optional[str] = None,
+               progress: Optional[ProgressCallback] = None,
+               force: bool = False,
+               processor: Optional[GoogleSheetProcessor] = None,
+               backend: Optional[str] = None,
+               dry_run: bool = False,
+               checkpoint: Optional[dict[str, Any]] = None,
+               on_checkpoint: Optional[CheckpointCallback] = None,
+               chunk_rows: int = COMMIT_CHUNK_ROWS) -> dict[str, any]:
+    """
+    Пайплайн синхронизации листа Google Sheets → TaskList.
+
+    Args:
+        file_code: Идентификатор таблицы (по умолчанию APP_GOOGLE_FILE).
+        sheet_name: Имя листа (по умолчанию SHEET_NAME). ALL_SHEETS ('*') — все новые
+                    и изменившиеся листы по журналу (см. ledger.ingest_all_sheets).
+        progress: Корутина (этап, длительности этапов), вызываемая в начале каждого этапа.
+        force: Полная синхронизация: даже если ревизия файла не изменилась с прошлого успешного запуска,
+               и всего листа, а не только новых строк внизу (tail.py) или разницы со снимком (snapshot.py).
+        processor: Процессор Google (по умолчанию новый; бенчмарк передаёт процессор заглушки).
+        backend: Способ получения листа: 'values' или 'xlsx' (по умолчанию FETCH_BACKEND).
+        dry_run: Пробный прогон: посчитать, что будет вставлено, обновлено и деактивировано
+                 (stats['dry_run'], с примерами ключей), ничего не записывая. Ревизия файла,
+                 хвост и снимок листа не используются и не обновляются.
+        checkpoint: Контрольная точка прерванного запуска (sync_job.checkpoint): если ревизия файла
+                    та же, уже записанные строки листа не пишутся повторно.
+        on_checkpoint: Корутина, получающая контрольную точку после каждого записанного куска.
+        chunk_rows: Строк листа в одной транзакции записи (по умолчанию COMMIT_CHUNK_ROWS).
+
+    Returns:
+        dict: success, message и stats (включая stages — длительности этапов, сек, и profile —
+        wall/cpu/пик памяти по этапам; разбивка записи с commit — в stats['timings']).
+    """
     target_file = file_code or APP_GOOGLE_FILE
     target_sheet = sheet_name or SHEET_NAME  # SHEET_NAME = "02.03.2026"
 
@@ -151,73 +346,120 @@ async def main(file_code: Optional[str] = None,
 
     logger.info(f"🚀 Запуск пайплайна: {target_file} / {target_sheet}")
 
-    processor = GoogleSheetProcessor(timeout=30)
+    if target_sheet == ALL_SHEETS:
+        if dry_run:
+            return {'success': False, 'message': 'Dry run is not supported for all sheets', 'stats': {}}
+        return await ingest_all_sheets(target_file, progress=progress, force=force)
 
-    try:
-        # 1. Скачать файл
-        if not await processor.download_file(target_file):
-            return {'success': False, 'message': 'Failed to download file', 'stats': {}}
+    processor = processor or GoogleSheetProcessor(timeout=30)
+    timer = StageTimer(progress)
 
-        # 2. Получить список листов
-        sheets = await processor.get_sheet_names()
-        if sheets is None:
-            return {'success': False, 'message': 'Failed to get sheets', 'stats': {}}
-
-        # 3. Получить список столбцов
-        columns = await processor.get_sheet_columns(target_sheet)
-        if columns is None:
-            return {'success': False, 'message': 'Failed to get columns', 'stats': {}}
-
-        # 4. Получить данные листа
-        data = await processor.get_sheet_data(target_sheet)
-        if not data:
-            return {'success': False, 'message': 'No data to process', 'stats': {}}
-
-        logger.info(f"✅ Получено строк: {len(data)}")
-
-        # Проверка обязательных столбцов
-        available = set(columns) if columns else set()
-        missing = [col for col in REQUIRED_COLUMNS if col not in available]
-        if missing:
-            logger.error(f"❌ Отсутствуют столбцы: {missing}")
-            return {'success': False, 'message': f'Missing columns: {missing}', 'stats': {}}
-
-        # === Обработка через DuckDB ===
-        conn = duckdb.connect()
-        try:
-            arrow_data = {col: [row.get(col) for row in data] for col in COLUMN_MAPPING.keys()}
-            table = pa.Table.from_pydict(arrow_data)
-            conn.register('sheet_data', table)
-
-            select_parts = [f'"{src}" AS {tgt}' for src, tgt in COLUMN_MAPPING.items()]
-            query = f"SELECT {', '.join(select_parts)} FROM sheet_data WHERE \"Ссылка\" IS NOT NULL"
-
-            filtered = conn.execute(query).fetchall()
-            logger.info(f"✅ После фильтрации: {len(filtered)} строк")
-
-            # Конвертация в list[dict]
-            target_cols = list(COLUMN_MAPPING.values())
-            records = [dict(zip(target_cols, row)) for row in filtered]
-
-            # === Запись в БД ===
-            if records:
-                inserted, updated, errors = await save_tasks_to_db(records)
-                total = inserted + updated
-                return {
-                    'success': errors == 0 or total > 0,
-                    'message': f'Processed {total} records ({inserted} new, {updated} updated, {errors} errors)',
-                    'stats': {'total': total, 'inserted': inserted, 'updated': updated, 'errors': errors,
-                              'source_rows': len(records)}
-                }
-            return {'success': True, 'message': 'No records to save', 'stats': {}}
-        finally:
-            conn.close()
+    def failed(message: str) -> dict[str, any]:
+        return {'success': False, 'message': message, 'stats': {'stages': timer.timings, 'profile': timer.profile}}
+
+    try:
+        # 0. Ревизия файла: если не менялся с последней успешной синхронизации листа — выходим
+        revision = None
+        if not force and not dry_run:
+            async with timer.stage('revision'):
+                revision, not_modified = await check_revision(processor, target_file, target_sheet)
+            if not_modified:
+                return not_modified_result(revision, timer)
+
+        # Снимок листа (snapshot.py): в БД пишется только разница с ним, режим хвоста не нужен
+        store = shared_snapshot_store() if not dry_run else None
+        # Обработанный хвост листа: при совпадении строк выше пишем только новые строки
+        use_tail = TAIL_SYNC and not force and not dry_run and store is None
+        known_tail = await get_tail(target_file, target_sheet) if use_tail else None
+        # Снимок листа годится, только если последней запись листа шла по нему же
+        expected_snapshot = await get_snapshot_id(target_file, target_sheet) if store else None
+        fallback = False
+
+        # Контрольная точка действительна только для той же ревизии файла
+        resume_row = 0
+        if checkpoint and revision is not None and checkpoint.get('revision') == revision:
+            resume_row = checkpoint['last_row']
+            logger.info(f"⏯️ Лист '{target_sheet}': продолжение после строки {resume_row} "
+                        f"(кусок {checkpoint['chunk']}, ключи {checkpoint['first_key']}…{checkpoint['last_key']})")
+
+        async def save_checkpoint(point: dict[str, Any]) -> None:
+            await on_checkpoint({**point, 'revision': revision})
+
+        while True:
+            opened = await _open_stream(processor, target_file, target_sheet, revision, timer,
+                                        backend or FETCH_BACKEND)
+            if isinstance(opened, str):
+                return failed(opened)
+            columns, stream = opened
+
+            # Проверка обязательных столбцов
+            available = set(columns) if columns else set()
+            missing = [col for col in REQUIRED_COLUMNS if col not in available]
+            if missing:
+                await stream.aclose()
+                logger.error(f"❌ Отсутствуют столбцы: {missing}")
+                return failed(f'Missing columns: {missing}')
+
+            # 4. Потоковая обработка: разбор → DuckDB → БД по кускам (память не растёт с размером листа)
+            if dry_run:
+                conn = duckdb.connect()
+                try:
+                    return _dry_run_result(await _preview_stream(stream, conn, target_sheet, timer,
+                                                                 tag_for(target_file)), timer)
+                finally:
+                    conn.close()
+
+            conn = duckdb.connect()
+            snapshot = store.open_sheet(target_file, target_sheet, expected_snapshot, fresh=force) if store else None
+            if snapshot is None:
+                # Запись не по снимку: снимки листа в других процессах устаревают
+                await forget_snapshot_id(target_file, target_sheet)
+            try:
+                write_stats = await _sync_stream(
+                    stream, conn, target_sheet, timer, TailTracker(known_tail), tag_for(target_file), snapshot,
+                    chunk_rows=chunk_rows, resume_row=resume_row,
+                    on_chunk=save_checkpoint if on_checkpoint and revision is not None else None,
+                )
+                break
+            except TailMismatch as e:
+                logger.warning(f"⚠️ Лист '{target_sheet}': {e} — полная синхронизация")
+                known_tail, fallback = None, True
+            finally:
+                conn.close()
+                if snapshot is not None:
+                    snapshot.close()
+
+        sheet_rows, source_rows = write_stats.pop('sheet_rows'), write_stats.pop('source_rows')
+        if not sheet_rows:
+            return failed('No data to process')
+        logger.info(f"✅ Строк листа: {sheet_rows}, после фильтрации: {source_rows}")
+
+        inserted, updated, errors = write_stats['inserted'], write_stats['updated'], write_stats['errors']
+        unchanged, deactivated = write_stats['unchanged'], write_stats['deactivated']
+        total = inserted + updated
+        tail_state = write_stats.pop('tail_state')
+        if errors == 0:
+            if revision is not None:
+                await record_revision(target_file, target_sheet, revision)
+            await record_tail(target_file, target_sheet, tail_state)
+        tail_stats = {'incremental': known_tail is not None, 'fallback': fallback,
+                      'from_row': known_tail.last_row + 1 if known_tail else None, 'last_row': tail_state.last_row}
+        return {
+            'success': errors == 0 or total > 0,
+            'message': f'Processed {total} records ({inserted} new, {updated} updated, '
+                       f'{unchanged} unchanged, {deactivated} deactivated, {errors} errors)',
+            'stats': {'total': total, **write_stats, 'source_rows': source_rows,
+                      'sheet_rows': sheet_rows, 'tail': tail_stats, 'bytes_fetched': processor.bytes_fetched,
+                      'revision': revision, 'resumed_from_row': resume_row or None,
+                      'api': processor.scheduler.counters, 'stages': timer.timings, 'profile': timer.profile}
+        }
     except Exception as e:
         logger.error(f"❌ Ошибка пайплайна: {e}", exc_info=True)
-        return {'success': False, 'message': f'Pipeline error: {str(e)}', 'stats': {}}
+        return failed(f'Pipeline error: {str(e)}')
     finally:
         processor.clear_cache()
         logger.debug("🧹 Кэш очищен")
 
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
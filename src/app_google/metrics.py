@@ -0,0 +1,100 @@
+"""
+Замер этапов пайплайна app_google.
+
+По каждому этапу: время (wall), процессорное время процесса (cpu — все потоки,
+включая разбор в to_thread; процессы пула разбора не входят) и пик RSS процесса
+во время этапа. Пик на Linux сбрасывается в начале этапа (/proc/self/clear_refs),
+на других системах — пик RSS с запуска процесса.
+
+Показатели процессные: если в одном процессе идут несколько синхронизаций
+(воркеры внутри API), их cpu и память смешиваются.
+"""
+import resource
+import sys
+import time
+
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+from src.config.logger import logger
+
+# Уведомление о начале этапа: (имя этапа, длительности завершённых этапов)
+ProgressCallback = Callable[[str, dict[str, float]], Awaitable[None]]
+
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _reset_peak_rss() -> bool:
+    """Сбросить пик RSS процесса (VmHWM) до текущего RSS. Returns: удалось ли."""
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """Пик RSS процесса, байт: VmHWM (с последнего сброса) или ru_maxrss (с запуска)."""
+    try:
+        with open(_PROC_STATUS) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS — байты, Linux — КиБ
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class StageTimer:
+    """Длительности, процессорное время и пик памяти этапов пайплайна; уведомление о переходе между этапами."""
+
+    def __init__(self, progress: Optional[ProgressCallback] = None):
+        """
+        Args:
+            progress: Корутина, вызываемая в начале каждого этапа (например, запись в sync_job).
+        """
+        self.timings: dict[str, float] = {}
+        self.cpu: dict[str, float] = {}
+        self.peak: dict[str, int] = {}
+        self._progress = progress
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """
+        Замерить этап: async with timer.stage('download'): ...
+
+        Повторные входы в этап (потоковая обработка по кускам) суммируются
+        (пик памяти — максимум по входам); о начале этапа сообщается только при первом входе.
+        """
+        if name not in self.timings:
+            await self._notify(name)
+        _reset_peak_rss()
+        started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - started, 4)
+            self.cpu[name] = round(self.cpu.get(name, 0.0) + time.process_time() - cpu_started, 4)
+            self.peak[name] = max(self.peak.get(name, 0), peak_rss())
+
+    @property
+    def profile(self) -> dict[str, dict[str, float]]:
+        """По этапам: wall и cpu (сек), peak_rss_mb — пик RSS процесса во время этапа."""
+        return {
+            name: {'wall': wall, 'cpu': self.cpu.get(name, 0.0),
+                   'peak_rss_mb': round(self.peak.get(name, 0) / 2 ** 20, 1)}
+            for name, wall in self.timings.items()
+        }
+
+    async def _notify(self, name: str) -> None:
+        if self._progress is None:
+            return
+        try:
+            await self._progress(name, dict(self.timings))
+        except Exception as e:
+            # Прогресс — вспомогательная информация, пайплайн из-за него не падает
+            logger.warning(f"⚠️ Не удалось передать прогресс этапа '{name}': {e}")
@@ -2,8 +2,9 @@
 from datetime import datetime
 from typing_extensions import Annotated
 from sqlalchemy import (
-    func, DateTime, Date, Boolean, Text, String, sql
+    func, DateTime, Date, Boolean, Integer, Text, String, Index, sql
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, registry
 from sqlalchemy.ext.asyncio import AsyncAttrs
 
@@ -40,6 +41,8 @@ class Base(AsyncAttrs, DeclarativeBase):
 class TaskList(Base):
     __tablename__ = 'task_list'
     __table_args__ = (
+        # Сверка удалённых строк: активные задачи одного листа одной таблицы реестра
+        Index('ix_task_list_source_sheet_active', 'source_tag', 'sheet_name', postgresql_where=sql.text('is_active')),
         {
             'schema': 'test',
             'comment': '{"name": "Список задач", "npa": ""}',
@@ -64,6 +67,112 @@ class TaskList(Base):
     responsible: Mapped[str | None] = mapped_column(Text, comment='{"name":"Ответственный за публикацию"}')
     status: Mapped[str | None] = mapped_column(Text, comment='{"name":"Статус"}')
 
+    # Служебные данные синхронизации
+    row_hash: Mapped[str | None] = mapped_column(Text, comment='{"name":"Хэш содержимого строки листа"}')
+    sheet_name: Mapped[str | None] = mapped_column(Text, comment='{"name":"Лист-источник"}')
+    source_tag: Mapped[str | None] = mapped_column(Text, comment='{"name":"Метка таблицы-источника (реестр)"}')
+
+
+class SyncJob(Base):
+    """Задание синхронизации в очереди (разбирается воркерами через FOR UPDATE SKIP LOCKED)."""
+    __tablename__ = 'sync_job'
+    __table_args__ = (
+        # Не больше одного ожидающего задания на (файл, лист): повторные запросы схлопываются
+        Index('ux_sync_job_queued', 'file_code', 'sheet_name', unique=True,
+              postgresql_where=sql.text("status = 'queued'")),
+        Index('ix_sync_job_status', 'status', 'id'),
+        {
+            'schema': 'test',
+            'comment': '{"name": "Очередь синхронизаций Google Sheets", "npa": ""}',
+        }
+    )
+
+    id: Mapped[int_pk]
+    file_code: Mapped[str] = mapped_column(Text, comment='{"name":"Идентификатор таблицы"}')
+    sheet_name: Mapped[str] = mapped_column(Text, comment='{"name":"Лист"}')
+    status: Mapped[str] = mapped_column(
+        Text, server_default='queued', comment='{"name":"queued / running / done / failed"}'
+    )
+    stage: Mapped[str | None] = mapped_column(Text, comment='{"name":"Текущий этап пайплайна"}')
+    progress: Mapped[dict | None] = mapped_column(JSONB, comment='{"name":"Длительность этапов, сек"}')
+    stats: Mapped[dict | None] = mapped_column(JSONB, comment='{"name":"Итоговая статистика"}')
+    message: Mapped[str | None] = mapped_column(Text, comment='{"name":"Результат"}')
+    requests: Mapped[int] = mapped_column(Integer, server_default='1', comment='{"name":"Схлопнуто запросов"}')
+    attempts: Mapped[int] = mapped_column(Integer, server_default='0', comment='{"name":"Попыток запуска"}')
+    worker: Mapped[str | None] = mapped_column(Text, comment='{"name":"Воркер"}')
+
+    created_at: Mapped[created_at]
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, comment='{"name":"Запущено"}')
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, comment='{"name":"Завершено"}')
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, comment='{"name":"Последний сигнал воркера"}')
+    checkpoint: Mapped[dict | None] = mapped_column(
+        JSONB, comment='{"name":"Последний записанный кусок: ревизия, номер, строка листа, диапазон ключей"}'
+    )
+
+
+class SheetLedger(Base):
+    """
+    Журнал обработанных листов: отпечаток содержимого и ревизия файла на момент последней успешной записи,
+    обработанный хвост листа (tail.py), снимок листа, записанный последним (snapshot.py).
+
+    Строка с sheet_name = '*' — ревизия последнего полного прохода по всем листам.
+    """
+    __tablename__ = 'sheet_ledger'
+    __table_args__ = {
+        'schema': 'test',
+        'comment': '{"name": "Журнал обработанных листов", "npa": ""}',
+    }
+
+    file_code: Mapped[str] = mapped_column(Text, primary_key=True, comment='{"name":"Идентификатор таблицы"}')
+    sheet_name: Mapped[str] = mapped_column(Text, primary_key=True, comment='{"name":"Лист"}')
+    fingerprint: Mapped[str | None] = mapped_column(Text, comment='{"name":"Отпечаток содержимого листа"}')
+    revision: Mapped[str | None] = mapped_column(Text, comment='{"name":"Ревизия файла в Drive (version)"}')
+    rows: Mapped[int | None] = mapped_column(Integer, comment='{"name":"Записей в листе"}')
+    tail_row: Mapped[int | None] = mapped_column(Integer, comment='{"name":"Последняя обработанная строка листа"}')
+    tail_checksum: Mapped[str | None] = mapped_column(Text, comment='{"name":"Контрольная сумма строк до tail_row"}')
+    snapshot_id: Mapped[str | None] = mapped_column(
+        Text, comment='{"name":"Снимок листа (snapshot.py), с которым совпадает task_list"}'
+    )
+    processed_at: Mapped[updated_at_annotation]
+
+
+class WatchChannel(Base):
+    """Канал уведомлений Drive об изменениях файла (files.watch, см. watch.py)."""
+    __tablename__ = 'watch_channel'
+    __table_args__ = (
+        Index('ix_watch_channel_file', 'file_code', 'expires_at'),
+        {
+            'schema': 'test',
+            'comment': '{"name": "Каналы уведомлений Drive", "npa": ""}',
+        }
+    )
+
+    channel_id: Mapped[str] = mapped_column(Text, primary_key=True, comment='{"name":"Идентификатор канала"}')
+    file_code: Mapped[str] = mapped_column(Text, comment='{"name":"Идентификатор таблицы"}')
+    resource_id: Mapped[str] = mapped_column(Text, comment='{"name":"Идентификатор ресурса в Drive"}')
+    token: Mapped[str | None] = mapped_column(
+        Text, comment='{"name":"Случайный секрет канала (X-Goog-Channel-Token)"}'
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime, comment='{"name":"Канал истекает"}')
+    created_at: Mapped[created_at]
+
+
+# Столбцы, добавленные после создания таблиц: create_all не меняет существующие таблицы
+SCHEMA_PATCHES: list[str] = [
+    "ALTER TABLE {schema}.task_list ADD COLUMN IF NOT EXISTS row_hash TEXT",
+    "ALTER TABLE {schema}.task_list ADD COLUMN IF NOT EXISTS sheet_name TEXT",
+    "ALTER TABLE {schema}.sheet_ledger ADD COLUMN IF NOT EXISTS revision TEXT",
+    "ALTER TABLE {schema}.sheet_ledger ALTER COLUMN fingerprint DROP NOT NULL",
+    "ALTER TABLE {schema}.task_list ADD COLUMN IF NOT EXISTS source_tag TEXT",
+    "ALTER TABLE {schema}.sheet_ledger ADD COLUMN IF NOT EXISTS tail_row INTEGER",
+    "ALTER TABLE {schema}.sheet_ledger ADD COLUMN IF NOT EXISTS tail_checksum TEXT",
+    "ALTER TABLE {schema}.sync_job ADD COLUMN IF NOT EXISTS checkpoint JSONB",
+    "ALTER TABLE {schema}.watch_channel ADD COLUMN IF NOT EXISTS token TEXT",
+    "CREATE INDEX IF NOT EXISTS ix_task_list_source_sheet_active ON {schema}.task_list (source_tag, sheet_name) "
+    "WHERE is_active",
+    "DROP INDEX IF EXISTS {schema}.ix_task_list_sheet_active",
+    "ALTER TABLE {schema}.sheet_ledger ADD COLUMN IF NOT EXISTS snapshot_id TEXT",
+]
 
 
 async def init_db_schema(shema):
@@ -81,6 +190,8 @@ async def init_db_schema(shema):
             await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {shema}"))
             # Создаём таблицы только в этой схеме
             await conn.run_sync(Base.metadata.create_all)
+            for patch in SCHEMA_PATCHES:
+                await conn.execute(text(patch.format(schema=shema)))
         logger.info(f"Таблицы инициализированы в схеме '{shema}'")
         return True
     except Exception as e:
@@ -0,0 +1,124 @@
+"""
+Разбор XLSX в пуле процессов для app_google (включается APP_GOOGLE_PARSE_PROCESSES > 0).
+
+openpyxl — чистый Python и держит GIL: разбор большого листа в потоке замедляет
+ответы API в том же процессе uvicorn. В пуле процесс-обработчик получает путь
+к файлу экспорта (из дискового кэша, байты не пересылаются) и имя парсера,
+разбирает лист и пишет батчи в Arrow IPC рядом с кэшем. Родитель отображает
+файл в память и читает батчи без копирования.
+
+У батчей одного листа схемы могут различаться (тип столбца выводится по батчу),
+поэтому каждый батч пишется отдельным IPC-потоком; обработчик возвращает их
+смещения в файле.
+
+Ограничение: обработчик разбирает лист целиком и только потом возвращает участки,
+поэтому с пулом опережение разбора (SHEET_PREFETCH_BATCHES) не действует — весь лист
+лежит в IPC-файле (на диске, в память отображается по мере чтения), а первый батч
+приходит после разбора последнего.
+Зависимости: pyarrow, src.app_google.parsers
+"""
+import mmap
+import multiprocessing
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pyarrow as pa
+
+from src.app_google.cache import MappedFile
+from src.app_google.config import PARSE_PROCESSES
+from src.app_google.parsers import SheetParser, open_parser
+from src.config.logger import logger
+
+# Участок IPC-файла с одним батчем: (смещение, длина)
+Segment = tuple[int, int]
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+# Парсер, открытый в процессе-обработчике: (путь, парсер) → парсер (путь content-addressed, не устаревает)
+_worker_parser: tuple[tuple[str, str], SheetParser] | None = None
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Общий пул разбора (None — пул выключен, разбор идёт в потоке). Вызывается из нескольких потоков."""
+    global _pool
+    if PARSE_PROCESSES <= 0:
+        return None
+    pool = _pool
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        # Другой поток мог создать пул, пока мы ждали блокировку
+        if _pool is None:
+            # spawn: в родителе работают потоки (авторизация, to_thread), fork с ними небезопасен
+            _pool = ProcessPoolExecutor(max_workers=PARSE_PROCESSES,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"🧮 Пул разбора XLSX: {PARSE_PROCESSES} процессов")
+        return _pool
+
+
+def shutdown_parse_pool() -> None:
+    """Остановить пул разбора (при завершении приложения)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _open_parser(xlsx_path: str, parser_name: str) -> SheetParser:
+    """Парсер в процессе-обработчике; переиспользуется для следующих листов того же файла."""
+    global _worker_parser
+    key = (xlsx_path, parser_name)
+    if _worker_parser is not None and _worker_parser[0] == key:
+        return _worker_parser[1]
+    if _worker_parser is not None:
+        _worker_parser[1].close()
+    with open(xlsx_path, 'rb') as f:
+        mapped = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+    parser = open_parser(parser_name, mapped)
+    _worker_parser = (key, parser)
+    return parser
+
+
+def parse_sheet_to_ipc(xlsx_path: str, parser_name: str, list_name: str, columns: Optional[list[str]],
+                       batch_size: int, out_path: str) -> Optional[list[Segment]]:
+    """
+    Разобрать лист в процессе-обработчике и записать батчи в out_path (Arrow IPC).
+
+    Returns:
+        list[Segment] | None: Участки файла по батчам или None, если листа нет.
+    """
+    parser = _open_parser(xlsx_path, parser_name)
+    if list_name not in parser.sheetnames:
+        return None
+
+    segments: list[Segment] = []
+    with open(out_path, 'wb') as sink:
+        for batch in parser.iter_batches(list_name, columns, batch_size):
+            start = sink.tell()
+            with pa.ipc.new_stream(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+            segments.append((start, sink.tell() - start))
+    return segments
+
+
+def read_ipc_segments(out_path: str | Path, segments: list[Segment]) -> list[pa.RecordBatch]:
+    """
+    Батчи из IPC-файла обработчика без копирования (отображение в память).
+
+    Файл удаляется сразу: отображение держит данные, пока живут батчи.
+    """
+    source = pa.memory_map(str(out_path), 'r')
+    try:
+        batches = []
+        for start, length in segments:
+            source.seek(start)
+            batches.extend(pa.ipc.open_stream(source.read_buffer(length)))
+        return batches
+    finally:
+        os.unlink(out_path)
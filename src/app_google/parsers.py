@@ -0,0 +1,360 @@
+"""
+Парсеры XLSX для app_google: openpyxl (по умолчанию) и быстрый разбор XML листа.
+
+Парсер открывается над файлом экспорта (mmap из дискового кэша) и отдаёт имена
+листов, заголовки и поток Arrow RecordBatch'ей в одном формате (столбцы columns
++ SHEET_ROW_COLUMN), поэтому преобразование и запись не зависят от парсера.
+
+- openpyxl — объект на каждую ячейку каждой строки, все столбцы листа.
+- xml — XML листа читается кусками и разбирается регулярными выражениями; значения
+  декодируются только в нужных столбцах (по буквам столбцов из строки заголовков).
+  Типы значений совпадают с openpyxl (data_only): числа, даты по стилю ячейки,
+  общие и inline-строки, bool, ошибки.
+
+Новый парсер — подкласс SheetParser, зарегистрированный в PARSERS.
+Зависимости: openpyxl, pyarrow, src.app_google.get_google
+"""
+import io
+import re
+import threading
+
+from abc import ABC, abstractmethod
+from html import unescape as unescape_entities
+from typing import Any, BinaryIO, Callable, Iterator
+
+import pyarrow as pa
+from openpyxl import load_workbook
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import from_excel, from_ISO8601
+from openpyxl.utils.escape import unescape as unescape_xlsx
+from openpyxl.workbook import Workbook
+from openpyxl.xml.constants import SHARED_STRINGS
+
+from src.app_google.config import SHEET_BATCH_SIZE, SHEET_ROW_COLUMN
+from src.app_google.get_google import _header_names, iter_sheet_batches, read_sheet_headers, to_arrow_column
+from src.config.logger import logger
+
+
+class SheetParser(ABC):
+    """Разбор открытой книги XLSX. Листы можно читать из разных потоков."""
+
+    name: str = ''
+
+    @property
+    @abstractmethod
+    def sheetnames(self) -> list[str]:
+        """Имена листов в порядке книги."""
+
+    @abstractmethod
+    def headers(self, list_name: str) -> list[str] | None:
+        """Заголовки листа (None — листа нет, [] — лист пустой)."""
+
+    @abstractmethod
+    def iter_batches(self, list_name: str, columns: list[str] | None,
+                     batch_size: int = SHEET_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+        """
+        Батчи листа по batch_size строк: только столбцы columns (все — если None),
+        пустые строки пропускаются, SHEET_ROW_COLUMN — номер строки листа.
+        """
+
+    def close(self) -> None:
+        """Освободить ресурсы парсера."""
+
+
+# =========================================================================
+# === openpyxl ===
+# =========================================================================
+
+class OpenpyxlParser(SheetParser):
+    """Разбор через openpyxl (read_only)."""
+
+    name = 'openpyxl'
+
+    def __init__(self, source: BinaryIO | Workbook):
+        """
+        Args:
+            source: Файл XLSX или уже открытая книга (read_only, data_only).
+        """
+        self._owned = not isinstance(source, Workbook)
+        self.workbook = load_workbook(filename=source, read_only=True, data_only=True) if self._owned else source
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return self.workbook.sheetnames
+
+    def headers(self, list_name: str) -> list[str] | None:
+        return read_sheet_headers(self.workbook, list_name)
+
+    def iter_batches(self, list_name: str, columns: list[str] | None,
+                     batch_size: int = SHEET_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+        return iter_sheet_batches(self.workbook, list_name, columns, batch_size)
+
+    def close(self) -> None:
+        if self._owned:
+            self.workbook.close()
+
+
+# =========================================================================
+# === Быстрый разбор XML листа ===
+# =========================================================================
+
+# Сколько символов XML листа читать за раз
+XML_CHUNK_CHARS: int = 1 << 22
+
+_ROW_RE = re.compile(r'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_ROW_NUMBER_RE = re.compile(r'\br="(\d+)"')
+_CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_REF_RE = re.compile(r'\br="([A-Z]+)(\d+)"')
+_TEXT_RE = re.compile(r'<t(?:\s[^>]*)?>(.*?)</t>|<t(?:\s[^>]*)?/>', re.S)
+_PHONETIC_RE = re.compile(r'<rPh\b.*?</rPh>', re.S)
+_SI_RE = re.compile(r'<si>(.*?)</si>|<si/>', re.S)
+
+
+def _xml_text(fragment: str) -> str:
+    """Текст <t> (включая фрагменты rich text <r><t>), без фонетики <rPh>."""
+    if fragment.startswith('<t>') and fragment.find('<', 3) == len(fragment) - 4:
+        text = fragment[3:-4]  # частый случай: простая строка <t>...</t>
+    else:
+        if '<rPh' in fragment:
+            fragment = _PHONETIC_RE.sub('', fragment)
+        text = ''.join(part or '' for part in _TEXT_RE.findall(fragment))
+    if '&' in text:
+        text = unescape_entities(text)
+    if '_x' in text:
+        text = unescape_xlsx(text)
+    return text
+
+
+def _cast_number(value: str) -> int | float:
+    """Число из <v>: int, если нет дробной части или экспоненты (как в openpyxl)."""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+class XmlSheetParser(SheetParser):
+    """
+    Разбор XML листа без объектов ячеек: декодируются только столбцы из columns.
+
+    Метаданные книги (листы, стили, эпоха дат) читает openpyxl, строки листа —
+    этот класс. Ячейки должны иметь координаты (атрибут r) — так пишет Google и Excel.
+    """
+
+    name = 'xml'
+
+    def __init__(self, source: BinaryIO):
+        """
+        Args:
+            source: Файл XLSX (например, отображённый в память экспорт).
+        """
+        reader = ExcelReader(source, read_only=True, data_only=True)
+        reader.read_manifest()
+        reader.read_workbook()
+        workbook = reader.parser.wb
+        apply_stylesheet(reader.archive, workbook)
+
+        self.archive = reader.archive
+        self.epoch = workbook.epoch
+        self.date_styles: set[int] = set(workbook._date_formats)
+        self.timedelta_styles: set[int] = set(workbook._timedelta_formats)
+        self._sheets: dict[str, str] = {
+            sheet.name: rel.target.lstrip('/') for sheet, rel in reader.parser.find_sheets()
+        }
+        strings = reader.package.find(SHARED_STRINGS)
+        self._strings_path: str | None = strings.PartName[1:] if strings is not None else None
+        self._strings: list[str] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self._sheets)
+
+    def shared_strings(self) -> list[str]:
+        """Таблица общих строк (читается один раз)."""
+        with self._lock:
+            if self._strings is None:
+                if self._strings_path is None:
+                    self._strings = []
+                else:
+                    xml = self.archive.read(self._strings_path).decode('utf-8')
+                    self._strings = [_xml_text(si) if si else '' for si in _SI_RE.findall(xml)]
+            return self._strings
+
+    # === Ячейки ===
+
+    def _cell_value(self, attrs: str, body: str | None, strings: list[str]) -> Any:
+        """Значение ячейки по атрибутам <c> и её содержимому (правила openpyxl, data_only)."""
+        if not body:
+            return None
+        pos = attrs.find(' t="')
+        data_type = attrs[pos + 4:attrs.index('"', pos + 4)] if pos >= 0 else 'n'
+
+        if data_type == 'inlineStr':
+            start = body.find('<is>')
+            return _xml_text(body[start + 4:body.find('</is>', start)]) if start >= 0 else None
+
+        start = body.find('<v>')
+        if start < 0:
+            return None
+        value = body[start + 3:body.find('</v>', start)]
+        if not value:
+            return None
+
+        if data_type == 'n':
+            number = _cast_number(value)
+            pos = attrs.find(' s="')
+            style = int(attrs[pos + 4:attrs.index('"', pos + 4)]) if pos >= 0 else 0
+            if style in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, timedelta=style in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return number
+        if data_type == 's':
+            return strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        # str (результат формулы), e (ошибка)
+        if '&' in value:
+            value = unescape_entities(value)
+        return value
+
+    # === Строки листа ===
+
+    def _iter_rows(self, list_name: str) -> Iterator[tuple[int, str | None]]:
+        """(номер строки, XML ячеек строки) из XML листа, читаемого кусками."""
+        with self.archive.open(self._sheets[list_name]) as raw:
+            text = io.TextIOWrapper(raw, encoding='utf-8')
+            tail = ''
+            last_row = 0
+            while True:
+                chunk = text.read(XML_CHUNK_CHARS)
+                data = tail + chunk
+                # Разбираются только целые строки: до последнего </row> куска (в конце файла — всё)
+                end = len(data) if not chunk else data.rfind('</row>') + len('</row>')
+                if end < len('</row>'):
+                    end = 0
+                for match in _ROW_RE.finditer(data, 0, end):
+                    number = _ROW_NUMBER_RE.search(match.group(1))
+                    last_row = int(number.group(1)) if number else last_row + 1
+                    yield last_row, match.group(2)
+                if not chunk:
+                    return
+                tail = data[end:]
+
+    def _header_cells(self, cells: str, strings: list[str]) -> list[Any]:
+        """Все ячейки строки заголовков по порядку столбцов."""
+        values: dict[int, Any] = {}
+        for attrs, body in _CELL_RE.findall(cells):
+            ref = _REF_RE.search(attrs)
+            if ref is None:
+                raise ValueError("Ячейка без координат (атрибут r) — используйте парсер openpyxl")
+            values[column_index_from_string(ref.group(1)) - 1] = self._cell_value(attrs, body, strings)
+        width = max(values) + 1 if values else 0
+        return [values.get(idx) for idx in range(width)]
+
+    def _read_headers(self, rows: Iterator[tuple[int, str | None]], strings: list[str]) -> tuple[list[str], bool]:
+        """
+        Заголовки из первой строки листа.
+
+        Returns:
+            (заголовки или [] для пустого листа; True — у всех ячеек r первым атрибутом,
+            как пишут Google и Excel: тогда нужные столбцы ищутся более быстрым выражением).
+        """
+        first = next(rows, None)
+        if first is None or first[0] != 1 or not first[1]:
+            return [], False
+        cells = self._header_cells(first[1], strings)
+        if not any(cell is not None for cell in cells):
+            return [], False
+        return _header_names(tuple(cells)), first[1].count('<c ') == first[1].count('<c r="')
+
+    def headers(self, list_name: str) -> list[str] | None:
+        if list_name not in self._sheets:
+            logger.error(f"Лист '{list_name}' не найден. Доступные: {self.sheetnames}")
+            return None
+        rows = self._iter_rows(list_name)
+        try:
+            return self._read_headers(rows, self.shared_strings())[0]
+        finally:
+            rows.close()
+
+    def iter_batches(self, list_name: str, columns: list[str] | None,
+                     batch_size: int = SHEET_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+        if list_name not in self._sheets:
+            logger.error(f"Лист '{list_name}' не найден. Доступные: {self.sheetnames}")
+            return
+
+        strings = self.shared_strings()
+        rows = self._iter_rows(list_name)
+        header_row, ref_first = self._read_headers(rows, strings)
+        if not header_row:
+            logger.warning("Лист пустой")
+            rows.close()
+            return
+
+        # При повторяющихся заголовках берётся последний столбец (как в openpyxl-разборе)
+        positions = {header: idx for idx, header in enumerate(header_row)}
+        names = columns or list(positions)
+        slots = {get_column_letter(positions[name] + 1): i for i, name in enumerate(names) if name in positions}
+        letters = '|'.join(slots)
+        cell_start = rf'<c r="({letters})\d+"' if ref_first else rf'<c\b(?=[^>]*?\br="({letters})\d+")'
+        projected = re.compile(cell_start + r'([^>]*?)(?:/>|>(.*?)</c>)', re.S) if slots else None
+
+        def _make_batch(values: list[list[Any]], row_numbers: list[int]) -> pa.RecordBatch:
+            arrays = [to_arrow_column(column) for column in values]
+            arrays.append(pa.array(row_numbers, type=pa.int64()))
+            return pa.RecordBatch.from_arrays(arrays, names=[*names, SHEET_ROW_COLUMN])
+
+        cell_value: Callable[[str, str | None, list[str]], Any] = self._cell_value
+        values: list[list[Any]] = [[] for _ in names]
+        row_numbers: list[int] = []
+        try:
+            for row_number, cells in rows:
+                # Пустая строка — ни одной ячейки со значением (в любом столбце, как в openpyxl)
+                if not cells or ('<v>' not in cells and '<is>' not in cells):
+                    continue
+                row = [None] * len(names)
+                if projected is not None:
+                    for letter, attrs, body in projected.findall(cells):
+                        row[slots[letter]] = cell_value(attrs, body, strings)
+                for column, value in zip(values, row):
+                    column.append(value)
+                row_numbers.append(row_number)
+
+                if len(row_numbers) >= batch_size:
+                    yield _make_batch(values, row_numbers)
+                    values, row_numbers = [[] for _ in names], []
+        finally:
+            rows.close()
+
+        if row_numbers:
+            yield _make_batch(values, row_numbers)
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+# Доступные парсеры: имя → класс (конструктор принимает файл XLSX)
+PARSERS: dict[str, type[SheetParser]] = {
+    OpenpyxlParser.name: OpenpyxlParser,
+    XmlSheetParser.name: XmlSheetParser,
+}
+
+
+def open_parser(name: str, source: BinaryIO) -> SheetParser:
+    """
+    Открыть книгу парсером name.
+
+    Raises:
+        ValueError: Неизвестный парсер.
+    """
+    try:
+        parser_cls = PARSERS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный парсер '{name}'. Доступные: {list(PARSERS)}") from None
+    return parser_cls(source)
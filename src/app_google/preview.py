@@ -0,0 +1,141 @@
+"""
+Пробный прогон синхронизации (dry_run) для app_google: что изменится в TaskList, без записи.
+
+Текущие строки TaskList по затронутым ключам (ключи листа и активные задачи
+листа) забираются одним запросом COPY ... TO STDOUT (CSV) и читаются в Arrow
+без Python-объектов на строку; сравнение с листом — один запрос DuckDB.
+Условия «обновится» и «деактивируется» те же, что у записи (writer.py):
+изменился хэш строки своего листа, строка была деактивирована, ещё без листа
+или без метки таблицы;
+активная строка другого листа (другой владелец) считается без изменений.
+Зависимости: src.config.database, duckdb, pyarrow
+"""
+from io import BytesIO
+from typing import Any, Optional
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from sqlalchemy.dialects import postgresql
+
+from src.app_google.config import DRY_RUN_SAMPLE, SHEET_ROW_COLUMN
+from src.app_google.models import TaskList
+from src.app_google.writer import HASH_COLUMN, SHEET_COLUMN, SOURCE_COLUMN
+from src.config.database import engine
+
+# Столбцы TaskList, нужные для сравнения
+CURRENT_SCHEMA: pa.Schema = pa.schema([
+    ('link_post', pa.string()),
+    (HASH_COLUMN, pa.string()),
+    (SHEET_COLUMN, pa.string()),
+    (SOURCE_COLUMN, pa.string()),
+    ('is_active', pa.bool_()),
+])
+
+# Операции в результате сравнения (ключи счётчиков и примеров)
+OP_INSERT = 'insert'
+OP_UPDATE = 'update'
+OP_DEACTIVATE = 'deactivate'
+OP_UNCHANGED = 'unchanged'
+
+
+def _current_query(source_tag: Optional[str]) -> str:
+    """
+    COPY текущих строк TaskList: ключи листа ($1) и активные задачи листа $2 с меткой $3.
+
+    Метка сравнивается через = или IS NULL (а не IS NOT DISTINCT FROM), чтобы работал
+    индекс ix_task_list_source_sheet_active.
+    """
+    table_name = postgresql.dialect().identifier_preparer.format_table(TaskList.__table__)
+    columns = ', '.join(CURRENT_SCHEMA.names)
+    source = "source_tag IS NULL AND $3::text IS NULL" if source_tag is None else "source_tag = $3"
+    return (
+        f"SELECT {columns} FROM {table_name} "
+        f"WHERE link_post = ANY($1::text[]) "
+        f"OR ({source} AND sheet_name = $2 AND is_active)"
+    )
+
+
+async def fetch_current(keys: pa.Array | pa.ChunkedArray, sheet_name: str,
+                        source_tag: Optional[str] = None) -> pa.Table:
+    """
+    Текущие строки TaskList по затронутым ключам одним запросом.
+
+    Returns:
+        pa.Table: Таблица со схемой CURRENT_SCHEMA (пустая, если БД недоступна).
+    """
+    if engine is None:
+        return CURRENT_SCHEMA.empty_table()
+    buffer = BytesIO()
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_from_query(
+            _current_query(source_tag), keys.to_pylist(), sheet_name, source_tag, output=buffer.write, format='csv',
+        )
+    if not buffer.tell():
+        return CURRENT_SCHEMA.empty_table()
+    buffer.seek(0)
+    # NULL в CSV PostgreSQL — пустое поле без кавычек, пустая строка — ""
+    return pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(column_names=CURRENT_SCHEMA.names),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=CURRENT_SCHEMA, null_values=[''], strings_can_be_null=True,
+            quoted_strings_can_be_null=False, true_values=['t'], false_values=['f'],
+        ),
+    )
+
+
+def diff_with_current(conn: duckdb.DuckDBPyConnection, tasks: pa.Table, current: pa.Table,
+                      sheet_name: str, source_tag: Optional[str] = None,
+                      sample: int = DRY_RUN_SAMPLE) -> dict[str, Any]:
+    """
+    Сравнить строки листа (результат transform) с текущими строками TaskList.
+
+    Дубликаты link_post в листе схлопываются (побеждает нижняя строка), строки без
+    link_post не учитываются — как при записи.
+
+    Returns:
+        dict: insert / update / deactivate / unchanged — число строк, и sample —
+        до sample ключей на каждую операцию, кроме unchanged.
+    """
+    conn.register('preview_sheet', tasks)
+    conn.register('preview_current', current)
+    try:
+        conn.execute(
+            f"CREATE OR REPLACE TEMP TABLE preview_diff AS "
+            f"WITH sheet AS (SELECT * FROM preview_sheet WHERE link_post IS NOT NULL "
+            f"QUALIFY row_number() OVER (PARTITION BY link_post ORDER BY {SHEET_ROW_COLUMN} DESC) = 1) "
+            f"SELECT s.link_post, s.{SHEET_ROW_COLUMN} AS sheet_row, CASE "
+            f"WHEN c.link_post IS NULL THEN '{OP_INSERT}' "
+            f"WHEN NOT c.is_active OR c.{SHEET_COLUMN} IS NULL "
+            f"OR (s.{SHEET_COLUMN} = c.{SHEET_COLUMN} AND s.{SOURCE_COLUMN} IS NOT DISTINCT FROM c.{SOURCE_COLUMN} "
+            f"AND s.{HASH_COLUMN} IS DISTINCT FROM c.{HASH_COLUMN}) "
+            f"OR (s.{SHEET_COLUMN} = c.{SHEET_COLUMN} AND c.{SOURCE_COLUMN} IS NULL "
+            f"AND s.{SOURCE_COLUMN} IS NOT NULL) THEN '{OP_UPDATE}' "
+            f"ELSE '{OP_UNCHANGED}' END AS op "
+            f"FROM sheet s LEFT JOIN preview_current c USING (link_post) "
+            f"UNION ALL "
+            f"SELECT c.link_post, NULL, '{OP_DEACTIVATE}' FROM preview_current c "
+            f"WHERE c.{SHEET_COLUMN} = $sheet AND c.{SOURCE_COLUMN} IS NOT DISTINCT FROM $tag AND c.is_active "
+            f"AND NOT EXISTS (SELECT 1 FROM sheet s WHERE s.link_post = c.link_post)",
+            {'sheet': sheet_name, 'tag': source_tag},
+        )
+        counts = dict(conn.execute("SELECT op, count(*) FROM preview_diff GROUP BY op").fetchall())
+        rows = conn.execute(
+            "SELECT op, link_post FROM preview_diff WHERE op <> ? "
+            "QUALIFY row_number() OVER (PARTITION BY op ORDER BY sheet_row NULLS LAST, link_post) <= ? "
+            "ORDER BY sheet_row NULLS LAST, link_post",
+            [OP_UNCHANGED, sample],
+        ).fetchall()
+        conn.execute("DROP TABLE preview_diff")
+    finally:
+        conn.unregister('preview_sheet')
+        conn.unregister('preview_current')
+
+    samples: dict[str, list[str]] = {OP_INSERT: [], OP_UPDATE: [], OP_DEACTIVATE: []}
+    for op, link_post in rows:
+        samples[op].append(link_post)
+    return {**{op: counts.get(op, 0) for op in (OP_INSERT, OP_UPDATE, OP_DEACTIVATE, OP_UNCHANGED)},
+            'sample': samples}
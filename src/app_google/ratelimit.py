@@ -0,0 +1,227 @@
+"""
+Общий на процесс планировщик запросов к Google API для app_google.
+
+- Token bucket на каждый API (Sheets, Drive): запросы не превышают поминутную квоту,
+  лишние ждут свободного токена.
+- Ответ 429 (квота исчерпана) — экспоненциальная пауза с джиттером (или Retry-After)
+  для всех запросов к этому API и повтор.
+- Single-flight: одновременные загрузки одного ключа (id таблицы, ревизия) выполняются
+  один раз, остальные вызывающие получают тот же результат.
+
+Запросы выполняются в потоках (asyncio.to_thread), поэтому синхронизация — threading.
+Зависимости: gspread, src.app_google.config, src.config.logger
+"""
+import asyncio
+import random
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional, TypeVar
+
+import gspread
+
+from src.app_google.config import (
+    API_BACKOFF_BASE, API_BACKOFF_MAX, API_MAX_RETRIES, DRIVE_QUOTA_PER_MINUTE, QUOTA_BURST, SHEETS_QUOTA_PER_MINUTE,
+)
+from src.config.logger import logger
+
+T = TypeVar('T')
+
+# === API (отдельные квоты) ===
+
+SHEETS_API = 'sheets'
+DRIVE_API = 'drive'
+
+
+class LeaderCancelled(Exception):
+    """Загрузку single-flight отменили у ведущего вызова (ожидающие не отменены)."""
+
+
+class TokenBucket:
+    """Ведро токенов: rate_per_minute запросов в минуту, не больше burst подряд."""
+
+    def __init__(self, rate_per_minute: float, burst: int = QUOTA_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Взять токен, при необходимости подождав.
+
+        Returns:
+            float: Сколько секунд пришлось ждать.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Остановить выдачу токенов на seconds (после 429) и обнулить запас."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def _status(error: gspread.exceptions.APIError) -> int:
+    """HTTP-статус ответа (code из тела ответа бывает -1, если тело не JSON)."""
+    return getattr(getattr(error, 'response', None), 'status_code', None) or error.code
+
+
+def _retry_after(error: gspread.exceptions.APIError) -> Optional[float]:
+    """Значение заголовка Retry-After (секунды), если сервер его прислал."""
+    try:
+        return float(error.response.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Квоты, повторы после 429 и single-flight для запросов к Google API."""
+
+    def __init__(self, quotas: Optional[dict[str, float]] = None, burst: int = QUOTA_BURST,
+                 max_retries: int = API_MAX_RETRIES, backoff_base: float = API_BACKOFF_BASE,
+                 backoff_max: float = API_BACKOFF_MAX):
+        """
+        Args:
+            quotas: Запросов в минуту по API (по умолчанию SHEETS/DRIVE_QUOTA_PER_MINUTE).
+            burst: Сколько запросов можно отправить подряд без ожидания.
+            max_retries: Сколько раз повторять запрос после 429.
+            backoff_base: Первая пауза после 429, сек (дальше удваивается).
+            backoff_max: Предельная пауза, сек.
+        """
+        quotas = quotas or {SHEETS_API: SHEETS_QUOTA_PER_MINUTE, DRIVE_API: DRIVE_QUOTA_PER_MINUTE}
+        self._buckets = {api: TokenBucket(rate, burst) for api, rate in quotas.items()}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._flights: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {'issued': 0, 'throttled': 0, 'throttled_seconds': 0.0,
+                          'rate_limited': 0, 'coalesced': 0}
+
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    @property
+    def counters(self) -> dict[str, float]:
+        """
+        Счётчики с запуска процесса:
+        issued — отправлено запросов (включая повторы), throttled — запросов ждали квоту
+        (throttled_seconds — сколько всего), rate_limited — ответов 429,
+        coalesced — вызовов, получивших результат чужой загрузки.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        counters['throttled_seconds'] = round(counters['throttled_seconds'], 3)
+        return counters
+
+    def call(self, api: str, request: Callable[[], T]) -> T:
+        """
+        Выполнить запрос к API с учётом квоты; после 429 — пауза и повтор.
+
+        Raises:
+            gspread.exceptions.APIError: Ошибка API (в т.ч. 429 после max_retries повторов).
+        """
+        bucket = self._buckets[api]
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            if waited:
+                self._count('throttled')
+                self._count('throttled_seconds', waited)
+            self._count('issued')
+            try:
+                return request()
+            except gspread.exceptions.APIError as e:
+                if _status(e) != 429 or attempt >= self.max_retries:
+                    raise
+                self._count('rate_limited')
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * (0.5 + random.random() / 2)
+                attempt += 1
+                logger.warning(f"⏳ {api} API: 429, пауза {delay:.1f} с (попытка {attempt}/{self.max_retries})")
+                bucket.pause(delay)
+
+    async def single_flight(self, key: Hashable, load: Callable[[], T]) -> tuple[T, bool]:
+        """
+        Выполнить load (в потоке) один раз для всех одновременных вызовов с тем же ключом.
+
+        Ожидающие не занимают потоки: результат передаётся через concurrent.futures.Future,
+        поэтому вызовы из разных event loop тоже объединяются. Если ведущий вызов
+        отменён, ожидающие не получают его CancelledError: первый из них становится
+        ведущим и загружает заново.
+
+        Returns:
+            (результат, True — результат чужой загрузки).
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = Future()
+                else:
+                    self._counters['coalesced'] += 1
+
+            if leader:
+                break
+            logger.debug(f"🔗 Ожидаем уже идущую загрузку {key}")
+            try:
+                # shield: отмена ожидающего не должна отменять общую загрузку
+                return await asyncio.shield(asyncio.wrap_future(flight)), True
+            except LeaderCancelled:
+                logger.debug(f"🔗 Загрузка {key} отменена у ведущего, повторяем")
+
+        # Ключ снимается до того, как ожидающие узнают результат: повторивший вызов
+        # после отмены ведущего не должен снова застать завершённую загрузку
+        try:
+            result = await asyncio.to_thread(load)
+        except asyncio.CancelledError:
+            self._land(key)
+            flight.set_exception(LeaderCancelled(f"Загрузка {key} отменена"))
+            raise
+        except BaseException as e:
+            self._land(key)
+            flight.set_exception(e)
+            raise
+        self._land(key)
+        flight.set_result(result)
+        return result, False
+
+    def _land(self, key: Hashable) -> None:
+        with self._lock:
+            del self._flights[key]
+
+
+# Общий планировщик на процесс
+_shared: RequestScheduler | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> RequestScheduler:
+    """Общий на процесс RequestScheduler (создаётся при первом обращении)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RequestScheduler()
+        return _shared
@@ -0,0 +1,103 @@
+"""
+Реестр таблиц app_google: много таблиц (региональных) с одной разметкой COLUMN_MAPPING.
+
+Реестр — JSON-файл APP_GOOGLE_REGISTRY:
+
+    [
+        {"file_code": "1AbC...", "tag": "msk"},
+        {"file_code": "1XyZ...", "tag": "spb", "sheet_name": "02.03.2026"}
+    ]
+
+tag — метка таблицы в TaskList.source_tag (по умолчанию — file_code): сверка
+удалённых строк идёт в пределах (метка, лист), поэтому листы с одинаковыми именами
+в разных таблицах не мешают друг другу. Таблица не из реестра получает метку
+file_code. Без реестра — одна таблица APP_GOOGLE_FILE без метки (как раньше).
+
+Синхронизация всех таблиц — по заданию на таблицу в общей очереди (jobs.py):
+их разбирает ограниченный пул воркеров (worker.py) с общей авторизацией и общим
+пулом соединений с БД; ошибка или статистика одной таблицы не влияет на другие.
+
+    python -m src.app_google.worker --registry --drain --concurrency 8
+"""
+import json
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from src.app_google.config import APP_GOOGLE_FILE, REGISTRY_FILE, SHEET_NAME
+from src.app_google.jobs import enqueue_sync
+from src.config.logger import logger
+
+
+@dataclass(frozen=True)
+class Spreadsheet:
+    """Таблица реестра."""
+    file_code: str
+    tag: Optional[str] = None
+    sheet_name: str = SHEET_NAME
+
+
+def parse_registry(entries: list[dict]) -> tuple[Spreadsheet, ...]:
+    """
+    Записи реестра → таблицы. Запись без tag получает метку file_code: у каждой
+    таблицы реестра своя область сверки, даже если листы называются одинаково.
+
+    Raises:
+        ValueError: Нет file_code или повторяется file_code / tag.
+    """
+    spreadsheets = []
+    for entry in entries:
+        if not entry.get('file_code'):
+            raise ValueError(f"Запись реестра без file_code: {entry}")
+        file_code = entry['file_code'].strip()
+        spreadsheets.append(Spreadsheet(
+            file_code=file_code, tag=entry.get('tag') or file_code,
+            sheet_name=entry.get('sheet_name') or SHEET_NAME,
+        ))
+    for field in ('file_code', 'tag'):
+        values = [getattr(s, field) for s in spreadsheets if getattr(s, field) is not None]
+        duplicates = {v for v in values if values.count(v) > 1}
+        if duplicates:
+            raise ValueError(f"Повторяющиеся {field} в реестре: {sorted(duplicates)}")
+    return tuple(spreadsheets)
+
+
+@lru_cache(maxsize=None)
+def load_registry(path: Optional[str] = REGISTRY_FILE) -> tuple[Spreadsheet, ...]:
+    """Таблицы реестра (файл читается один раз); без реестра — APP_GOOGLE_FILE."""
+    if not path:
+        return (Spreadsheet(APP_GOOGLE_FILE),) if APP_GOOGLE_FILE else ()
+    spreadsheets = parse_registry(json.loads(Path(path).read_text(encoding='utf-8')))
+    logger.info(f"📚 Реестр таблиц {path}: {len(spreadsheets)}")
+    return spreadsheets
+
+
+def find_spreadsheet(file_code: str) -> Optional[Spreadsheet]:
+    """Таблица реестра по идентификатору или None, если её нет в реестре."""
+    file_code = file_code.strip()
+    return next((s for s in load_registry() if s.file_code == file_code), None)
+
+
+def tag_for(file_code: str) -> Optional[str]:
+    """
+    Метка таблицы для TaskList.source_tag: из реестра, для таблицы не из реестра — file_code.
+
+    None — только у APP_GOOGLE_FILE без реестра (единственная таблица, строки без метки как раньше).
+    """
+    spreadsheet = find_spreadsheet(file_code)
+    return spreadsheet.tag if spreadsheet else file_code.strip()
+
+
+async def enqueue_registry(sheet_name: Optional[str] = None) -> dict[str, Optional[int]]:
+    """
+    Поставить в очередь синхронизацию каждой таблицы реестра.
+
+    Args:
+        sheet_name: Лист (по умолчанию — лист из записи реестра).
+
+    Returns:
+        dict: {file_code: id задания или None, если БД недоступна}.
+    """
+    return {s.file_code: await enqueue_sync(s.file_code, sheet_name or s.sheet_name) for s in load_registry()}
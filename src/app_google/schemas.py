@@ -5,8 +5,11 @@ from typing import Optional, List, Annotated
 
 class SyncRequest(BaseModel):
     """Запрос на запуск синхронизации."""
-    file_code: Optional[str] = None
+    # Таблица из реестра; не задана — APP_GOOGLE_FILE (в Swagger по умолчанию null, а не "string")
+    file_code: Optional[str] = Field(None, examples=[None])
     sheet_name: Optional[str] = None
+    # Пробный прогон: выполняется сразу, возвращает счётчики изменений, ничего не записывает
+    dry_run: bool = False
 
 
 class SyncResponse(BaseModel):
@@ -14,9 +17,30 @@ class SyncResponse(BaseModel):
     status: str
     message: str
     stats: Optional[dict] = None
+    job_id: Optional[int] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class SyncJobResponse(BaseModel):
+    """Состояние задания синхронизации."""
+    id: int
+    file_code: str
+    sheet_name: str
+    status: str
+    stage: Optional[str] = None
+    progress: Optional[dict] = None
+    stats: Optional[dict] = None
+    message: Optional[str] = None
+    requests: int
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class TaskFilter(BaseModel):
     """Фильтры для получения задач."""
     date_from: Optional[date] = None
@@ -0,0 +1,219 @@
+"""
+Снимки листов в постоянной базе DuckDB для app_google (включается APP_GOOGLE_SNAPSHOT_DB).
+
+Для каждого листа хранится таблица — строки листа (после transform), записанные
+в PostgreSQL последним успешным запуском. Новый запуск складывает строки листа
+в DuckDB, одним запросом (FULL JOIN по link_post) сравнивает их со снимком
+и отдаёт писателю только новые и изменившиеся строки, а для деактивации —
+только пропавшие ключи. Повторная синхронизация неизменившегося большого листа
+не делает в PostgreSQL ни одного запроса.
+
+Снимок заменяется только после записи без ошибок; при ошибках записи он
+удаляется, и следующий запуск сверяет лист с БД полностью.
+
+Снимок локален (файл процесса), а TaskList пишут и другие: воркеры на других
+узлах, загрузка всех листов, запуски без снимка. Поэтому у снимка есть
+идентификатор, который после записи сохраняется в sheet_ledger.snapshot_id;
+любая запись листа не по этому снимку сначала его сбрасывает (ledger.forget_snapshot_id).
+Снимок с другим идентификатором считается отсутствующим — лист сверяется с БД
+полностью. Ссылки, которыми владеет другой лист (writer._on_conflict_upsert),
+в снимок не попадают: они отправляются при каждом запуске, чтобы строка
+восстановилась, когда владелец её деактивирует.
+
+Файл DuckDB открывается одним процессом (блокировка DuckDB): если он занят
+другим процессом, синхронизация идёт без снимка.
+Зависимости: duckdb, pyarrow, src.app_google.transform
+"""
+import hashlib
+import threading
+import uuid
+
+from typing import NamedTuple, Optional
+
+import duckdb
+import pyarrow as pa
+
+from src.app_google.config import SHEET_ROW_COLUMN, SNAPSHOT_DB
+from src.app_google.transform import TRANSFORM_SCHEMA
+from src.app_google.writer import HASH_COLUMN, SOURCE_COLUMN
+from src.config.logger import logger
+
+# Каталог снимков: какой таблице DuckDB соответствует лист
+CATALOG_TABLE: str = 'sheet_snapshots'
+
+# Операции в результате сравнения
+OP_INSERT = 'insert'
+OP_CHANGE = 'change'
+OP_REMOVE = 'remove'
+OP_SAME = 'same'
+
+
+class SnapshotDelta(NamedTuple):
+    """Результат сравнения листа со снимком."""
+    upserts: pa.Table        # новые и изменившиеся строки (TRANSFORM_SCHEMA, в порядке строк листа)
+    removed: pa.Array        # link_post, пропавшие из листа
+    previous: bool           # был ли снимок (иначе removed неизвестны — нужна полная сверка)
+    counts: dict[str, int]   # inserted / changed / removed / unchanged
+
+
+class SheetSnapshot:
+    """Снимок одного листа: приём строк текущего запуска, сравнение, замена."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, file_code: str, sheet_name: str,
+                 expected: Optional[str] = None, fresh: bool = False):
+        """
+        Args:
+            expected: Идентификатор снимка, с которым совпадает БД (sheet_ledger.snapshot_id);
+                      прежний снимок с другим идентификатором не используется.
+            fresh: Не сравнивать с прежним снимком (полная сверка с БД), только записать новый.
+        """
+        self.conn = conn
+        self.file_code = file_code
+        self.sheet_name = sheet_name
+        digest = hashlib.md5(f"{file_code}\x1f{sheet_name}".encode()).hexdigest()[:16]
+        self.table = f"snap_{digest}"
+        self.staging = f"{self.table}_new"
+        self.current = f"{self.table}_cur"
+
+        self.conn.register('snapshot_schema', TRANSFORM_SCHEMA.empty_table())
+        try:
+            self.conn.execute(f"CREATE OR REPLACE TABLE {self.staging} AS SELECT * FROM snapshot_schema")
+        finally:
+            self.conn.unregister('snapshot_schema')
+        self.previous = not fresh and expected is not None and self.conn.execute(
+            f"SELECT count(*) FROM {CATALOG_TABLE} WHERE table_name = ? AND snapshot_id = ?", [self.table, expected]
+        ).fetchone()[0] > 0
+
+    def append(self, tasks: pa.Table) -> None:
+        """Добавить кусок строк листа (результат transform)."""
+        if not tasks.num_rows:
+            return
+        self.conn.register('snapshot_chunk', tasks)
+        try:
+            self.conn.execute(f"INSERT INTO {self.staging} SELECT * FROM snapshot_chunk")
+        finally:
+            self.conn.unregister('snapshot_chunk')
+
+    def diff(self) -> SnapshotDelta:
+        """
+        Сравнить принятые строки со снимком.
+
+        Дубликаты link_post схлопываются (побеждает нижняя строка листа), затем один
+        FULL JOIN по link_post размечает ключи: insert / change / remove / same.
+        """
+        self.conn.execute(
+            f"CREATE OR REPLACE TABLE {self.current} AS SELECT * FROM {self.staging} "
+            f"QUALIFY row_number() OVER (PARTITION BY link_post ORDER BY {SHEET_ROW_COLUMN} DESC) = 1"
+        )
+        self.conn.execute(f"DROP TABLE {self.staging}")
+        previous = self.table if self.previous else f"(SELECT * FROM {self.current} LIMIT 0)"
+        self.conn.execute(
+            f"CREATE OR REPLACE TEMP TABLE snapshot_delta AS "
+            f"SELECT coalesce(c.link_post, p.link_post) AS link_post, CASE "
+            f"WHEN p.link_post IS NULL THEN '{OP_INSERT}' "
+            f"WHEN c.link_post IS NULL THEN '{OP_REMOVE}' "
+            f"WHEN c.{HASH_COLUMN} IS DISTINCT FROM p.{HASH_COLUMN} "
+            f"OR c.{SOURCE_COLUMN} IS DISTINCT FROM p.{SOURCE_COLUMN} THEN '{OP_CHANGE}' "
+            f"ELSE '{OP_SAME}' END AS op "
+            f"FROM {self.current} c FULL JOIN {previous} p ON c.link_post = p.link_post"
+        )
+        counts = dict(self.conn.execute("SELECT op, count(*) FROM snapshot_delta GROUP BY op").fetchall())
+        upserts = self.conn.execute(
+            f"SELECT c.* FROM {self.current} c JOIN snapshot_delta d USING (link_post) "
+            f"WHERE d.op IN ('{OP_INSERT}', '{OP_CHANGE}') ORDER BY c.{SHEET_ROW_COLUMN}"
+        ).fetch_arrow_table().cast(TRANSFORM_SCHEMA)
+        removed = self.conn.execute(
+            f"SELECT link_post FROM snapshot_delta WHERE op = '{OP_REMOVE}' ORDER BY link_post"
+        ).fetch_arrow_table().column('link_post').combine_chunks()
+        self.conn.execute("DROP TABLE snapshot_delta")
+        return SnapshotDelta(upserts, removed, self.previous, {
+            'inserted': counts.get(OP_INSERT, 0), 'changed': counts.get(OP_CHANGE, 0),
+            'removed': counts.get(OP_REMOVE, 0), 'unchanged': counts.get(OP_SAME, 0),
+        })
+
+    def exclude(self, keys: pa.Array) -> None:
+        """Не запоминать ключи в новом снимке (следующий запуск отправит их снова)."""
+        if not len(keys):
+            return
+        self.conn.register('snapshot_excluded', pa.table({'link_post': keys}))
+        try:
+            self.conn.execute(
+                f"DELETE FROM {self.current} WHERE link_post IN (SELECT link_post FROM snapshot_excluded)"
+            )
+        finally:
+            self.conn.unregister('snapshot_excluded')
+
+    def commit(self) -> str:
+        """
+        Запись прошла: текущие строки становятся снимком листа.
+
+        Returns:
+            str: Идентификатор нового снимка (сохраняется в sheet_ledger.snapshot_id).
+        """
+        snapshot_id = uuid.uuid4().hex
+        self.conn.execute("BEGIN")
+        self.conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.conn.execute(f"ALTER TABLE {self.current} RENAME TO {self.table}")
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {CATALOG_TABLE} (table_name, file_code, sheet_name, rows, updated_at, "
+            f"snapshot_id) VALUES (?, ?, ?, (SELECT count(*) FROM {self.table}), now(), ?)",
+            [self.table, self.file_code, self.sheet_name, snapshot_id],
+        )
+        self.conn.execute("COMMIT")
+        return snapshot_id
+
+    def keep(self) -> None:
+        """Лист совпал со снимком и в БД ничего не писалось: прежний снимок остаётся в силе."""
+        self.conn.execute(f"DROP TABLE IF EXISTS {self.current}")
+
+    def discard(self) -> None:
+        """Запись не удалась: состояние БД неизвестно — снимок удаляется, следующий запуск сверит всё."""
+        for name in (self.staging, self.current, self.table):
+            self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+        self.conn.execute(f"DELETE FROM {CATALOG_TABLE} WHERE table_name = ?", [self.table])
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SnapshotStore:
+    """Постоянная база DuckDB со снимками листов (одно соединение на процесс, курсор на лист)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = duckdb.connect(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (table_name VARCHAR PRIMARY KEY, file_code VARCHAR, "
+            f"sheet_name VARCHAR, rows BIGINT, updated_at TIMESTAMP, snapshot_id VARCHAR)"
+        )
+        # Каталог, созданный до появления идентификаторов: снимки без него не используются
+        self._conn.execute(f"ALTER TABLE {CATALOG_TABLE} ADD COLUMN IF NOT EXISTS snapshot_id VARCHAR")
+
+    def open_sheet(self, file_code: str, sheet_name: str, expected: Optional[str] = None,
+                   fresh: bool = False) -> SheetSnapshot:
+        """Снимок листа на отдельном курсоре (курсоры DuckDB можно использовать из разных потоков)."""
+        return SheetSnapshot(self._conn.cursor(), file_code, sheet_name, expected, fresh)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_store: SnapshotStore | None = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def shared_snapshot_store() -> Optional[SnapshotStore]:
+    """Общее на процесс хранилище снимков или None (выключено или файл занят другим процессом)."""
+    global _store, _store_failed
+    if not SNAPSHOT_DB:
+        return None
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = SnapshotStore(SNAPSHOT_DB)
+                logger.info(f"📸 Снимки листов: {SNAPSHOT_DB}")
+            except duckdb.Error as e:
+                _store_failed = True
+                logger.warning(f"⚠️ Снимки листов недоступны ({SNAPSHOT_DB}): {e}")
+        return _store
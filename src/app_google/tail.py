@@ -0,0 +1,129 @@
+"""
+Дозагрузка хвоста листа для app_google (листы, в которые строки только дописываются снизу).
+
+В журнале sheet_ledger для листа хранится номер последней обработанной строки
+(tail_row) и контрольная сумма строк до неё включительно (tail_checksum — md5 по
+номеру строки листа, link_post и row_hash после transform, в порядке строк).
+Следующий запуск читает лист как обычно и считает ту же сумму по строкам
+не ниже tail_row: если она совпала, в БД пишутся только строки ниже, а сверка
+удалённых строк не нужна (удаление строки меняет сумму). Если строки выше
+изменились, вставлены или удалены — TailMismatch, и пайплайн выполняет полную
+синхронизацию.
+
+Строки листа всё равно читаются целиком (иначе правку выше хвоста не заметить),
+но запись в БД и сверка удалённых строк пропорциональны числу новых строк.
+Зависимости: duckdb, pyarrow, src.app_google.transform
+"""
+import hashlib
+from typing import NamedTuple, Optional
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.app_google.config import SHEET_ROW_COLUMN
+from src.app_google.transform import TASKS_TABLE
+from src.app_google.writer import HASH_COLUMN
+
+
+class TailState(NamedTuple):
+    """Последняя обработанная строка листа и контрольная сумма строк до неё."""
+    last_row: int
+    checksum: str
+
+
+class TailMismatch(Exception):
+    """Строки листа выше обработанного хвоста изменились — нужна полная синхронизация."""
+
+
+def split_rows_text(conn: duckdb.DuckDBPyConnection, tasks: pa.Table,
+                    boundary: Optional[int]) -> tuple[str, str]:
+    """
+    Текст строк куска для контрольной суммы: (строки листа ≤ boundary, строки ниже).
+
+    Каждая строка завершается разделителем, поэтому тексты кусков можно
+    дописывать в один md5 по порядку — сумма не зависит от деления на куски.
+    boundary=None — все строки в первой части.
+    """
+    line = (f"CAST({SHEET_ROW_COLUMN} AS VARCHAR) || chr(31) || link_post || chr(31) || "
+            f"{HASH_COLUMN} || chr(30)")
+    head = 'TRUE' if boundary is None else f"{SHEET_ROW_COLUMN} <= {int(boundary)}"
+    conn.register(TASKS_TABLE, tasks)
+    try:
+        return conn.execute(
+            f"SELECT coalesce(string_agg({line}, '' ORDER BY {SHEET_ROW_COLUMN}) FILTER (WHERE {head}), ''), "
+            f"coalesce(string_agg({line}, '' ORDER BY {SHEET_ROW_COLUMN}) FILTER (WHERE NOT ({head})), '') "
+            f"FROM {TASKS_TABLE}"
+        ).fetchone()
+    finally:
+        conn.unregister(TASKS_TABLE)
+
+
+class TailTracker:
+    """
+    Контрольная сумма листа по мере чтения кусков и отбор строк для записи.
+
+    Без known (первый запуск, полная синхронизация) пропускает все строки
+    и только считает сумму для следующего запуска.
+    """
+
+    def __init__(self, known: Optional[TailState] = None):
+        self.known = known
+        self.last_row = 0
+        self._digest = hashlib.md5()
+        self._verified = known is None
+
+    @property
+    def incremental(self) -> bool:
+        """Пишутся только строки ниже known.last_row."""
+        return self.known is not None
+
+    def _verify(self) -> None:
+        if self._digest.hexdigest() != self.known.checksum:
+            raise TailMismatch(f"строки 2..{self.known.last_row} изменились")
+        self._verified = True
+
+    def feed(self, conn: duckdb.DuckDBPyConnection, batch: pa.RecordBatch, tasks: pa.Table) -> pa.Table:
+        """
+        Учесть кусок листа.
+
+        Args:
+            conn: Соединение DuckDB.
+            batch: Исходный батч листа (для номера последней строки).
+            tasks: Результат transform для batch (до схлопывания дубликатов).
+
+        Returns:
+            pa.Table: Строки tasks, которые нужно записать.
+
+        Raises:
+            TailMismatch: Сумма строк до known.last_row не совпала с сохранённой.
+        """
+        batch_last = pc.max(batch.column(SHEET_ROW_COLUMN)).as_py() or 0
+        self.last_row = max(self.last_row, batch_last)
+        if self._verified:
+            self._digest.update(split_rows_text(conn, tasks, None)[0].encode())
+            return tasks
+
+        boundary = self.known.last_row
+        head, rest = split_rows_text(conn, tasks, boundary)
+        self._digest.update(head.encode())
+        if batch_last <= boundary:
+            return tasks.slice(0, 0)
+        # Кусок дошёл до новых строк: все строки до boundary учтены
+        self._verify()
+        self._digest.update(rest.encode())
+        return tasks.filter(pc.greater(tasks.column(SHEET_ROW_COLUMN), boundary))
+
+    def finish(self) -> TailState:
+        """
+        Завершить чтение листа.
+
+        Returns:
+            TailState: Состояние для следующего запуска.
+
+        Raises:
+            TailMismatch: Лист закончился раньше known.last_row или строки до неё изменились.
+        """
+        if not self._verified:
+            self._verify()
+        return TailState(self.last_row, self._digest.hexdigest())
@@ -0,0 +1,266 @@
+"""
+Преобразование данных листа в DuckDB для app_google.
+
+Приведение типов выполняется одним векторизованным запросом DuckDB
+(TRY_CAST, try_strptime, trim) вместо построчных safe_str/safe_int/safe_date.
+Зависимости: duckdb, pyarrow, src.app_google.config, src.app_google.models
+"""
+from datetime import date, datetime
+from typing import Any
+
+import duckdb
+import pyarrow as pa
+
+from src.app_google.config import COLUMN_MAPPING, SHEET_ROW_COLUMN
+from src.app_google.get_google import to_arrow_column
+from src.app_google.models import TaskList
+from src.app_google.writer import HASH_COLUMN, SHEET_COLUMN, SOURCE_COLUMN, TASK_COLUMNS, TASK_SCHEMA
+
+# === Константы ===
+
+# Форматы дат в листе (в порядке приоритета по умолчанию)
+DATE_FORMATS: tuple[str, ...] = ('%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y')
+
+# Сколько непустых значений столбца смотреть при определении формата даты
+DATE_SAMPLE_SIZE: int = 200
+
+# Так Python (str(datetime)) печатает даты в столбцах со смешанными типами
+DATETIME_TEXT_FORMAT: str = '%Y-%m-%d %H:%M:%S'
+
+# Пробельные символы, которые срезаются по краям (включая неразрывный пробел)
+WHITESPACE: str = ' \t\n\r\xa0'
+WHITESPACE_SQL: str = "' ' || chr(9) || chr(10) || chr(13) || chr(160)"
+
+SOURCE_TABLE: str = 'sheet_data'
+TASKS_TABLE: str = 'sheet_tasks'
+
+# Схема результата transform: столбцы TaskList + номер строки листа
+TRANSFORM_SCHEMA: pa.Schema = TASK_SCHEMA.append(pa.field(SHEET_ROW_COLUMN, pa.int64()))
+
+
+# =========================================================================
+# === Arrow-представление листа ===
+# =========================================================================
+
+def sheet_to_arrow(data: list[dict[str, Any]], columns: list[str]) -> pa.Table:
+    """Строки листа (list[dict]) → Arrow-таблица из нужных столбцов и номеров строк."""
+    arrays = {col: to_arrow_column([row.get(col) for row in data]) for col in columns}
+    arrays[SHEET_ROW_COLUMN] = pa.array(range(2, len(data) + 2), type=pa.int64())
+    return pa.table(arrays)
+
+
+# =========================================================================
+# === Определение форматов дат ===
+# =========================================================================
+
+def detect_date_formats(values: list[Any], formats: tuple[str, ...] = DATE_FORMATS) -> list[str]:
+    """
+    Форматы дат, встречающиеся в выборке значений, по убыванию частоты.
+
+    Если ни один формат не подошёл — возвращаются все (порядок по умолчанию).
+    """
+    hits = dict.fromkeys(formats, 0)
+    sample = [v.strip(WHITESPACE) for v in values if isinstance(v, str) and v.strip(WHITESPACE)]
+    for value in sample[:DATE_SAMPLE_SIZE]:
+        for fmt in formats:
+            try:
+                datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            hits[fmt] += 1
+            break
+
+    detected = sorted((fmt for fmt in formats if hits[fmt]), key=lambda fmt: -hits[fmt])
+    return detected or list(formats)
+
+
+# =========================================================================
+# === Выражения приведения типов ===
+# =========================================================================
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _text_expr(col: str, dtype: pa.DataType) -> str:
+    """Аналог safe_str: целые float без '.0', пустые строки → NULL."""
+    if pa.types.is_null(dtype):
+        return 'CAST(NULL AS VARCHAR)'
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        return f"NULLIF(trim({col}, {WHITESPACE_SQL}), '')"
+    if pa.types.is_floating(dtype):
+        return (f"CASE WHEN {col} = trunc({col}) THEN CAST(CAST({col} AS BIGINT) AS VARCHAR) "
+                f"ELSE CAST({col} AS VARCHAR) END")
+    return f"CAST({col} AS VARCHAR)"
+
+
+def _int_expr(col: str, dtype: pa.DataType) -> str:
+    """Аналог safe_int: пробелы и NBSP внутри числа удаляются, мусор → NULL."""
+    if pa.types.is_integer(dtype):
+        return f"TRY_CAST({col} AS INTEGER)"
+    if pa.types.is_floating(dtype):
+        return f"CASE WHEN {col} = trunc({col}) THEN TRY_CAST({col} AS INTEGER) END"
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        cleaned = f"replace(replace({col}, ' ', ''), chr(160), '')"
+        return f"TRY_CAST(trunc(TRY_CAST({cleaned} AS DOUBLE)) AS INTEGER)"
+    return 'CAST(NULL AS INTEGER)'
+
+
+def _date_expr(col: str, dtype: pa.DataType, formats: list[str]) -> str:
+    """Аналог safe_date: строки разбираются try_strptime по найденным форматам."""
+    if pa.types.is_date(dtype):
+        return f"CAST({col} AS DATE)"
+    if pa.types.is_timestamp(dtype):
+        return f"CAST({col} AS DATE)"
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        format_list = ', '.join(_literal(fmt) for fmt in [*formats, DATETIME_TEXT_FORMAT])
+        return f"CAST(try_strptime(trim({col}, {WHITESPACE_SQL}), [{format_list}]) AS DATE)"
+    return 'CAST(NULL AS DATE)'
+
+
+def _column_expr(target: str, source: str | None, schema: pa.Schema, date_formats: list[str]) -> str:
+    """Выражение DuckDB для столбца TaskList по типу целевого столбца."""
+    python_type = TaskList.__table__.c[target].type.python_type
+    if source is None:
+        sql_type = {date: 'DATE', int: 'INTEGER'}.get(python_type, 'VARCHAR')
+        return f"CAST(NULL AS {sql_type})"
+
+    col, dtype = _quote(source), schema.field(source).type
+    if python_type is date:
+        return _date_expr(col, dtype, date_formats)
+    if python_type is int:
+        return _int_expr(col, dtype)
+    return _text_expr(col, dtype)
+
+
+def detect_column_formats(table: pa.Table | pa.RecordBatch) -> dict[str, list[str]]:
+    """Форматы дат для каждого столбца-даты листа (по выборке первых значений)."""
+    formats = {}
+    for source, target in COLUMN_MAPPING.items():
+        if TaskList.__table__.c[target].type.python_type is date and source in table.schema.names:
+            formats[source] = detect_date_formats(table.column(source).slice(0, DATE_SAMPLE_SIZE * 5).to_pylist())
+    return formats
+
+
+def build_hash_expr(columns: list[str]) -> str:
+    """
+    md5 содержимого строки по типизированным столбцам.
+
+    NULL кодируется отдельным символом, чтобы NULL и пустая строка, а также
+    сдвиг значений между столбцами давали разные хэши.
+    """
+    parts = ', '.join(f"coalesce(CAST({col} AS VARCHAR), chr(30))" for col in columns)
+    return f"md5(concat_ws(chr(31), {parts}))"
+
+
+def build_transform_query(schema: pa.Schema, date_formats: dict[str, list[str]],
+                          sheet_name: str | None = None, source_tag: str | None = None) -> str:
+    """
+    SELECT, приводящий столбцы листа к типам TaskList.
+
+    Выражения выбираются по Arrow-типу исходного столбца; строки без link_post
+    отбрасываются. Для каждой строки считается хэш содержимого (HASH_COLUMN)
+    и проставляются лист и метка таблицы-источника (SHEET_COLUMN, SOURCE_COLUMN). Номер строки листа
+    (SHEET_ROW_COLUMN) передаётся как есть.
+    """
+    sources = {target: source for source, target in COLUMN_MAPPING.items() if source in schema.names}
+    select_parts = [
+        f"{_column_expr(target, sources.get(target), schema, date_formats.get(sources.get(target), list(DATE_FORMATS)))}"
+        f" AS {target}"
+        for target in TASK_COLUMNS
+    ]
+    select_parts.append(SHEET_ROW_COLUMN)
+
+    hashed = [col for col in TASK_COLUMNS if col != 'link_post']
+    sheet = _literal(sheet_name) if sheet_name is not None else 'CAST(NULL AS VARCHAR)'
+    source = _literal(source_tag) if source_tag is not None else 'CAST(NULL AS VARCHAR)'
+    return (
+        f"SELECT {', '.join(TASK_COLUMNS)}, {build_hash_expr(hashed)} AS {HASH_COLUMN}, "
+        f"{sheet} AS {SHEET_COLUMN}, {source} AS {SOURCE_COLUMN}, {SHEET_ROW_COLUMN} "
+        f"FROM (SELECT {', '.join(select_parts)} FROM {SOURCE_TABLE}) "
+        f"WHERE link_post IS NOT NULL"
+    )
+
+
+def transform(conn: duckdb.DuckDBPyConnection, data: pa.Table | pa.RecordBatch,
+              date_formats: dict[str, list[str]] | None = None, sheet_name: str | None = None,
+              source_tag: str | None = None) -> pa.Table:
+    """
+    Приводит данные листа к типам TaskList (Arrow → DuckDB → Arrow).
+
+    Args:
+        conn: Соединение DuckDB.
+        data: Столбцы листа (заголовки COLUMN_MAPPING) и SHEET_ROW_COLUMN.
+        date_formats: Форматы дат по столбцам (по умолчанию — по выборке из data).
+        sheet_name: Имя листа-источника для SHEET_COLUMN.
+        source_tag: Метка таблицы-источника для SOURCE_COLUMN.
+
+    Returns:
+        pa.Table: Таблица со схемой TRANSFORM_SCHEMA.
+    """
+    if isinstance(data, pa.RecordBatch):
+        data = pa.Table.from_batches([data])
+    if date_formats is None:
+        date_formats = detect_column_formats(data)
+
+    conn.register(SOURCE_TABLE, data)
+    try:
+        query = build_transform_query(data.schema, date_formats, sheet_name, source_tag)
+        return conn.execute(query).fetch_arrow_table().cast(TRANSFORM_SCHEMA)
+    finally:
+        conn.unregister(SOURCE_TABLE)
+
+
+def deduplicate(conn: duckdb.DuckDBPyConnection, tasks: pa.Table) -> pa.Table:
+    """
+    Схлопывает дубликаты link_post: побеждает нижняя строка листа.
+
+    ON CONFLICT не может обновить одну строку дважды в одном запросе,
+    поэтому писатель ожидает уникальные ключи.
+    """
+    conn.register(TASKS_TABLE, tasks)
+    try:
+        return conn.execute(
+            f"SELECT * FROM {TASKS_TABLE} "
+            f"QUALIFY row_number() OVER (PARTITION BY link_post ORDER BY {SHEET_ROW_COLUMN} DESC) = 1 "
+            f"ORDER BY {SHEET_ROW_COLUMN}"
+        ).fetch_arrow_table().cast(TRANSFORM_SCHEMA)
+    finally:
+        conn.unregister(TASKS_TABLE)
+
+
+def transform_batches(conn: duckdb.DuckDBPyConnection, batches: list[pa.RecordBatch],
+                      sheet_name: str | None = None, source_tag: str | None = None) -> pa.Table:
+    """
+    Батчи листа → одна типизированная таблица без дубликатов link_post.
+
+    Форматы дат определяются по первому непустому батчу и применяются ко всем.
+    Типы Arrow у батчей могут различаться — запрос строится под каждый.
+    """
+    batches = [batch for batch in batches if batch.num_rows]
+    if not batches:
+        return TRANSFORM_SCHEMA.empty_table()
+
+    date_formats = detect_column_formats(batches[0])
+    typed = pa.concat_tables([transform(conn, batch, date_formats, sheet_name, source_tag) for batch in batches])
+    return deduplicate(conn, typed)
+
+
+def fingerprint(conn: duckdb.DuckDBPyConnection, tasks: pa.Table) -> str:
+    """
+    Отпечаток содержимого листа: md5 по парам (link_post, row_hash).
+
+    Не зависит от порядка строк в листе; пустой лист даёт md5 пустой строки.
+    """
+    conn.register(TASKS_TABLE, tasks)
+    try:
+        return conn.execute(
+            f"SELECT md5(coalesce(string_agg(link_post || chr(31) || {HASH_COLUMN}, chr(30) "
+            f"ORDER BY link_post), '')) FROM {TASKS_TABLE}"
+        ).fetchone()[0]
+    finally:
+        conn.unregister(TASKS_TABLE)
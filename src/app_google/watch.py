@@ -0,0 +1,256 @@
+"""
+Синхронизация по уведомлениям Drive об изменениях таблицы для app_google.
+
+- Подписка: Drive files.watch присылает POST на WEBHOOK_URL (эндпоинт
+  /app_google/webhook/drive) при каждом изменении файла. Каналы хранятся
+  в watch_channel и продлеваются фоновой задачей за WATCH_RENEW_BEFORE
+  до истечения: создаётся новый канал, старый останавливается.
+- Эндпоинт публичный, поэтому у каждого канала свой случайный секрет (watch_channel.token):
+  Drive присылает его в X-Goog-Channel-Token, уведомление без верного секрета отклоняется.
+  Каналы без секрета (созданные до его появления) заменяются при ближайшей проверке.
+- Уведомления приходят всплесками (каждая правка ячейки — отдельное уведомление),
+  поэтому они схлопываются: синхронизация ставится в очередь, когда уведомлений
+  не было WEBHOOK_DEBOUNCE секунд (но не позже WEBHOOK_MAX_DELAY после первого).
+  Задание обычное: пайплайн сам проверит ревизию и запишет только хвост листа.
+
+Несколько процессов API: продлевает каналы один (advisory lock в PostgreSQL),
+повторные задания схлопывает очередь (jobs.enqueue_sync).
+Зависимости: src.config.database, src.app_google.get_google, jobs, models
+"""
+import asyncio
+import hmac
+import secrets
+import time
+import uuid
+
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Hashable, Optional
+
+from sqlalchemy import delete, func, select, text
+
+from src.app_google.config import (
+    SHEET_NAME, WATCH_CHECK_INTERVAL, WATCH_RENEW_BEFORE, WATCH_TTL, WEBHOOK_DEBOUNCE, WEBHOOK_MAX_DELAY,
+    WEBHOOK_SHEET, WEBHOOK_URL,
+)
+from src.app_google.get_google import GoogleSheetProcessor
+from src.app_google.jobs import enqueue_sync
+from src.app_google.models import WatchChannel
+from src.app_google.registry import find_spreadsheet
+from src.config.database import engine, async_session
+from src.config.logger import logger
+
+# === Состояния ресурса (X-Goog-Resource-State) ===
+
+# Первое сообщение после создания канала — не изменение
+STATE_SYNC = 'sync'
+# Изменения файла, после которых нужна синхронизация
+CHANGE_STATES: frozenset[str] = frozenset({'update', 'change', 'add', 'untrash'})
+
+# Ключ advisory lock продления каналов (один процесс на кластер)
+WATCH_LOCK_KEY: int = 0x61707067  # 'appg'
+
+
+def _utcnow() -> datetime:
+    """Текущее время UTC без часового пояса (как хранится в watch_channel)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Debouncer:
+    """
+    Схлопывание всплесков событий по ключу.
+
+    action(key) вызывается один раз, когда событий по ключу не было quiet секунд,
+    но не позже max_delay после первого события всплеска.
+    """
+
+    def __init__(self, action: Callable[[Hashable], Awaitable[None]],
+                 quiet: float = WEBHOOK_DEBOUNCE, max_delay: float = WEBHOOK_MAX_DELAY):
+        self.action = action
+        self.quiet = quiet
+        self.max_delay = max(max_delay, quiet)
+        # ключ → [время первого события, время последнего события]
+        self._pending: dict[Hashable, list[float]] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self.counters = {'received': 0, 'fired': 0}
+
+    def touch(self, key: Hashable) -> None:
+        """Событие по ключу: отложить action(key)."""
+        self.counters['received'] += 1
+        now = time.monotonic()
+        if key in self._pending:
+            self._pending[key][1] = now
+            return
+        self._pending[key] = [now, now]
+        self._tasks[key] = asyncio.create_task(self._wait(key))
+
+    async def _wait(self, key: Hashable) -> None:
+        while True:
+            first, last = self._pending[key]
+            delay = min(last + self.quiet, first + self.max_delay) - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        del self._pending[key]
+        self._tasks.pop(key, None)
+        await self._fire(key)
+
+    async def _fire(self, key: Hashable) -> None:
+        self.counters['fired'] += 1
+        try:
+            await self.action(key)
+        except Exception as e:
+            logger.error(f"❌ Отложенное действие для {key}: {e}", exc_info=True)
+
+    async def flush(self) -> None:
+        """Выполнить все отложенные действия сразу (при остановке приложения)."""
+        keys = list(self._pending)
+        for key in keys:
+            task = self._tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+            self._pending.pop(key, None)
+            await self._fire(key)
+
+
+async def _enqueue_changed(file_code: str) -> None:
+    spreadsheet = find_spreadsheet(file_code)
+    job_id = await enqueue_sync(file_code, WEBHOOK_SHEET or (spreadsheet.sheet_name if spreadsheet else SHEET_NAME))
+    logger.info(f"🔔 Изменения {file_code}: задание #{job_id}")
+
+
+_debouncer: Debouncer | None = None
+
+# channel_id → (file_code, секрет) (каналы неизменяемы, кэш не устаревает)
+_channels: dict[str, tuple[str, Optional[str]]] = {}
+
+
+def shared_debouncer() -> Debouncer:
+    """Общий на процесс Debouncer уведомлений (создаётся при первом обращении)."""
+    global _debouncer
+    if _debouncer is None:
+        _debouncer = Debouncer(_enqueue_changed)
+    return _debouncer
+
+
+async def close_debouncer() -> None:
+    """Поставить в очередь отложенные синхронизации (при остановке приложения)."""
+    if _debouncer is not None:
+        await _debouncer.flush()
+
+
+async def channel_file(channel_id: str) -> Optional[tuple[str, Optional[str]]]:
+    """(таблица, секрет канала) или None для неизвестного (остановленного) канала."""
+    if channel_id in _channels:
+        return _channels[channel_id]
+    if engine is None:
+        return None
+    async with async_session() as session:
+        row = (await session.execute(
+            select(WatchChannel.file_code, WatchChannel.token).where(WatchChannel.channel_id == channel_id)
+        )).one_or_none()
+    if row is None:
+        return None
+    _channels[channel_id] = (row.file_code, row.token)
+    return _channels[channel_id]
+
+
+async def handle_notification(channel_id: str, token: Optional[str], state: str) -> str:
+    """
+    Обработать уведомление Drive.
+
+    Returns:
+        str: 'debounced' — синхронизация отложена, 'ignored' — уведомление не требует синхронизации.
+
+    Raises:
+        PermissionError: Канал неизвестен, у него нет секрета или секрет не совпадает.
+    """
+    channel = await channel_file(channel_id)
+    if channel is None:
+        logger.warning(f"⚠️ Уведомление неизвестного канала {channel_id}")
+        raise PermissionError('Unknown channel')
+    file_code, secret = channel
+    if not secret or not hmac.compare_digest((token or '').encode(), secret.encode()):
+        raise PermissionError('Invalid channel token')
+    if state not in CHANGE_STATES:
+        return 'ignored'
+    shared_debouncer().touch(file_code)
+    return 'debounced'
+
+
+# =========================================================================
+# === Каналы ===
+# =========================================================================
+
+async def _open_channel(processor: GoogleSheetProcessor, file_code: str) -> WatchChannel:
+    """Создать канал уведомлений для файла (files.watch)."""
+    channel_id, token = str(uuid.uuid4()), secrets.token_urlsafe(32)
+    expiration_ms = int((time.time() + WATCH_TTL) * 1000)
+    answer = await processor.watch_file(file_code, channel_id, WEBHOOK_URL, token, expiration_ms)
+    expires_at = datetime.fromtimestamp(int(answer.get('expiration', expiration_ms)) / 1000, timezone.utc)
+    logger.info(f"👀 Канал {channel_id} для {file_code} до {expires_at:%Y-%m-%d %H:%M} UTC")
+    return WatchChannel(channel_id=channel_id, file_code=file_code, resource_id=answer['resourceId'], token=token,
+                        expires_at=expires_at.replace(tzinfo=None))
+
+
+async def renew_channels(file_codes: list[str], processor: Optional[GoogleSheetProcessor] = None) -> int:
+    """
+    Подписать файлы без действующего канала и продлить истекающие.
+
+    Новый канал создаётся до остановки старого — уведомления не теряются.
+    Если продлением уже занят другой процесс, ничего не делает.
+
+    Returns:
+        int: Сколько каналов создано.
+    """
+    if engine is None or not WEBHOOK_URL:
+        return 0
+    processor = processor or GoogleSheetProcessor(timeout=30)
+    created = 0
+    async with async_session() as session:
+        if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': WATCH_LOCK_KEY}):
+            return 0
+
+        now = _utcnow()
+        await session.execute(delete(WatchChannel).where(WatchChannel.expires_at <= now))
+        latest = dict((await session.execute(
+            select(WatchChannel.file_code, func.max(WatchChannel.expires_at))
+            .where(WatchChannel.file_code.in_(file_codes), WatchChannel.token.is_not(None))
+            .group_by(WatchChannel.file_code)
+        )).all())
+
+        renew_at = now + timedelta(seconds=WATCH_RENEW_BEFORE)
+        for file_code in file_codes:
+            if file_code in latest and latest[file_code] > renew_at:
+                continue
+            try:
+                channel = await _open_channel(processor, file_code)
+            except Exception as e:
+                logger.error(f"❌ Подписка на изменения {file_code}: {type(e).__name__}: {e}")
+                continue
+            old = (await session.execute(
+                select(WatchChannel).where(WatchChannel.file_code == file_code)
+            )).scalars().all()
+            session.add(channel)
+            created += 1
+            for previous in old:
+                with suppress(Exception):
+                    await processor.stop_channel(previous.channel_id, previous.resource_id)
+                await session.delete(previous)
+        await session.commit()
+    return created
+
+
+async def run_channel_renewer(file_codes: list[str], stop_event: asyncio.Event) -> None:
+    """Фоновая задача: проверять каналы каждые WATCH_CHECK_INTERVAL секунд до stop_event."""
+    logger.info(f"👀 Подписка на изменения: {len(file_codes)} файлов → {WEBHOOK_URL}")
+    processor = GoogleSheetProcessor(timeout=30)
+    while not stop_event.is_set():
+        try:
+            await renew_channels(file_codes, processor)
+        except Exception as e:
+            logger.error(f"❌ Продление каналов уведомлений: {e}", exc_info=True)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop_event.wait(), timeout=WATCH_CHECK_INTERVAL)
@@ -0,0 +1,154 @@
+"""
+Воркеры очереди синхронизаций app_google.
+
+Воркер в цикле забирает задания (jobs.claim_job), запускает пайплайн main()
+и пишет в задание этап, длительности этапов и итоговую статистику.
+Воркеры запускаются внутри API (SYNC_INPROCESS_WORKERS) или отдельным процессом:
+
+    python -m src.app_google.worker --concurrency 4
+
+Все таблицы реестра (registry.py) одним запуском, например из cron: задания ставятся
+в очередь, воркеры разбирают её до конца и завершаются:
+
+    python -m src.app_google.worker --registry --drain --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import socket
+from contextlib import suppress
+from typing import Optional
+
+from src.app_google.config import SYNC_HEARTBEAT_INTERVAL, SYNC_POLL_INTERVAL
+from src.app_google.jobs import (
+    claim_job, finish_job, get_job, report_progress, requeue_stale_jobs, save_checkpoint,
+)
+from src.app_google.main import main as run_pipeline
+from src.app_google.parse_pool import shutdown_parse_pool
+from src.app_google.registry import enqueue_registry
+from src.config.logger import logger
+
+
+def worker_name(index: int) -> str:
+    """Имя воркера: хост, pid и номер — видно в sync_job.worker."""
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+async def _heartbeat(job_id: int) -> None:
+    """Периодически отмечать задание живым, пока выполняется долгий этап."""
+    while True:
+        await asyncio.sleep(SYNC_HEARTBEAT_INTERVAL)
+        try:
+            await report_progress(job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Heartbeat задания #{job_id}: {e}")
+
+
+async def run_job(job_id: int, file_code: str, sheet_name: str,
+                  checkpoint: Optional[dict] = None) -> dict:
+    """
+    Выполнить пайплайн для задания, сообщая о переходах между этапами.
+
+    После каждого записанного куска в задание пишется контрольная точка: перезапущенное
+    задание (упавший или остановленный воркер) продолжает с неё.
+    """
+
+    async def on_stage(stage: str, timings: dict[str, float]) -> None:
+        await report_progress(job_id, stage=stage, progress=timings)
+
+    async def on_checkpoint(point: dict) -> None:
+        await save_checkpoint(job_id, point)
+
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        result = await run_pipeline(file_code=file_code, sheet_name=sheet_name, progress=on_stage,
+                                    checkpoint=checkpoint, on_checkpoint=on_checkpoint)
+    except Exception as e:
+        logger.error(f"❌ Задание #{job_id}: {e}", exc_info=True)
+        result = {'success': False, 'message': f'Worker error: {str(e)}', 'stats': {}}
+    finally:
+        heartbeat.cancel()
+        with suppress(asyncio.CancelledError):
+            await heartbeat
+
+    await finish_job(job_id, result)
+    return result
+
+
+async def run_worker(name: str, stop_event: Optional[asyncio.Event] = None, drain: bool = False) -> None:
+    """
+    Цикл воркера: забрать задание → выполнить → повторить.
+
+    Когда очередь пуста, воркер ждёт SYNC_POLL_INTERVAL секунд (drain — завершается).
+    Останавливается по stop_event (после текущего задания) или отмене задачи.
+    """
+    stop_event = stop_event or asyncio.Event()
+    logger.info(f"👷 Воркер {name} запущен")
+
+    while not stop_event.is_set():
+        try:
+            await requeue_stale_jobs()
+            job = await claim_job(name)
+        except Exception as e:
+            logger.error(f"❌ {name}: ошибка очереди: {e}")
+            job = None
+
+        if job is not None:
+            await run_job(job.id, job.file_code, job.sheet_name, job.checkpoint)
+            continue
+        if drain:
+            break
+
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop_event.wait(), timeout=SYNC_POLL_INTERVAL)
+
+    logger.info(f"👷 Воркер {name} остановлен")
+
+
+def start_workers(count: int, stop_event: asyncio.Event, drain: bool = False) -> list[asyncio.Task]:
+    """Запустить count воркеров в текущем event loop."""
+    return [asyncio.create_task(run_worker(worker_name(i), stop_event, drain)) for i in range(count)]
+
+
+async def stop_workers(tasks: list[asyncio.Task], stop_event: asyncio.Event) -> None:
+    """Остановить воркеры: текущие задания прерываются и позже вернутся в очередь."""
+    stop_event.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    shutdown_parse_pool()
+
+
+async def _report_jobs(jobs: dict[str, Optional[int]]) -> None:
+    """Итог по таблицам реестра: у каждой своё задание, статус и статистика."""
+    for file_code, job_id in jobs.items():
+        job = await get_job(job_id) if job_id is not None else None
+        if job is None:
+            logger.error(f"❌ {file_code}: задание не создано")
+        else:
+            logger.info(f"📊 {file_code}: #{job.id} {job.status} — {job.message}")
+
+
+async def _serve(concurrency: int, registry: bool = False, drain: bool = False) -> None:
+    from src.app_google.models import init_db_schema
+
+    if not await init_db_schema("test"):
+        logger.error("❌ Ошибка инициализации БД для app_google")
+        return
+    jobs = await enqueue_registry() if registry else {}
+    stop_event = asyncio.Event()
+    tasks = start_workers(concurrency, stop_event, drain)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await stop_workers(tasks, stop_event)
+    await _report_jobs(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воркеры очереди синхронизаций app_google")
+    parser.add_argument('--concurrency', type=int, default=1, help="Число воркеров в процессе")
+    parser.add_argument('--registry', action='store_true', help="Поставить в очередь все таблицы реестра")
+    parser.add_argument('--drain', action='store_true', help="Завершиться, когда очередь опустеет")
+    args = parser.parse_args()
+    asyncio.run(_serve(args.concurrency, args.registry, args.drain))
@@ -0,0 +1,647 @@
+"""
+Запись задач в БД (UPSERT по link_post) для app_google.
+
+save_tasks_parallel — та же запись на нескольких соединениях пула: строки делятся
+на непересекающиеся шарды по хэшу link_post, поэтому транзакции шардов не ждут
+друг друга и не могут взаимно заблокироваться.
+Зависимости:
+- src.config.database (engine, async_session)
+- src.config.logger
+- src.app_google.models (TaskList)
+"""
+import asyncio
+import time
+
+from datetime import datetime, date
+from io import BytesIO
+from typing import Any, AsyncIterator
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from sqlalchemy import (
+    Text, and_, bindparam, column, exists, false, func, literal_column, or_, select, table, text, true, update
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from src.app_google.config import UPSERT_BATCH_SIZE, STAGING_THRESHOLD_ROWS, WRITE_SHARDS
+from src.app_google.models import TaskList
+from src.config.database import engine, async_session
+from src.config.logger import logger
+
+# === Константы ===
+
+# Столбцы TaskList, которые заполняются из листа
+TASK_COLUMNS: list[str] = [
+    'link_post', 'number', 'date_comment', 'short_description', 'autor',
+    'subscribers', 'comment', 'corrections', 'responsible', 'status',
+]
+
+# Хэш содержимого строки (считается в DuckDB, см. transform.py)
+HASH_COLUMN: str = 'row_hash'
+
+# Лист-источник строки: область сверки удалённых строк
+SHEET_COLUMN: str = 'sheet_name'
+
+# Метка таблицы-источника из реестра (registry.py): сверка идёт в пределах (метка, лист)
+SOURCE_COLUMN: str = 'source_tag'
+
+# Все столбцы, которые пишет UPSERT
+WRITE_COLUMNS: list[str] = [*TASK_COLUMNS, HASH_COLUMN, SHEET_COLUMN, SOURCE_COLUMN]
+
+# Arrow-схема записей TaskList (результат transform.transform_batches)
+TASK_SCHEMA: pa.Schema = pa.schema([
+    ('link_post', pa.string()),
+    ('number', pa.string()),
+    ('date_comment', pa.date32()),
+    ('short_description', pa.string()),
+    ('autor', pa.string()),
+    ('subscribers', pa.int32()),
+    ('comment', pa.string()),
+    ('corrections', pa.string()),
+    ('responsible', pa.string()),
+    ('status', pa.string()),
+    (HASH_COLUMN, pa.string()),
+    (SHEET_COLUMN, pa.string()),
+    (SOURCE_COLUMN, pa.string()),
+])
+
+WRITE_MODES: tuple[str, ...] = ('auto', 'row', 'batch', 'staging')
+
+# Временная таблица для COPY (живёт до конца транзакции)
+STAGE_TABLE: str = 'task_list_stage'
+
+
+# =========================================================================
+# === Хелперы для конвертации типов ===
+# =========================================================================
+
+def safe_str(value) -> str | None:
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return str(int(value)) if isinstance(value, float) and value == int(value) else str(value)
+    return str(value).strip() or None
+
+
+def safe_int(value) -> int | None:
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value == int(value) else None
+    try:
+        cleaned = str(value).strip().replace(' ', '').replace('\xa0', '')
+        return int(float(cleaned))
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_date(value) -> date | None:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    logger.warning(f"⚠️ Не удалось распарсить дату: {value!r}")
+    return None
+
+
+def prepare_task(row: dict[str, Any]) -> dict[str, Any]:
+    """Приводит запись листа к типам столбцов TaskList."""
+    return {
+        'link_post': safe_str(row.get('link_post')),
+        'number': safe_str(row.get('number')),
+        'date_comment': safe_date(row.get('date_comment')),
+        'short_description': safe_str(row.get('short_description')),
+        'autor': safe_str(row.get('autor')),
+        'subscribers': safe_int(row.get('subscribers')),
+        'comment': safe_str(row.get('comment')),
+        'corrections': safe_str(row.get('corrections')),
+        'responsible': safe_str(row.get('responsible')),
+        'status': safe_str(row.get('status', 'new')),
+    }
+
+
+# =========================================================================
+# === Построение UPSERT ===
+# =========================================================================
+
+def _on_conflict_upsert(stmt):
+    """
+    Добавляет к INSERT ON CONFLICT (link_post) DO UPDATE и RETURNING (xmax = 0).
+
+    Строка обновляется, только если изменился хэш содержимого или она была деактивирована:
+    неизменённые строки не переписываются, не трогают updated_at и не порождают WAL
+    и мёртвые версии.
+
+    Владелец ссылки — лист (source_tag, sheet_name), первым записавший её активной.
+    Если та же ссылка есть на другом листе, её строка там не перезаписывается
+    (считается без изменений) и не деактивируется сверкой другого листа. Владение
+    переходит, только когда владелец деактивировал ссылку (удалил из листа):
+    следующая синхронизация другого листа её восстановит. Строки без листа
+    (записанные до появления sheet_name) забирает первый синхронизированный лист,
+    строки листа без метки (записанные до появления меток по умолчанию) — первая
+    таблица с меткой и тем же листом.
+
+    (xmax = 0) — True для вставленных строк, False для обновлённых:
+    у только что вставленной версии строки xmax всегда равен нулю.
+    Неизменённые строки в RETURNING не попадают.
+    """
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['link_post'],
+        set_={
+            **{col: stmt.excluded[col] for col in WRITE_COLUMNS if col != 'link_post'},
+            'updated_at': func.now(),
+            'is_active': True,
+        },
+        where=or_(
+            TaskList.is_active == false(),
+            TaskList.sheet_name.is_(None),
+            and_(
+                TaskList.sheet_name == stmt.excluded.sheet_name,
+                TaskList.source_tag.is_not_distinct_from(stmt.excluded.source_tag),
+                TaskList.row_hash.is_distinct_from(stmt.excluded.row_hash),
+            ),
+            and_(
+                TaskList.sheet_name == stmt.excluded.sheet_name,
+                TaskList.source_tag.is_(None),
+                stmt.excluded.source_tag.is_not(None),
+            ),
+        ),
+    )
+    return stmt.returning(literal_column('(xmax = 0)').label('inserted'))
+
+
+def build_upsert(rows: list[dict[str, Any]]):
+    """INSERT ... VALUES ... ON CONFLICT (link_post) DO UPDATE (построчный путь)."""
+    return _on_conflict_upsert(pg_insert(TaskList).values(rows))
+
+
+def build_array_upsert():
+    """
+    Пакетный UPSERT из массивов столбцов: INSERT ... SELECT * FROM unnest(...).
+
+    Один параметр-массив на столбец вместо параметра на каждую ячейку,
+    поэтому размер пачки не упирается в лимит параметров протокола.
+    """
+    source = func.unnest(
+        *[bindparam(col, type_=ARRAY(TaskList.__table__.c[col].type)) for col in WRITE_COLUMNS]
+    ).table_valued(*WRITE_COLUMNS).render_derived(name='src')
+    return _on_conflict_upsert(
+        pg_insert(TaskList).from_select(WRITE_COLUMNS, select(*[source.c[col] for col in WRITE_COLUMNS]))
+    )
+
+
+def build_stage_merge():
+    """
+    Set-based слияние временной таблицы в TaskList одним запросом.
+
+    Возвращает SELECT (вставлено, обновлено) поверх CTE с INSERT ... SELECT.
+    """
+    stage = table(STAGE_TABLE, *[column(col) for col in WRITE_COLUMNS])
+    upsert = _on_conflict_upsert(
+        pg_insert(TaskList).from_select(WRITE_COLUMNS, select(*[stage.c[col] for col in WRITE_COLUMNS]))
+    )
+    merged = upsert.cte('merged')
+    return select(
+        func.count().filter(merged.c.inserted),
+        func.count().filter(~merged.c.inserted),
+    )
+
+
+def _source_is(source_tag: str | None):
+    """
+    Условие на метку таблицы: = или IS NULL.
+
+    IS NOT DISTINCT FROM индекс не использует, поэтому вид условия выбирается по значению.
+    """
+    return TaskList.source_tag.is_(None) if source_tag is None else TaskList.source_tag == source_tag
+
+
+def build_deactivate(sheet_name: str, loaded=None, source_tag: str | None = None):
+    """
+    Мягкое удаление строк, пропавших из листа: один UPDATE с анти-join.
+
+    Деактивируются активные задачи листа sheet_name таблицы с меткой source_tag
+    (у разных таблиц реестра бывают листы с одним именем), чьих link_post нет среди
+    только что загруженных ключей. Ключи берутся из loaded (таблица с
+    link_post, например временная таблица COPY) или из параметра-массива :keys.
+    Выборка по листу идёт по частичному индексу ix_task_list_source_sheet_active.
+    """
+    if loaded is None:
+        loaded = func.unnest(bindparam('keys', type_=ARRAY(Text))).table_valued('link_post').render_derived(
+            name='loaded'
+        )
+    return (
+        update(TaskList)
+        .where(
+            TaskList.sheet_name == sheet_name,
+            _source_is(source_tag),
+            TaskList.is_active == true(),
+            ~exists().where(loaded.c.link_post == TaskList.link_post),
+        )
+        .values(is_active=False, updated_at=func.now())
+    )
+
+
+def build_deactivate_keys(sheet_name: str, source_tag: str | None = None):
+    """
+    Мягкое удаление строк листа по списку ключей (параметр-массив :keys).
+
+    Для сверки по снимку (snapshot.py): пропавшие ключи уже известны,
+    анти-join со всеми ключами листа не нужен.
+    """
+    return (
+        update(TaskList)
+        .where(
+            TaskList.sheet_name == sheet_name,
+            _source_is(source_tag),
+            TaskList.is_active == true(),
+            TaskList.link_post == func.any(bindparam('keys', type_=ARRAY(Text))),
+        )
+        .values(is_active=False, updated_at=func.now())
+    )
+
+
+def build_foreign_keys(sheet_name: str, source_tag: str | None = None):
+    """
+    Ключи из параметра-массива :keys, чьи строки принадлежат другому листу или таблице.
+
+    После записи листа это ссылки, которые upsert не тронул из-за владельца
+    (см. _on_conflict_upsert): снимок листа (snapshot.py) их не запоминает.
+    """
+    return select(TaskList.link_post).where(
+        TaskList.link_post == func.any(bindparam('keys', type_=ARRAY(Text))),
+        or_(TaskList.sheet_name.is_distinct_from(sheet_name), TaskList.source_tag.is_distinct_from(source_tag)),
+    )
+
+
+def _stage_table_ddl() -> str:
+    """DDL временной таблицы с типами столбцов TaskList."""
+    dialect = postgresql.dialect()
+    columns = ', '.join(
+        f"{col} {TaskList.__table__.c[col].type.compile(dialect=dialect)}" for col in WRITE_COLUMNS
+    )
+    return f"CREATE TEMP TABLE {STAGE_TABLE} ({columns}) ON COMMIT DROP"
+
+
+def _count_returned(counts: dict[str, int], flags: list[bool], sent: int) -> None:
+    """Учитывает результат RETURNING (xmax = 0): вставлено / обновлено / без изменений."""
+    inserted = sum(1 for flag in flags if flag)
+    counts['inserted'] += inserted
+    counts['updated'] += len(flags) - inserted
+    counts['unchanged'] += sent - len(flags)
+
+
+def _new_counts() -> dict[str, int]:
+    return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0, 'errors': 0}
+
+
+# =========================================================================
+# === Стратегии записи ===
+# =========================================================================
+
+async def _save_per_row(session, tasks: pa.Table) -> dict[str, int]:
+    """Построчный UPSERT: один запрос на строку (эталонный путь, типы приводятся в Python)."""
+    counts = _new_counts()
+
+    for row in tasks.to_pylist():
+        try:
+            async with session.begin_nested():
+                task = {**prepare_task(row), **{col: row.get(col) for col in (HASH_COLUMN, SHEET_COLUMN, SOURCE_COLUMN)}}
+                result = await session.execute(build_upsert([task]))
+                _count_returned(counts, result.scalars().all(), 1)
+        except IntegrityError:
+            logger.debug(f"⚠️ Дубликат link_post: {row.get('link_post')}")
+            counts['errors'] += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка записи: {e}")
+            counts['errors'] += 1
+
+    return counts
+
+
+async def _save_batched(session, tasks: pa.Table, batch_size: int) -> dict[str, int]:
+    """
+    Пакетный UPSERT: пачки по batch_size строк одним запросом.
+
+    Столбцы пачки передаются массивами прямо из Arrow. Каждая пачка выполняется
+    в своей точке сохранения (SAVEPOINT), поэтому ошибка одной пачки
+    не откатывает остальные.
+    """
+    counts = _new_counts()
+    stmt = build_array_upsert()
+
+    for start in range(0, tasks.num_rows, batch_size):
+        chunk = tasks.slice(start, batch_size)
+        params = {col: chunk.column(col).to_pylist() for col in WRITE_COLUMNS}
+        try:
+            async with session.begin_nested():
+                result = await session.execute(stmt, params)
+                _count_returned(counts, result.scalars().all(), chunk.num_rows)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка записи пачки [{start}:{start + chunk.num_rows}]: {e}")
+            counts['errors'] += chunk.num_rows
+
+    return counts
+
+
+async def _csv_chunks(tasks: pa.Table, chunk_rows: int) -> AsyncIterator[bytes]:
+    """
+    Arrow → CSV для COPY кусками по chunk_rows строк (без Python-объектов на ячейку).
+
+    CSV вместо copy_records_to_table: записи пришлось бы собирать из Python-кортежей,
+    а CSV пишет сам pyarrow. NULL выводится пустым полем без кавычек, пустая строка — "";
+    COPY ... CSV читает первое как NULL, второе как '', так что они не смешиваются.
+    """
+    options = pa_csv.WriteOptions(include_header=False)
+    for batch in tasks.to_batches(max_chunksize=chunk_rows):
+        buffer = BytesIO()
+        pa_csv.write_csv(batch, buffer, write_options=options)
+        yield buffer.getvalue()
+
+
+async def _save_staged(session, tasks: pa.Table, batch_size: int,
+                       timings: dict[str, float]) -> dict[str, int]:
+    """
+    COPY во временную таблицу + один INSERT ... SELECT ... ON CONFLICT.
+
+    Arrow-столбцы сериализуются в CSV и передаются COPY FROM STDIN
+    (asyncpg copy_to_table) в той же транзакции, что и слияние.
+    Ошибка откатывает весь набор.
+    """
+    started = time.perf_counter()
+    await session.execute(text(_stage_table_ddl()))
+    timings['stage_create'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_to_table(
+        STAGE_TABLE,
+        source=_csv_chunks(tasks.select(WRITE_COLUMNS), batch_size),
+        columns=WRITE_COLUMNS,
+        format='csv',
+    )
+    timings['copy'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = await session.execute(build_stage_merge())
+    inserted, updated = result.one()
+    timings['merge'] = time.perf_counter() - started
+
+    return {**_new_counts(), 'inserted': inserted, 'updated': updated,
+            'unchanged': tasks.num_rows - inserted - updated}
+
+
+def _drop_missing_keys(tasks: pa.Table) -> tuple[pa.Table, int]:
+    """Отбрасывает строки без link_post. Returns: (таблица, отброшено строк)."""
+    valid = tasks.filter(pc.is_valid(tasks.column('link_post')))
+    return valid, tasks.num_rows - valid.num_rows
+
+
+def choose_mode(row_count: int, mode: str = 'auto') -> str:
+    """Выбор стратегии записи: при 'auto' — по числу строк."""
+    if mode != 'auto':
+        return mode
+    return 'staging' if row_count >= STAGING_THRESHOLD_ROWS else 'batch'
+
+
+async def _deactivate_missing(session, tasks: pa.Table, sheet_name: str, staged: bool,
+                              source_tag: str | None = None) -> int:
+    """Деактивирует задачи листа, которых нет в tasks. Returns: число деактивированных."""
+    if staged:
+        stage = table(STAGE_TABLE, column('link_post'))
+        result = await session.execute(build_deactivate(sheet_name, loaded=stage, source_tag=source_tag))
+    else:
+        result = await session.execute(
+            build_deactivate(sheet_name, source_tag=source_tag), {'keys': tasks.column('link_post').to_pylist()}
+        )
+    return result.rowcount
+
+
+async def save_tasks_to_db(tasks: pa.Table,
+                           mode: str = 'auto',
+                           batch_size: int = UPSERT_BATCH_SIZE,
+                           session_factory=None,
+                           sheet_name: str | None = None,
+                           deactivate_missing: bool = False,
+                           source_tag: str | None = None) -> dict[str, Any]:
+    """
+    Сохраняет записи в БД с upsert по link_post.
+
+    Args:
+        tasks: Arrow-таблица со столбцами TASK_SCHEMA, без дубликатов link_post
+               (результат transform.transform_batches).
+        mode: 'auto' — выбор по числу строк (STAGING_THRESHOLD_ROWS),
+              'row' — построчно, 'batch' — пачки массивами столбцов,
+              'staging' — COPY во временную таблицу + set-based слияние.
+        batch_size: Размер пачки для 'batch' и куска CSV для 'staging'.
+        session_factory: Фабрика сессий (по умолчанию из config.database).
+        sheet_name: Лист, из которого получены tasks (область сверки).
+        deactivate_missing: Деактивировать задачи листа sheet_name, которых нет в tasks.
+                            Выполняется в той же транзакции и только если запись прошла без ошибок.
+        source_tag: Метка таблицы-источника (область сверки вместе с sheet_name).
+
+    Returns:
+        dict: inserted, updated, unchanged, deactivated, errors, mode и timings (секунды по этапам).
+    """
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Неизвестный режим записи: {mode!r}. Допустимые: {WRITE_MODES}")
+
+    mode = choose_mode(tasks.num_rows, mode)
+    stats: dict[str, Any] = {'mode': mode, **_new_counts(), 'timings': {}}
+    if engine is None or not tasks.num_rows:
+        return stats
+
+    timings = stats['timings']
+    tasks, missing_keys = _drop_missing_keys(tasks)
+    session_factory = session_factory or async_session
+
+    try:
+        async with session_factory() as session:
+            started = time.perf_counter()
+            if mode == 'row':
+                counts = await _save_per_row(session, tasks)
+                timings['upsert'] = time.perf_counter() - started
+            elif mode == 'batch':
+                counts = await _save_batched(session, tasks, batch_size)
+                timings['upsert'] = time.perf_counter() - started
+            else:
+                counts = await _save_staged(session, tasks, batch_size, timings)
+
+            if deactivate_missing and sheet_name:
+                if counts['errors']:
+                    logger.warning(f"⚠️ Сверка удалённых строк листа '{sheet_name}' пропущена: есть ошибки записи")
+                else:
+                    started = time.perf_counter()
+                    counts['deactivated'] = await _deactivate_missing(session, tasks, sheet_name, mode == 'staging',
+                                                                      source_tag)
+                    timings['deactivate'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            await session.commit()
+            timings['commit'] = time.perf_counter() - started
+            logger.info(f"✅ UPSERT ({mode}): {counts['inserted']} вставлено, {counts['updated']} обновлено, "
+                        f"{counts['unchanged']} без изменений, {counts['deactivated']} деактивировано")
+    except Exception as e:
+        logger.error(f"❌ Ошибка транзакции: {e}", exc_info=True)
+        counts = {**_new_counts(), 'errors': tasks.num_rows}
+
+    counts['errors'] += missing_keys
+    stats.update(counts)
+    return stats
+
+
+def shard_count(requested: int = WRITE_SHARDS) -> int:
+    """Число шардов параллельной записи: не больше постоянного размера пула соединений."""
+    pool_size = getattr(engine.pool, 'size', None) if engine is not None else None
+    if callable(pool_size):
+        requested = min(requested, pool_size())
+    return max(requested, 1)
+
+
+def partition_by_key(tasks: pa.Table, shards: int) -> list[pa.Table]:
+    """Разбить записи на shards непересекающихся частей по хэшу link_post (порядок строк внутри части сохраняется)."""
+    conn = duckdb.connect()
+    try:
+        conn.register('shard_tasks', tasks.select(['link_post']))
+        shard = conn.execute(
+            "SELECT (hash(link_post) % ?)::INTEGER AS shard FROM shard_tasks", [shards]
+        ).fetch_arrow_table().column('shard')
+    finally:
+        conn.close()
+    return [tasks.filter(pc.equal(shard, index)) for index in range(shards)]
+
+
+async def save_tasks_parallel(tasks: pa.Table,
+                              shards: int = WRITE_SHARDS,
+                              mode: str = 'auto',
+                              batch_size: int = UPSERT_BATCH_SIZE,
+                              session_factory=None,
+                              sheet_name: str | None = None,
+                              deactivate_missing: bool = False,
+                              source_tag: str | None = None) -> dict[str, Any]:
+    """
+    Сохраняет записи в БД параллельно на нескольких соединениях (save_tasks_to_db на шард).
+
+    Каждый шард пишется своей транзакцией: ошибка одного шарда не откатывает остальные.
+    Сверка удалённых строк (deactivate_missing) выполняется после всех шардов
+    отдельной транзакцией и только если ни в одном шарде не было ошибок.
+
+    Args:
+        shards: Желаемое число шардов (ограничивается размером пула, см. shard_count).
+        Остальные — как у save_tasks_to_db.
+
+    Returns:
+        dict: Как у save_tasks_to_db (timings — максимум по шардам) и shards —
+        по шарду: rows, seconds, rows_per_sec, mode, errors.
+    """
+    shards = shard_count(shards)
+    if shards == 1 or tasks.num_rows < shards:
+        return await save_tasks_to_db(tasks, mode, batch_size, session_factory, sheet_name,
+                                      deactivate_missing, source_tag)
+
+    async def write_shard(index: int, part: pa.Table) -> dict[str, Any]:
+        started = time.perf_counter()
+        result = await save_tasks_to_db(part, mode, batch_size, session_factory)
+        seconds = time.perf_counter() - started
+        result['shard'] = {'shard': index, 'rows': part.num_rows, 'seconds': round(seconds, 4),
+                           'rows_per_sec': round(part.num_rows / seconds) if seconds else None,
+                           'mode': result['mode'], 'errors': result['errors']}
+        return result
+
+    results = await asyncio.gather(*(
+        write_shard(index, part) for index, part in enumerate(partition_by_key(tasks, shards))
+    ))
+
+    stats: dict[str, Any] = {'mode': results[0]['mode'], **_new_counts(), 'timings': {},
+                             'shards': [result.pop('shard') for result in results]}
+    for result in results:
+        for key in ('inserted', 'updated', 'unchanged', 'errors'):
+            stats[key] += result[key]
+        for name, seconds in result['timings'].items():
+            stats['timings'][name] = max(stats['timings'].get(name, 0.0), seconds)
+
+    if deactivate_missing and sheet_name:
+        if stats['errors']:
+            logger.warning(f"⚠️ Сверка удалённых строк листа '{sheet_name}' пропущена: есть ошибки записи")
+        else:
+            started = time.perf_counter()
+            stats['deactivated'] = await deactivate_sheet_missing(
+                sheet_name, tasks.column('link_post'), session_factory, source_tag
+            )
+            stats['timings']['deactivate'] = time.perf_counter() - started
+    logger.info(f"✅ Параллельная запись: {shards} шардов, " + ', '.join(
+        f"#{shard['shard']} {shard['rows_per_sec']} строк/с" for shard in stats['shards']
+    ))
+    return stats
+
+
+async def deactivate_sheet_missing(sheet_name: str, keys: pa.Array | pa.ChunkedArray,
+                                   session_factory=None, source_tag: str | None = None) -> int:
+    """
+    Деактивирует задачи листа, чьих link_post нет в keys, отдельной транзакцией.
+
+    Для потоковой записи по кускам: ключи собираются со всех кусков листа
+    и сверка выполняется один раз после записи последнего.
+
+    Returns:
+        int: Число деактивированных задач (0, если БД недоступна).
+    """
+    if engine is None:
+        return 0
+    session_factory = session_factory or async_session
+    async with session_factory() as session:
+        result = await session.execute(build_deactivate(sheet_name, source_tag=source_tag), {'keys': keys.to_pylist()})
+        await session.commit()
+    logger.info(f"✅ Лист '{sheet_name}': деактивировано {result.rowcount}")
+    return result.rowcount
+
+
+async def deactivate_keys(sheet_name: str, keys: pa.Array | pa.ChunkedArray,
+                          session_factory=None, source_tag: str | None = None) -> int:
+    """
+    Деактивирует задачи листа с перечисленными link_post отдельной транзакцией.
+
+    Returns:
+        int: Число деактивированных задач (0, если БД недоступна или ключей нет).
+    """
+    if engine is None or not len(keys):
+        return 0
+    session_factory = session_factory or async_session
+    async with session_factory() as session:
+        result = await session.execute(build_deactivate_keys(sheet_name, source_tag=source_tag),
+                                       {'keys': keys.to_pylist()})
+        await session.commit()
+    logger.info(f"✅ Лист '{sheet_name}': деактивировано {result.rowcount}")
+    return result.rowcount
+
+
+async def foreign_owned_keys(sheet_name: str, keys: pa.Array | pa.ChunkedArray,
+                             session_factory=None, source_tag: str | None = None) -> pa.Array:
+    """
+    Ключи, строки которых принадлежат другому листу или таблице.
+
+    Returns:
+        pa.Array: link_post (пустой, если БД недоступна или ключей нет).
+    """
+    if engine is None or not len(keys):
+        return pa.array([], type=pa.string())
+    session_factory = session_factory or async_session
+    async with session_factory() as session:
+        result = await session.execute(build_foreign_keys(sheet_name, source_tag=source_tag),
+                                       {'keys': keys.to_pylist()})
+        return pa.array(result.scalars().all(), type=pa.string())
@@ -1,4 +1,5 @@
 # src/main.py
+import asyncio
 import logging
 
 from contextlib import asynccontextmanager
@@ -6,6 +7,10 @@ from fastapi import FastAPI
 
 from src.app_google.models import init_db_schema
 from src.app_google.api import router as app_google_router
+from src.app_google.config import SYNC_INPROCESS_WORKERS, WEBHOOK_URL
+from src.app_google.registry import load_registry
+from src.app_google.watch import close_debouncer, run_channel_renewer
+from src.app_google.worker import start_workers, stop_workers
 from src.config.logger import logger, config_logging
 from src.config.database import DBManager
 
@@ -27,9 +32,20 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("app_google: схема и таблица готовы")
 
+    # 3. Воркеры очереди синхронизаций (0 — только отдельным процессом)
+    stop_event = asyncio.Event()
+    workers = start_workers(SYNC_INPROCESS_WORKERS, stop_event) if db_ok else []
+
+    # 4. Подписка на изменения таблиц реестра в Drive (уведомления → /app_google/webhook/drive)
+    spreadsheets = [s.file_code for s in load_registry()]
+    if db_ok and WEBHOOK_URL and spreadsheets:
+        workers.append(asyncio.create_task(run_channel_renewer(spreadsheets, stop_event)))
+
     yield
 
-    # 3. Очистка при завершении
+    # 5. Очистка при завершении
+    await close_debouncer()
+    await stop_workers(workers, stop_event)
     await DBManager.close_all_async()
     logger.info("Подключения к БД закрыты")
 
@@ -0,0 +1,35 @@
+"""Тесты загрузки сохранённого токена (auth.GoogleAuth): токен без нужных прав не используется."""
+import pickle
+
+from google.oauth2.credentials import Credentials
+
+from src.app_google.auth import SCOPES, GoogleAuth
+
+SHEETS_ONLY = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+
+def saved_auth(tmp_path, scopes: list[str]) -> GoogleAuth:
+    token_file = tmp_path / 'token.pkl'
+    with open(token_file, 'wb') as f:
+        pickle.dump(Credentials('token', refresh_token='refresh', scopes=scopes), f)
+    return GoogleAuth(token_file=token_file, background_refresh=False)
+
+
+def test_token_with_all_scopes_is_loaded(tmp_path):
+    creds = saved_auth(tmp_path, SCOPES)._load_token()
+    assert creds is not None and creds.token == 'token'
+
+
+def test_token_without_drive_scope_forces_new_login(tmp_path, caplog):
+    auth = saved_auth(tmp_path, SHEETS_ONLY)
+    assert auth._load_token() is None
+    [record] = [r for r in caplog.records if r.levelname == 'ERROR']
+    assert 'drive.metadata.readonly' in record.getMessage()
+
+
+def test_granted_scopes_take_precedence(tmp_path):
+    auth = saved_auth(tmp_path, SCOPES)
+    creds = auth._load_token()
+    # Пользователь снял галочку на экране согласия: запрошено всё, выдано не всё
+    creds._granted_scopes = SHEETS_ONLY
+    assert auth._missing_scopes(creds) == {SCOPES[1]}
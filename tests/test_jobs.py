@@ -0,0 +1,200 @@
+"""
+Тесты очереди заданий (jobs.py): схлопывание повторных запросов частичным уникальным индексом,
+выдача заданий воркерам и возврат брошенных заданий с наследованием контрольной точки.
+
+PostgreSQL в тестах не нужен: запросы jobs.py компилируются диалектом PostgreSQL и выполняются
+в SQLite (частичный уникальный индекс для ON CONFLICT ... WHERE) и в DuckDB (now(), interval,
+JSON). Блокировок строк у DuckDB нет: FOR UPDATE SKIP LOCKED проверяется в тексте запроса.
+"""
+import asyncio
+import json
+import sqlite3
+from datetime import datetime
+
+import duckdb
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src.app_google import jobs
+from src.app_google.config import SYNC_STALE_AFTER
+from src.app_google.models import SyncJob
+
+DIALECT = postgresql.dialect(paramstyle='qmark')
+SKIP_LOCKED = ' FOR UPDATE SKIP LOCKED'
+JSON_COLUMNS = ('progress', 'stats', 'checkpoint')
+
+
+class Result:
+    def __init__(self, rows: list[tuple], columns: list[str], rowcount: int):
+        self.rows, self.columns, self.rowcount = rows, columns, rowcount
+
+    def scalar_one_or_none(self):
+        if not self.rows:
+            return None
+        if len(self.columns) == 1:
+            return self.rows[0][0]
+        values = dict(zip(self.columns, self.rows[0]))
+        for name in JSON_COLUMNS:
+            if isinstance(values[name], str):
+                values[name] = json.loads(values[name])
+        return SyncJob(**values)
+
+    def scalar_one(self):
+        value = self.scalar_one_or_none()
+        assert value is not None
+        return value
+
+
+class ReplaySession:
+    """
+    async_session для jobs.py: запросы выполняются в SQLite или DuckDB, их текст запоминается.
+
+    rewrites — замены в тексте запроса там, где синтаксис движка расходится с PostgreSQL.
+    """
+
+    def __init__(self, conn, statements: list[str], rewrites: dict[str, str]):
+        self.conn = conn
+        self.statements = statements
+        self.rewrites = rewrites
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt) -> Result:
+        compiled = stmt.compile(dialect=DIALECT)
+        sql = str(compiled)
+        self.statements.append(sql)
+        params = [compiled.params[name] for name in compiled.positiontup]
+        params = [json.dumps(value) if isinstance(value, dict) else value for value in params]
+        for old, new in self.rewrites.items():
+            sql = sql.replace(old, new)
+        cursor = self.conn.execute(sql, params)
+        if compiled.returning:
+            return Result(cursor.fetchall(), [col[0] for col in cursor.description], -1)
+        if isinstance(self.conn, sqlite3.Connection):
+            return Result([], [], cursor.rowcount)
+        return Result([], [], cursor.fetchone()[0])  # DuckDB возвращает число изменённых строк
+
+    async def commit(self):
+        if isinstance(self.conn, sqlite3.Connection):
+            self.conn.commit()
+
+
+def ddl(element) -> str:
+    return str(element.compile(dialect=DIALECT)).replace('SERIAL', 'INTEGER')
+
+
+@pytest.fixture
+def statements() -> list[str]:
+    return []
+
+
+@pytest.fixture
+def sqlite_queue(monkeypatch, statements) -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute("ATTACH ':memory:' AS test")
+    conn.execute(ddl(CreateTable(SyncJob.__table__)).replace('DEFAULT now()', 'DEFAULT CURRENT_TIMESTAMP'))
+    for index in SyncJob.__table__.indexes:
+        # SQLite: схема указывается у имени индекса, а не у таблицы
+        conn.execute(ddl(CreateIndex(index)).replace(f'{index.name} ON test.', f'test.{index.name} ON '))
+    monkeypatch.setattr(jobs, 'engine', object())
+    # SQLite не принимает имя схемы перед столбцом в RETURNING и SET
+    rewrites = {'test.sync_job.': 'sync_job.'}
+    monkeypatch.setattr(jobs, 'async_session', lambda: ReplaySession(conn, statements, rewrites))
+    return conn
+
+
+@pytest.fixture
+def duck_queue(monkeypatch, statements) -> duckdb.DuckDBPyConnection:
+    conn = duckdb.connect()
+    conn.execute('CREATE SCHEMA test')
+    conn.execute(ddl(CreateTable(SyncJob.__table__)).replace('JSONB', 'JSON'))
+    monkeypatch.setattr(jobs, 'engine', object())
+    rewrites = {SKIP_LOCKED: '', 'JSONB': 'JSON'}
+    monkeypatch.setattr(jobs, 'async_session', lambda: ReplaySession(conn, statements, rewrites))
+    return conn
+
+
+def add_job(conn, job_id: int, sheet_name: str, status: str, stale: bool = False,
+            checkpoint: dict | None = None) -> None:
+    heartbeat = f"now() - interval '{SYNC_STALE_AFTER * 2} seconds'" if stale else 'now()'
+    conn.execute(
+        f"INSERT INTO test.sync_job (id, file_code, sheet_name, status, heartbeat_at, checkpoint) "
+        f"VALUES (?, 'file', ?, ?, {heartbeat}, ?)",
+        [job_id, sheet_name, status, json.dumps(checkpoint) if checkpoint else None],
+    )
+
+
+def jobs_state(conn) -> dict[int, tuple]:
+    """id → (status, worker, checkpoint)."""
+    rows = conn.execute('SELECT id, status, worker, checkpoint FROM test.sync_job ORDER BY id').fetchall()
+    return {job_id: (status, worker, json.loads(checkpoint) if checkpoint else None)
+            for job_id, status, worker, checkpoint in rows}
+
+
+def test_repeated_requests_collapse_into_queued_job(sqlite_queue, statements):
+    first = asyncio.run(jobs.enqueue_sync('file', 'sheet'))
+    assert asyncio.run(jobs.enqueue_sync('file', 'sheet')) == first
+    assert asyncio.run(jobs.enqueue_sync('file', 'other')) != first
+    assert sqlite_queue.execute('SELECT requests FROM test.sync_job WHERE id = ?', [first]).fetchone() == (2,)
+    assert "ON CONFLICT (file_code, sheet_name) WHERE status = 'queued'" in statements[0]
+
+
+def test_request_during_run_queues_a_new_job(sqlite_queue):
+    # Индекс частичный: выполняющееся задание не мешает поставить следующее
+    first = asyncio.run(jobs.enqueue_sync('file', 'sheet'))
+    sqlite_queue.execute("UPDATE test.sync_job SET status = 'running'")
+    second = asyncio.run(jobs.enqueue_sync('file', 'sheet'))
+    assert second != first
+    assert asyncio.run(jobs.enqueue_sync('file', 'sheet')) == second
+
+
+def test_claim_takes_oldest_job_of_an_idle_sheet(duck_queue, statements):
+    add_job(duck_queue, 1, 'busy', 'running')
+    add_job(duck_queue, 2, 'busy', 'queued')
+    add_job(duck_queue, 3, 'idle', 'queued')
+    add_job(duck_queue, 4, 'idle', 'queued')
+
+    job = asyncio.run(jobs.claim_job('w1'))
+    assert (job.id, job.status, job.worker, job.attempts) == (3, 'running', 'w1', 1)
+    assert SKIP_LOCKED in statements[0]
+    # Лист idle теперь занят, busy — ещё выполняется: выдавать нечего
+    assert asyncio.run(jobs.claim_job('w2')) is None
+
+    duck_queue.execute("UPDATE test.sync_job SET status = 'done' WHERE id = 1")
+    assert asyncio.run(jobs.claim_job('w2')).id == 2
+
+
+def test_stale_job_is_requeued_with_its_checkpoint(duck_queue):
+    add_job(duck_queue, 1, 'sheet', 'running', stale=True, checkpoint={'chunk': 3})
+    add_job(duck_queue, 2, 'alive', 'running', checkpoint={'chunk': 1})
+
+    assert asyncio.run(jobs.requeue_stale_jobs()) == 1
+    assert jobs_state(duck_queue) == {
+        1: ('queued', None, {'chunk': 3}),
+        2: ('running', None, {'chunk': 1}),
+    }
+
+
+def test_queued_job_inherits_checkpoint_of_stale_one(duck_queue):
+    add_job(duck_queue, 1, 'sheet', 'running', stale=True, checkpoint={'chunk': 3})
+    add_job(duck_queue, 2, 'sheet', 'queued')
+    add_job(duck_queue, 3, 'own', 'running', stale=True, checkpoint={'chunk': 5})
+    add_job(duck_queue, 4, 'own', 'queued', checkpoint={'chunk': 7})
+
+    assert asyncio.run(jobs.requeue_stale_jobs()) == 2
+    assert jobs_state(duck_queue) == {
+        1: ('failed', None, {'chunk': 3}),
+        2: ('queued', None, {'chunk': 3}),
+        3: ('failed', None, {'chunk': 5}),
+        4: ('queued', None, {'chunk': 7}),
+    }
+    # Повторный вызов ничего не меняет
+    assert asyncio.run(jobs.requeue_stale_jobs()) == 0
+    job = asyncio.run(jobs.claim_job('w1'))
+    assert (job.id, job.checkpoint) == (2, {'chunk': 3})
+    assert isinstance(job.started_at, datetime)
@@ -0,0 +1,83 @@
+"""Тесты парсеров XLSX (parsers.py): быстрый разбор XML даёт то же, что openpyxl."""
+import io
+
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+from openpyxl import Workbook
+
+from src.app_google.bench.parsers import SHEET, build_workbook
+from src.app_google.config import COLUMN_MAPPING
+from src.app_google.parsers import PARSERS, open_parser
+
+EDGE_SHEET = 'Разное'
+
+
+def read(path: Path, parser_name: str, list_name: str, columns: list[str] | None,
+         batch_size: int = 1000) -> tuple[list[str], list[str] | None, list[dict]]:
+    """Открыть книгу парсером. Returns: (листы, заголовки, строки)."""
+    with open(path, 'rb') as f:
+        parser = open_parser(parser_name, io.BytesIO(f.read()))
+    try:
+        batches = list(parser.iter_batches(list_name, columns, batch_size))
+        rows = [row for batch in batches for row in pa.Table.from_batches([batch]).to_pylist()]
+        return parser.sheetnames, parser.headers(list_name), rows
+    finally:
+        parser.close()
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory) -> Path:
+    """Книга бенчмарка: столбцы COLUMN_MAPPING вперемешку с числами, датами и текстом."""
+    path = tmp_path_factory.mktemp('parsers') / 'generated.xlsx'
+    build_workbook(path, rows=300, columns=16)
+    return path
+
+
+@pytest.fixture(scope='module')
+def edge_cases(tmp_path_factory) -> Path:
+    """Книга с разными типами ячеек, пропусками, пустыми строками и повтором заголовка."""
+    workbook = Workbook()
+    workbook.active.title = 'Первый'
+    workbook.active.append(['x'])
+    sheet = workbook.create_sheet(EDGE_SHEET)
+    sheet.append(['Текст', 'Число', 'Дата', 'Флаг', 'Прочее', None, 'Пусто', 'Прочее'])
+    sheet.append(['a & b <c> "d"', 1, datetime(2026, 3, 2, 9, 30), True, 'второй', 'без заголовка'])
+    sheet.append(['  пробелы  ', 2.5, date(2026, 1, 31), False, None])
+    sheet.append([])
+    sheet.append([None, -3, None, None, 'только пятый'])
+    sheet.append(['=1+1', 10 ** 12, time(12, 15), None, '#N/A', None, None, 'последний столбец'])
+    sheet.append(['перенос\nстроки', 0, timedelta(hours=36), None, ''])
+    sheet['C7'].number_format = '[h]:mm:ss'
+    sheet.cell(row=9, column=2, value=7)
+    path = tmp_path_factory.mktemp('parsers') / 'edge.xlsx'
+    workbook.save(path)
+    return path
+
+
+@pytest.mark.parametrize('columns', [list(COLUMN_MAPPING), None], ids=['mapped', 'all'])
+@pytest.mark.parametrize('batch_size', [1000, 7])
+def test_generated_workbook_matches_openpyxl(generated, columns, batch_size):
+    expected = read(generated, 'openpyxl', SHEET, columns, batch_size)
+    assert len(expected[2]) == 300
+    assert read(generated, 'xml', SHEET, columns, batch_size) == expected
+
+
+@pytest.mark.parametrize('columns', [None, ['Пусто', 'Текст', 'Нет такого', 'Число']], ids=['all', 'projected'])
+def test_edge_cases_match_openpyxl(edge_cases, columns):
+    expected = read(edge_cases, 'openpyxl', EDGE_SHEET, columns, batch_size=2)
+    assert read(edge_cases, 'xml', EDGE_SHEET, columns, batch_size=2) == expected
+
+
+def test_missing_sheet(edge_cases):
+    for name in PARSERS:
+        sheetnames, headers, rows = read(edge_cases, name, 'Нет листа', None)
+        assert sheetnames == ['Первый', EDGE_SHEET]
+        assert headers is None and rows == []
+
+
+def test_unknown_parser():
+    with pytest.raises(ValueError, match='Неизвестный парсер'):
+        open_parser('nope', io.BytesIO())
@@ -0,0 +1,137 @@
+"""Тесты планировщика запросов (ratelimit.py): пополнение ведра токенов и single-flight."""
+import asyncio
+import threading
+
+import pytest
+
+from src.app_google import ratelimit
+from src.app_google.ratelimit import RequestScheduler, TokenBucket
+
+
+class FakeClock:
+    """Подмена модуля time в ratelimit: sleep сдвигает время без ожидания."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Запас исчерпан: следующий токен — через 1 с (60 в минуту)
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_refill_is_capped_by_burst(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    bucket.acquire(), bucket.acquire()
+    clock.now += 1.5
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+    # Долгий простой не копит больше burst токенов
+    clock.now += 600
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_pause_blocks_and_drains(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=5)
+    bucket.pause(10)
+    assert bucket.acquire() == pytest.approx(10.0)
+
+
+async def _wait_for_flight(scheduler: RequestScheduler, key) -> None:
+    while key not in scheduler._flights:
+        await asyncio.sleep(0)
+
+
+def test_single_flight_shares_one_load():
+    scheduler = RequestScheduler(quotas={ratelimit.SHEETS_API: 60})
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return 'data'
+
+    async def scenario():
+        leader = asyncio.create_task(scheduler.single_flight('key', load))
+        await _wait_for_flight(scheduler, 'key')
+        waiters = [asyncio.create_task(scheduler.single_flight('key', load)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await leader, await asyncio.gather(*waiters)
+
+    leader, waiters = asyncio.run(scenario())
+    assert leader == ('data', False)
+    assert waiters == [('data', True)] * 3
+    assert len(calls) == 1
+    assert scheduler.counters['coalesced'] == 3
+    assert not scheduler._flights
+
+
+def test_single_flight_shares_errors():
+    scheduler = RequestScheduler(quotas={ratelimit.SHEETS_API: 60})
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        raise RuntimeError('boom')
+
+    async def scenario():
+        leader = asyncio.create_task(scheduler.single_flight('key', load))
+        await _wait_for_flight(scheduler, 'key')
+        waiter = asyncio.create_task(scheduler.single_flight('key', load))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not scheduler._flights
+
+
+def test_cancelled_leader_hands_over_to_waiter():
+    scheduler = RequestScheduler(quotas={ratelimit.SHEETS_API: 60})
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+        return len(calls)
+
+    async def scenario():
+        leader = asyncio.create_task(scheduler.single_flight('key', load))
+        await _wait_for_flight(scheduler, 'key')
+        waiter = asyncio.create_task(scheduler.single_flight('key', load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await waiter
+        finally:
+            release.set()
+
+    # Ожидающий не получает CancelledError ведущего и загружает сам
+    assert asyncio.run(scenario()) == (2, False)
+    assert not scheduler._flights
@@ -0,0 +1,75 @@
+"""Тесты реестра таблиц (registry.py): разбор записей и ошибки проверки."""
+import json
+
+import pytest
+
+from src.app_google.config import SHEET_NAME
+from src.app_google import registry
+from src.app_google.registry import Spreadsheet, load_registry, parse_registry, tag_for
+
+
+def test_defaults_and_normalization():
+    assert parse_registry([
+        {'file_code': ' 1AbC ', 'tag': 'msk'},
+        {'file_code': '1XyZ', 'tag': '', 'sheet_name': '02.03.2026'},
+    ]) == (
+        Spreadsheet('1AbC', 'msk', SHEET_NAME),
+        Spreadsheet('1XyZ', '1XyZ', '02.03.2026'),
+    )
+
+
+@pytest.mark.parametrize('entry', [{}, {'tag': 'msk'}, {'file_code': ''}, {'file_code': None}])
+def test_missing_file_code(entry):
+    with pytest.raises(ValueError, match='без file_code'):
+        parse_registry([{'file_code': '1AbC'}, entry])
+
+
+def test_duplicate_file_code():
+    # Повтор ищется после срезания пробелов
+    with pytest.raises(ValueError, match=r"Повторяющиеся file_code в реестре: \['1AbC'\]"):
+        parse_registry([{'file_code': '1AbC', 'tag': 'msk'}, {'file_code': '1AbC ', 'tag': 'spb'}])
+
+
+def test_duplicate_tag():
+    with pytest.raises(ValueError, match=r"Повторяющиеся tag в реестре: \['msk'\]"):
+        parse_registry([{'file_code': '1AbC', 'tag': 'msk'}, {'file_code': '1XyZ', 'tag': 'msk'}])
+
+
+def test_untagged_tables_get_distinct_tags():
+    # Без метки таблицы с одинаковыми листами делили бы одну область сверки
+    tags = [s.tag for s in parse_registry([{'file_code': '1AbC'}, {'file_code': '1XyZ'}])]
+    assert tags == ['1AbC', '1XyZ']
+
+
+def test_default_tag_clashing_with_explicit_tag():
+    with pytest.raises(ValueError, match=r"Повторяющиеся tag в реестре: \['1AbC'\]"):
+        parse_registry([{'file_code': '1AbC'}, {'file_code': '1XyZ', 'tag': '1AbC'}])
+
+
+def test_tag_for(monkeypatch):
+    monkeypatch.setattr(registry, 'load_registry', lambda: parse_registry([
+        {'file_code': '1AbC', 'tag': 'msk'}, {'file_code': '1XyZ'},
+    ]))
+    assert tag_for('1AbC') == 'msk'
+    assert tag_for('1XyZ') == '1XyZ'
+    # Таблица не из реестра — своя область сверки
+    assert tag_for(' 1Other ') == '1Other'
+
+
+def test_tag_for_without_registry(monkeypatch):
+    monkeypatch.setattr(registry, 'load_registry', lambda: (Spreadsheet('1AbC'),))
+    assert tag_for('1AbC') is None
+    assert tag_for('1Other') == '1Other'
+
+
+def test_load_registry_file(tmp_path):
+    path = tmp_path / 'registry.json'
+    path.write_text(json.dumps([{'file_code': '1AbC', 'tag': 'мск'}], ensure_ascii=False), encoding='utf-8')
+    assert load_registry(str(path)) == (Spreadsheet('1AbC', 'мск'),)
+
+
+def test_load_invalid_registry_file(tmp_path):
+    path = tmp_path / 'registry.json'
+    path.write_text(json.dumps([{'file_code': '1AbC'}, {'file_code': '1AbC'}]), encoding='utf-8')
+    with pytest.raises(ValueError, match='Повторяющиеся file_code'):
+        load_registry(str(path))
@@ -0,0 +1,148 @@
+"""Тесты снимков листов (snapshot.py): разметка строк insert / change / remove / same."""
+import pyarrow as pa
+import pytest
+
+from src.app_google.config import SHEET_ROW_COLUMN
+from src.app_google.snapshot import SnapshotStore
+from src.app_google.transform import TRANSFORM_SCHEMA
+from src.app_google.writer import HASH_COLUMN, SOURCE_COLUMN
+
+
+def make_tasks(rows: list[tuple[int, str, str]], source_tag: str | None = None) -> pa.Table:
+    """Строки листа со схемой TRANSFORM_SCHEMA: (номер строки, link_post, row_hash)."""
+    values = {
+        'link_post': [link for _, link, _ in rows],
+        HASH_COLUMN: [row_hash for _, _, row_hash in rows],
+        SOURCE_COLUMN: [source_tag] * len(rows),
+        SHEET_ROW_COLUMN: [row for row, _, _ in rows],
+    }
+    return pa.table({field.name: pa.array(values.get(field.name, [None] * len(rows)), field.type)
+                     for field in TRANSFORM_SCHEMA})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots.duckdb'))
+    yield store
+    store.close()
+
+
+class Ledger:
+    """sheet_ledger.snapshot_id листа: какой снимок совпадает с БД (как в main._sync_stream)."""
+
+    def __init__(self):
+        self.snapshot_id: str | None = None
+
+
+def sync(store: SnapshotStore, ledger: Ledger, chunks: list[pa.Table], commit: bool = True, fresh: bool = False,
+         foreign: list[str] = ()):
+    snapshot = store.open_sheet('file', 'sheet', ledger.snapshot_id, fresh=fresh)
+    try:
+        for chunk in chunks:
+            snapshot.append(chunk)
+        delta = snapshot.diff()
+        if delta.previous and not delta.upserts.num_rows and not len(delta.removed):
+            snapshot.keep()
+            return delta
+        ledger.snapshot_id = None
+        if commit:
+            snapshot.exclude(pa.array(foreign, pa.string()))
+            ledger.snapshot_id = snapshot.commit()
+        else:
+            snapshot.discard()
+        return delta
+    finally:
+        snapshot.close()
+
+
+@pytest.fixture
+def ledger() -> Ledger:
+    return Ledger()
+
+
+BASE = [(2, 'a', 'h1'), (3, 'b', 'h2'), (4, 'c', 'h3')]
+
+
+def test_first_run_inserts_everything(store, ledger):
+    delta = sync(store, ledger, [make_tasks(BASE)])
+    assert not delta.previous
+    assert delta.counts == {'inserted': 3, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    assert delta.upserts.column('link_post').to_pylist() == ['a', 'b', 'c']
+    assert delta.removed.to_pylist() == []
+
+
+def test_diff_counts(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    # b изменилась, c пропала, d новая; a — без изменений
+    delta = sync(store, ledger, [make_tasks([(2, 'a', 'h1'), (3, 'b', 'h2*')]), make_tasks([(4, 'd', 'h4')])])
+    assert delta.previous
+    assert delta.counts == {'inserted': 1, 'changed': 1, 'removed': 1, 'unchanged': 1}
+    assert delta.upserts.column('link_post').to_pylist() == ['b', 'd']
+    assert delta.upserts.schema == TRANSFORM_SCHEMA
+    assert delta.removed.to_pylist() == ['c']
+
+
+def test_source_tag_change_is_a_change(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    delta = sync(store, ledger, [make_tasks(BASE, source_tag='msk')])
+    assert delta.counts == {'inserted': 0, 'changed': 3, 'removed': 0, 'unchanged': 0}
+
+
+def test_duplicate_keys_keep_the_lowest_row(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    delta = sync(store, ledger, [make_tasks(BASE + [(5, 'a', 'h1*')])])
+    assert delta.counts == {'inserted': 0, 'changed': 1, 'removed': 0, 'unchanged': 2}
+    assert delta.upserts.column(SHEET_ROW_COLUMN).to_pylist() == [5]
+
+
+def test_unchanged_sheet(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    delta = sync(store, ledger, [make_tasks(BASE)])
+    assert delta.counts == {'inserted': 0, 'changed': 0, 'removed': 0, 'unchanged': 3}
+    assert delta.upserts.num_rows == 0
+
+
+def test_discard_forgets_the_snapshot(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    sync(store, ledger, [make_tasks(BASE[:1])], commit=False)
+    delta = sync(store, ledger, [make_tasks(BASE)])
+    assert not delta.previous
+    assert delta.counts['inserted'] == 3
+
+
+def test_fresh_ignores_the_snapshot(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    delta = sync(store, ledger, [make_tasks(BASE)], fresh=True)
+    assert not delta.previous
+    assert delta.counts['inserted'] == 3
+    # Новый снимок всё равно записан
+    assert sync(store, ledger, [make_tasks(BASE)]).counts['unchanged'] == 3
+
+
+def test_snapshot_is_ignored_when_ledger_points_elsewhere(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    # Лист записали без этого снимка (другой процесс, загрузка всех листов)
+    ledger.snapshot_id = None
+    delta = sync(store, ledger, [make_tasks(BASE)])
+    assert not delta.previous
+    assert delta.counts['inserted'] == 3
+    # Другой процесс записал свой снимок
+    ledger.snapshot_id = 'other'
+    assert not sync(store, ledger, [make_tasks(BASE)]).previous
+
+
+def test_unchanged_sheet_keeps_the_snapshot(store, ledger):
+    sync(store, ledger, [make_tasks(BASE)])
+    snapshot_id = ledger.snapshot_id
+    sync(store, ledger, [make_tasks(BASE)])
+    assert ledger.snapshot_id == snapshot_id
+    assert sync(store, ledger, [make_tasks(BASE)]).previous
+
+
+def test_foreign_owned_keys_are_resent(store, ledger):
+    # Ссылкой b владеет другой лист: upsert её не тронул, снимок её не запоминает
+    sync(store, ledger, [make_tasks(BASE)], foreign=['b'])
+    delta = sync(store, ledger, [make_tasks(BASE)])
+    assert delta.previous
+    assert delta.counts == {'inserted': 1, 'changed': 0, 'removed': 0, 'unchanged': 2}
+    assert delta.upserts.column('link_post').to_pylist() == ['b']
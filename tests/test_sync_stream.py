@@ -0,0 +1,122 @@
+"""Тесты потоковой записи листа (main._sync_stream) с подменённым писателем: куски, режим записи, контрольные точки."""
+import asyncio
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.app_google import main
+from src.app_google.bench.coercion import make_sheet_rows
+from src.app_google.config import COLUMN_MAPPING, SHEET_ROW_COLUMN
+from src.app_google.metrics import StageTimer
+from src.app_google.tail import TailTracker
+from src.app_google.transform import sheet_to_arrow
+
+SHEET = '02.03.2026'
+BATCH_ROWS = 500
+
+
+class FakeWriter:
+    """save_tasks_parallel без БД: запоминает куски и режим, каждый кусок — вставка."""
+
+    def __init__(self, fail_chunk: int | None = None):
+        self.chunks: list[tuple[list[int], str | None]] = []
+        self.fail_chunk = fail_chunk
+        self.deactivated_with: list[int] | None = None
+
+    async def save(self, tasks: pa.Table, mode: str = 'auto', **_) -> dict:
+        self.chunks.append((tasks.column(SHEET_ROW_COLUMN).to_pylist(), mode))
+        failed = len(self.chunks) == self.fail_chunk
+        return {'mode': mode, 'inserted': 0 if failed else tasks.num_rows, 'updated': 0, 'unchanged': 0,
+                'deactivated': 0, 'errors': tasks.num_rows if failed else 0, 'timings': {}}
+
+    async def deactivate(self, sheet_name, keys, **_) -> int:
+        self.deactivated_with = keys.to_pylist()
+        return 0
+
+
+@pytest.fixture
+def writer(monkeypatch) -> FakeWriter:
+    writer = FakeWriter()
+    monkeypatch.setattr(main, 'save_tasks_parallel', writer.save)
+    monkeypatch.setattr(main, 'deactivate_sheet_missing', writer.deactivate)
+    return writer
+
+
+def run(rows: int, threshold: int, **kwargs) -> dict:
+    """Прогнать лист из rows строк через _sync_stream."""
+    table = sheet_to_arrow(make_sheet_rows(rows), list(COLUMN_MAPPING))
+
+    async def stream():
+        for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+            yield batch
+
+    async def scenario():
+        conn = duckdb.connect()
+        try:
+            return await main._sync_stream(stream(), conn, SHEET, StageTimer(), TailTracker(), **kwargs)
+        finally:
+            conn.close()
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(main, 'STAGING_THRESHOLD_ROWS', threshold)
+        patch.setattr('src.app_google.writer.STAGING_THRESHOLD_ROWS', threshold)
+        return asyncio.run(scenario())
+
+
+def test_large_sheet_is_written_in_staging_mode_chunk_by_chunk(writer):
+    stats = run(5000, threshold=2000, chunk_rows=1000)
+    assert [len(rows) for rows, _ in writer.chunks] == [1000] * 5
+    # Кусок меньше порога, но лист больше — весь лист пишется через COPY
+    assert {mode for _, mode in writer.chunks} == {'staging'}
+    assert stats['mode'] == 'staging'
+    assert stats['inserted'] == stats['source_rows'] == 5000
+    # Куски идут по порядку строк листа
+    written = [row for rows, _ in writer.chunks for row in rows]
+    assert written == sorted(written) == list(range(2, 5002))
+
+
+def test_small_sheet_is_written_in_batch_mode(writer):
+    stats = run(1500, threshold=2000, chunk_rows=1000)
+    assert [len(rows) for rows, _ in writer.chunks] == [1000, 500]
+    assert {mode for _, mode in writer.chunks} == {'batch'}
+    assert stats['mode'] == 'batch'
+
+
+def test_checkpoints_follow_written_chunks(writer):
+    points = []
+
+    async def on_chunk(point):
+        points.append(point)
+
+    run(3000, threshold=10 ** 6, chunk_rows=1000, on_chunk=on_chunk)
+    assert [(p['chunk'], p['last_row'], p['rows']) for p in points] == [(1, 1001, 1000), (2, 2001, 2000),
+                                                                        (3, 3001, 3000)]
+    assert all(p['first_key'] <= p['last_key'] for p in points)
+
+
+def test_resume_skips_committed_rows_but_keeps_their_keys(writer):
+    stats = run(3000, threshold=10 ** 6, chunk_rows=1000, resume_row=2001)
+    written = [row for rows, _ in writer.chunks for row in rows]
+    assert written == list(range(2002, 3002))
+    assert stats['resumed_rows'] == 2000
+    assert stats['inserted'] == 1000
+    # Сверка удалённых строк видит ключи всего листа, включая уже записанные
+    assert len(writer.deactivated_with) == 3000
+
+
+def test_no_checkpoint_after_a_failed_chunk(monkeypatch):
+    writer = FakeWriter(fail_chunk=2)
+    monkeypatch.setattr(main, 'save_tasks_parallel', writer.save)
+    monkeypatch.setattr(main, 'deactivate_sheet_missing', writer.deactivate)
+    points = []
+
+    async def on_chunk(point):
+        points.append(point)
+
+    stats = run(3000, threshold=10 ** 6, chunk_rows=1000, on_chunk=on_chunk)
+    # После ошибки точка не двигается: повтор начнёт со второго куска
+    assert [p['last_row'] for p in points] == [1001]
+    assert stats['errors'] == 1000
+    # Сверка удалённых строк при ошибках записи не выполняется
+    assert writer.deactivated_with is None
@@ -0,0 +1,86 @@
+"""Тесты дозагрузки хвоста листа (tail.py): отбор новых строк и переход к полной синхронизации."""
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.app_google.config import SHEET_ROW_COLUMN
+from src.app_google.tail import TailMismatch, TailState, TailTracker
+from src.app_google.writer import HASH_COLUMN
+
+
+def make_tasks(rows: list[tuple[int, str, str]]) -> pa.Table:
+    """Строки листа после transform: (номер строки, link_post, row_hash)."""
+    return pa.table({
+        'link_post': pa.array([link for _, link, _ in rows], pa.string()),
+        HASH_COLUMN: pa.array([row_hash for _, _, row_hash in rows], pa.string()),
+        SHEET_ROW_COLUMN: pa.array([row for row, _, _ in rows], pa.int64()),
+    })
+
+
+def read_sheet(tracker: TailTracker, chunks: list[list[tuple[int, str, str]]]) -> tuple[list[str], TailState]:
+    """Прогнать куски листа через tracker. Returns: (link_post к записи, состояние хвоста)."""
+    conn = duckdb.connect()
+    try:
+        written = []
+        for chunk in chunks:
+            tasks = make_tasks(chunk)
+            batch = tasks.select([SHEET_ROW_COLUMN]).to_batches()[0]
+            written += tracker.feed(conn, batch, tasks).column('link_post').to_pylist()
+        return written, tracker.finish()
+    finally:
+        conn.close()
+
+
+SHEET = [(2, 'a', 'h1'), (3, 'b', 'h2'), (4, 'c', 'h3')]
+NEW_ROWS = [(5, 'd', 'h4'), (6, 'e', 'h5')]
+
+
+@pytest.fixture
+def known() -> TailState:
+    """Состояние после полной синхронизации листа SHEET."""
+    written, state = read_sheet(TailTracker(), [SHEET])
+    assert written == ['a', 'b', 'c']
+    return state
+
+
+def test_state_does_not_depend_on_chunking(known):
+    _, state = read_sheet(TailTracker(), [SHEET[:1], SHEET[1:]])
+    assert state == known == TailState(4, known.checksum)
+
+
+def test_only_rows_below_tail_are_written(known):
+    written, state = read_sheet(TailTracker(known), [SHEET[:2], SHEET[2:] + NEW_ROWS[:1], NEW_ROWS[1:]])
+    assert written == ['d', 'e']
+    # Следующий запуск с новым состоянием совпадает с полной синхронизацией того же листа
+    assert state == read_sheet(TailTracker(), [SHEET + NEW_ROWS])[1]
+
+
+@pytest.mark.parametrize('sheet', [
+    pytest.param([(2, 'a', 'h1'), (3, 'b', 'changed'), (4, 'c', 'h3')] + NEW_ROWS, id='edited'),
+    pytest.param([(2, 'a', 'h1'), (3, 'c', 'h3')] + NEW_ROWS, id='deleted'),
+    pytest.param([(2, 'a', 'h1'), (3, 'x', 'h0'), (4, 'b', 'h2'), (5, 'c', 'h3')] + NEW_ROWS, id='inserted'),
+])
+def test_change_above_tail_falls_back_to_full_sync(known, sheet):
+    conn = duckdb.connect()
+    tracker = TailTracker(known)
+    tasks = make_tasks(sheet)
+    with pytest.raises(TailMismatch):
+        # Несовпадение обнаруживается до того, как в запись попадёт хоть одна строка
+        tracker.feed(conn, tasks.select([SHEET_ROW_COLUMN]).to_batches()[0], tasks)
+    conn.close()
+
+    # Повтор без известного хвоста (как в пайплайне) пишет весь лист
+    written, state = read_sheet(TailTracker(None), [sheet])
+    assert written == [link for _, link, _ in sheet]
+    assert state.checksum != known.checksum
+
+
+def test_sheet_shorter_than_tail(known):
+    with pytest.raises(TailMismatch):
+        read_sheet(TailTracker(known), [SHEET[:2]])
+
+
+def test_unchanged_sheet_writes_nothing(known):
+    written, state = read_sheet(TailTracker(known), [SHEET])
+    assert written == []
+    assert state == known
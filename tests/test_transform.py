@@ -0,0 +1,63 @@
+"""
+Паритет приведения типов: запрос DuckDB (transform.py) против прежних построчных
+safe_str / safe_int / safe_date (prepare_task) на синтетическом листе bench.coercion.
+"""
+from datetime import date, datetime
+
+import duckdb
+import pytest
+
+from src.app_google.bench.coercion import legacy_coercion, make_sheet_rows
+from src.app_google.config import COLUMN_MAPPING
+from src.app_google.transform import sheet_to_arrow, transform
+from src.app_google.writer import TASK_COLUMNS
+
+DATE, LINK, NUMBER, SUBSCRIBERS = 'дата комментария', 'Ссылка', '№ п/п', 'Кол-во подписчиков'
+
+# (дата, подписчики): несуществующие и нераспознаваемые даты, дробные и мусорные числа
+BAD_VALUES = [
+    ('31.02.2026', '1.5'),
+    ('не дата', 'abc'),
+    ('', '  '),
+    (' 05.03.2026 ', '1\xa0000'),
+    ('2026/01/01', 12.5),
+    (date(2026, 1, 3), '-3'),
+    ('03/01/2026', 7.0),
+    (None, '1e3'),
+]
+
+
+def both_paths(rows: list[dict]) -> tuple[list[dict], list[dict]]:
+    table = sheet_to_arrow(rows, list(COLUMN_MAPPING))
+    # Прежний путь отбрасывал строки без ссылки уже при записи (_drop_missing_keys)
+    legacy = [row for row in legacy_coercion(table) if row['link_post'] is not None]
+    with duckdb.connect() as conn:
+        vectorized = transform(conn, table).select(TASK_COLUMNS).to_pylist()
+    return legacy, vectorized
+
+
+@pytest.fixture
+def rows() -> list[dict]:
+    rows = make_sheet_rows(500)
+    for i, (day, subscribers) in enumerate(BAD_VALUES):
+        rows[i * 7][DATE], rows[i * 7][SUBSCRIBERS] = day, subscribers
+    rows[5][LINK] = ' \xa0 '
+    rows[6][NUMBER] = ' 12 '
+    return rows
+
+
+def test_parity_with_legacy_coercion(rows):
+    legacy, vectorized = both_paths(rows)
+    assert len(vectorized) == len(rows) - 1
+    assert vectorized == legacy
+
+
+def test_datetime_in_text_column_is_parsed():
+    # Единственное намеренное расхождение: datetime среди строк столбец превращает в текст
+    # «YYYY-MM-DD HH:MM:SS», который safe_date не разбирал, а transform разбирает
+    rows = make_sheet_rows(2)
+    rows[0][DATE] = datetime(2026, 1, 2, 3, 4)
+    legacy, vectorized = both_paths(rows)
+    assert legacy[0]['date_comment'] is None
+    assert vectorized[0]['date_comment'] == date(2026, 1, 2)
+    assert vectorized[1:] == legacy[1:]
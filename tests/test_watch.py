@@ -0,0 +1,109 @@
+"""Тесты схлопывания уведомлений Drive (watch.Debouncer): тишина quiet и предел max_delay."""
+import asyncio
+import time
+
+from src.app_google.watch import Debouncer
+
+QUIET = 0.05
+MAX_DELAY = 0.2
+
+
+class Recorder:
+    """action для Debouncer: запоминает ключ и момент вызова."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.calls: list[tuple[str, float]] = []
+
+    async def __call__(self, key: str) -> None:
+        self.calls.append((key, time.monotonic() - self.started))
+
+
+def test_burst_fires_once_after_quiet():
+    recorder = Recorder()
+
+    async def scenario():
+        debouncer = Debouncer(recorder, quiet=QUIET, max_delay=MAX_DELAY)
+        for _ in range(5):
+            debouncer.touch('file')
+            await asyncio.sleep(QUIET / 5)
+        await asyncio.sleep(QUIET * 3)
+        return debouncer.counters
+
+    assert asyncio.run(scenario()) == {'received': 5, 'fired': 1}
+    [(key, fired_at)] = recorder.calls
+    assert key == 'file'
+    # Последнее событие — через ~4/5 QUIET после первого, действие — через QUIET после него
+    assert fired_at >= QUIET * 4 / 5 + QUIET
+
+
+def test_steady_stream_fires_by_max_delay():
+    recorder = Recorder()
+
+    async def scenario():
+        debouncer = Debouncer(recorder, quiet=QUIET, max_delay=MAX_DELAY)
+        # Событие чаще, чем раз в QUIET, дольше двух MAX_DELAY: тишины не бывает
+        deadline = time.monotonic() + MAX_DELAY * 2.5
+        while time.monotonic() < deadline:
+            debouncer.touch('file')
+            await asyncio.sleep(QUIET / 3)
+        await debouncer.flush()
+
+    asyncio.run(scenario())
+    times = [fired_at for _, fired_at in recorder.calls]
+    # Первые два вызова — по max_delay от начала всплеска, последний — flush
+    assert len(times) == 3
+    assert MAX_DELAY <= times[0] < MAX_DELAY + QUIET
+    assert MAX_DELAY <= times[1] - times[0] < MAX_DELAY + QUIET
+
+
+def test_keys_are_independent():
+    recorder = Recorder()
+
+    async def scenario():
+        debouncer = Debouncer(recorder, quiet=QUIET, max_delay=MAX_DELAY)
+        debouncer.touch('a')
+        await asyncio.sleep(QUIET / 2)
+        debouncer.touch('b')
+        await asyncio.sleep(QUIET * 3)
+
+    asyncio.run(scenario())
+    assert [key for key, _ in recorder.calls] == ['a', 'b']
+
+
+def test_flush_fires_pending_now():
+    recorder = Recorder()
+
+    async def scenario():
+        debouncer = Debouncer(recorder, quiet=10, max_delay=60)
+        debouncer.touch('a')
+        debouncer.touch('b')
+        await debouncer.flush()
+        return debouncer
+
+    debouncer = asyncio.run(scenario())
+    assert sorted(key for key, _ in recorder.calls) == ['a', 'b']
+    assert recorder.calls[-1][1] < 1
+    assert not debouncer._pending and not debouncer._tasks
+
+
+def test_max_delay_is_at_least_quiet():
+    assert Debouncer(Recorder(), quiet=5, max_delay=1).max_delay == 5
+
+
+def test_failing_action_does_not_stop_later_bursts():
+    calls = []
+
+    async def action(key: str) -> None:
+        calls.append(key)
+        raise RuntimeError('boom')
+
+    async def scenario():
+        debouncer = Debouncer(action, quiet=QUIET, max_delay=MAX_DELAY)
+        debouncer.touch('a')
+        await asyncio.sleep(QUIET * 3)
+        debouncer.touch('a')
+        await asyncio.sleep(QUIET * 3)
+
+    asyncio.run(scenario())
+    assert calls == ['a', 'a']
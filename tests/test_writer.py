@@ -0,0 +1,232 @@
+"""
+Тесты UPSERT TaskList (writer.py): счётчики inserted / updated / unchanged, защита от
+холостых обновлений и владение ссылкой между листами.
+
+PostgreSQL в тестах не нужен: тот же DDL и тот же INSERT ... ON CONFLICT DO UPDATE ... WHERE
+выполняются в DuckDB. Вместо RETURNING (xmax = 0) возвращается link_post, а признак
+вставки вычисляется по ключам, которые были в таблице до запроса.
+"""
+import asyncio
+from datetime import datetime
+
+import duckdb
+import pyarrow as pa
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src.app_google.models import TaskList
+from src.app_google.writer import (
+    TASK_SCHEMA, WRITE_COLUMNS, _count_returned, _csv_chunks, _new_counts, _save_batched, _save_per_row,
+    build_array_upsert, build_deactivate, build_deactivate_keys, build_stage_merge, build_upsert, choose_mode,
+)
+
+DIALECT = postgresql.dialect(paramstyle='numeric_dollar')
+RETURNING_XMAX = 'RETURNING (xmax = 0) AS inserted'
+
+
+class DuckTaskList:
+    """task_list в DuckDB: DDL модели TaskList и операторы writer.py."""
+
+    def __init__(self):
+        self.conn = duckdb.connect()
+        self.conn.execute('CREATE SCHEMA test')
+        self.conn.execute(str(CreateTable(TaskList.__table__).compile(dialect=DIALECT)))
+
+    def execute(self, stmt, params: dict | None = None) -> list[tuple]:
+        compiled = stmt.compile(dialect=DIALECT)
+        values = {**compiled.params, **(params or {})}
+        for name in values:
+            if name.startswith('is_active') and values[name] is None:
+                values[name] = True  # default=True модели подставляет SQLAlchemy при выполнении
+        sql = str(compiled).replace(RETURNING_XMAX, 'RETURNING link_post')
+        return self.conn.execute(sql, [values[name] for name in compiled.positiontup]).fetchall()
+
+    def upsert_flags(self, stmt, params: dict | None = None) -> list[bool]:
+        """Выполнить UPSERT. Returns: флаги как у RETURNING (xmax = 0) — True для вставленных строк."""
+        existing = self.keys()
+        return [link_post not in existing for (link_post,) in self.execute(stmt, params)]
+
+    def upsert(self, rows: list[dict]) -> dict[str, int]:
+        """build_upsert по строкам. Returns: счётчики inserted / updated / unchanged."""
+        counts = _new_counts()
+        _count_returned(counts, self.upsert_flags(build_upsert([task(**row) for row in rows])), len(rows))
+        return counts
+
+    def keys(self) -> set[str]:
+        return {key for (key,) in self.conn.execute('SELECT link_post FROM test.task_list').fetchall()}
+
+    def rows(self) -> dict[str, tuple]:
+        """link_post → (row_hash, sheet_name, source_tag, is_active)."""
+        return {row[0]: row[1:] for row in self.conn.execute(
+            'SELECT link_post, row_hash, sheet_name, source_tag, is_active FROM test.task_list'
+        ).fetchall()}
+
+
+def task(link_post: str, row_hash: str = 'h', sheet_name: str | None = 'sheet', source_tag: str | None = None,
+         **values) -> dict:
+    return {**dict.fromkeys(WRITE_COLUMNS), 'link_post': link_post, 'row_hash': row_hash,
+            'sheet_name': sheet_name, 'source_tag': source_tag, **values}
+
+
+@pytest.fixture
+def db() -> DuckTaskList:
+    return DuckTaskList()
+
+
+def test_counts(db):
+    assert db.upsert([{'link_post': 'a'}, {'link_post': 'b'}]) == {**_new_counts(), 'inserted': 2}
+    assert db.upsert([{'link_post': 'a'}, {'link_post': 'b', 'row_hash': 'h2'}, {'link_post': 'c'}]) == {
+        **_new_counts(), 'inserted': 1, 'updated': 1, 'unchanged': 1,
+    }
+    assert db.rows()['b'] == ('h2', 'sheet', None, True)
+
+
+def test_unchanged_rows_are_not_rewritten(db):
+    db.upsert([{'link_post': 'a'}])
+    db.conn.execute("UPDATE test.task_list SET updated_at = TIMESTAMP '2020-01-01'")
+    assert db.upsert([{'link_post': 'a'}])['unchanged'] == 1
+    assert db.conn.execute('SELECT updated_at FROM test.task_list').fetchone()[0] == datetime(2020, 1, 1)
+
+
+def test_deactivated_row_is_restored(db):
+    db.upsert([{'link_post': 'a'}])
+    db.execute(build_deactivate_keys('sheet'), {'keys': ['a']})
+    assert db.rows()['a'][3] is False
+    # Хэш тот же, но строка была деактивирована — обновляется
+    assert db.upsert([{'link_post': 'a'}])['updated'] == 1
+    assert db.rows()['a'][3] is True
+
+
+def test_link_owned_by_another_sheet_is_left_alone(db):
+    db.upsert([{'link_post': 'a', 'sheet_name': 'owner'}])
+    assert db.upsert([{'link_post': 'a', 'sheet_name': 'other', 'row_hash': 'h2'}])['unchanged'] == 1
+    assert db.rows()['a'] == ('h', 'owner', None, True)
+    # Сверка другого листа ссылку владельца не деактивирует
+    db.execute(build_deactivate('other'), {'keys': []})
+    assert db.rows()['a'][3] is True
+
+
+def test_ownership_moves_after_owner_deactivates(db):
+    db.upsert([{'link_post': 'a', 'sheet_name': 'owner'}])
+    db.upsert([{'link_post': 'a', 'sheet_name': 'other'}])
+    # Владелец удалил ссылку из листа — следующая синхронизация другого листа её забирает
+    db.execute(build_deactivate('owner'), {'keys': []})
+    assert db.upsert([{'link_post': 'a', 'sheet_name': 'other'}])['updated'] == 1
+    assert db.rows()['a'] == ('h', 'other', None, True)
+
+
+def test_same_sheet_name_in_another_table_is_another_owner(db):
+    db.upsert([{'link_post': 'a', 'source_tag': 'msk'}])
+    assert db.upsert([{'link_post': 'a', 'source_tag': 'spb', 'row_hash': 'h2'}])['unchanged'] == 1
+    db.execute(build_deactivate('sheet', source_tag='spb'), {'keys': []})
+    assert db.rows()['a'] == ('h', 'sheet', 'msk', True)
+
+
+def test_legacy_rows_are_adopted(db):
+    # Строки без листа и строки листа без метки таблицы (записанные до их появления)
+    db.upsert([{'link_post': 'a', 'sheet_name': None}, {'link_post': 'b'}])
+    assert db.upsert([{'link_post': 'a'}, {'link_post': 'b', 'source_tag': 'msk'}])['updated'] == 2
+    assert db.rows() == {'a': ('h', 'sheet', None, True), 'b': ('h', 'sheet', 'msk', True)}
+
+
+def test_deactivate_keeps_loaded_keys(db):
+    db.upsert([{'link_post': key} for key in 'abc'])
+    db.execute(build_deactivate('sheet'), {'keys': ['a', 'c']})
+    assert {key: row[3] for key, row in db.rows().items()} == {'a': True, 'b': False, 'c': True}
+
+
+def test_array_upsert_and_stage_merge_share_the_guard():
+    def conflict_clause(stmt) -> str:
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        return sql[sql.index('ON CONFLICT'):sql.index(RETURNING_XMAX)]
+
+    row_clause = conflict_clause(build_upsert([task('a')]))
+    assert conflict_clause(build_array_upsert()) == row_clause
+    assert row_clause in str(build_stage_merge().compile(dialect=postgresql.dialect()))
+    # Один параметр-массив на столбец, а не на ячейку
+    params = build_array_upsert().compile(dialect=postgresql.dialect()).params
+    assert set(WRITE_COLUMNS) <= set(params) and not any('_m' in name for name in params)
+
+
+class FakeSession:
+    """Сессия для стратегий записи: UPSERT выполняется в DuckDB."""
+
+    def __init__(self, db: DuckTaskList, fail_on: str | None = None):
+        self.db = db
+        self.fail_on = fail_on
+        self.savepoints = 0
+
+    def begin_nested(self):
+        session = self
+
+        class Savepoint:
+            async def __aenter__(self):
+                session.savepoints += 1
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Savepoint()
+
+    async def execute(self, stmt, params: dict | None = None):
+        if params and self.fail_on in params['link_post']:
+            raise RuntimeError('boom')
+        if params:
+            # Пачка массивами столбцов (unnest нескольких массивов DuckDB не умеет) — те же строки
+            rows = [dict(zip(params, values)) for values in zip(*params.values())]
+            stmt, params = build_upsert([task(**row) for row in rows]), None
+        flags = self.db.upsert_flags(stmt, params)
+
+        class Result:
+            def scalars(self):
+                return self
+
+            def all(self):
+                return flags
+
+        return Result()
+
+
+def tasks_table(rows: list[dict]) -> pa.Table:
+    return pa.Table.from_pylist([task(**row) for row in rows], schema=TASK_SCHEMA)
+
+
+@pytest.mark.parametrize('strategy', ['row', 'batch'])
+def test_strategies_count_changes(db, strategy):
+    async def save(rows: list[dict], session: FakeSession) -> dict[str, int]:
+        if strategy == 'row':
+            return await _save_per_row(session, tasks_table(rows))
+        return await _save_batched(session, tasks_table(rows), batch_size=2)
+
+    rows = [{'link_post': key, 'subscribers': 10} for key in 'abcde']
+    assert asyncio.run(save(rows, FakeSession(db))) == {**_new_counts(), 'inserted': 5}
+    rows[1]['row_hash'] = 'h2'
+    rows.append({'link_post': 'f'})
+    assert asyncio.run(save(rows, FakeSession(db))) == {**_new_counts(), 'inserted': 1, 'updated': 1, 'unchanged': 4}
+
+
+def test_failed_batch_does_not_roll_back_others(db):
+    session = FakeSession(db, fail_on='c')
+    counts = asyncio.run(_save_batched(session, tasks_table([{'link_post': key} for key in 'abcde']), batch_size=2))
+    # Пачки [a, b], [c, d], [e]: ошибка одной пачки не мешает остальным
+    assert counts == {**_new_counts(), 'inserted': 3, 'errors': 2}
+    assert session.savepoints == 3
+    assert db.keys() == {'a', 'b', 'e'}
+
+
+@pytest.mark.parametrize(('rows', 'mode', 'expected'), [
+    (10, 'auto', 'batch'), (10 ** 6, 'auto', 'staging'), (10 ** 6, 'row', 'row'), (1, 'staging', 'staging'),
+])
+def test_choose_mode(monkeypatch, rows, mode, expected):
+    monkeypatch.setattr('src.app_google.writer.STAGING_THRESHOLD_ROWS', 1000)
+    assert choose_mode(rows, mode) == expected
+
+
+def test_csv_keeps_null_and_empty_string_apart():
+    async def collect() -> bytes:
+        table = pa.table({'link_post': ['a', None, ''], 'subscribers': [1, None, 2]})
+        return b''.join([chunk async for chunk in _csv_chunks(table, 2)])
+
+    # COPY ... CSV: пустое поле без кавычек — NULL, "" — пустая строка
+    assert asyncio.run(collect()) == b'"a",1\n,\n"",2\n'